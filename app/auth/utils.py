@@ -2,21 +2,50 @@ from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 import os
+from typing import Optional
 from app.models.users import User
 from app.db import get_session
+from app.services import user_cache
 from sqlmodel import select
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/verify-otp")
 JWT_SECRET = os.getenv("JWT_SECRET", "quantcopilotsecret")
 
-def get_current_user(token: str = Depends(oauth2_scheme)) -> str:
+def _token_subject(token: str) -> Optional[str]:
+    """Email a token was issued to, or None when it does not verify"""
+    email = user_cache.get_claims(token)
+    if email is not None:
+        return email
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=["HS256"])
-        email =  payload.get("sub")
-        with get_session() as session:
-            user = session.exec(select(User).where(User.email == email)).first()
-            if not user:
-                raise HTTPException(status_code=401, detail="User not found")
-            return user.email
     except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid token")
\ No newline at end of file
+        return None
+    user_cache.put_claims(token, payload)
+    return payload.get("sub")
+
+def get_user_by_email(email: str) -> Optional[User]:
+    """The user record, from the cache when it holds it and from the database otherwise"""
+    user = user_cache.get_user(email)
+    if user is not None:
+        return user
+    with get_session() as session:
+        user = session.exec(select(User).where(User.email == email)).first()
+    if user is not None:
+        user_cache.put_user(user)
+    return user
+
+def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
+    email = _token_subject(token)
+    if email is None:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    user = get_user_by_email(email)
+    if not user:
+        raise HTTPException(status_code=401, detail="User not found")
+    return user
+
+def get_user_from_token(token: str) -> Optional[User]:
+    """Resolve a JWT to its user for transports without an Authorization header, e.g. WebSockets"""
+    email = _token_subject(token)
+    if email is None:
+        return None
+    return get_user_by_email(email)
@@ -1,13 +1,92 @@
+from typing import AsyncIterator, Iterator
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import SQLModel, create_engine, Session
-import os 
+from sqlmodel.ext.asyncio.session import AsyncSession
+import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
-engine = create_engine(DATABASE_URL, echo=False)
+#Defaults to DATABASE_URL with its async driver (asyncpg for Postgres, aiosqlite for SQLite)
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL")
+
+#Per process and per engine: keep workers x 2 engines x (size + overflow) under max_connections
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", 30))
+#Recycle before server or proxy idle timeouts drop the connection under us
+DB_POOL_RECYCLE_SECONDS = int(os.getenv("DB_POOL_RECYCLE_SECONDS", 1800))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", 30000))
+
+
+def async_url(url: str) -> str:
+    """The same database through an asyncio driver"""
+    scheme, sep, rest = url.partition("://")
+    dialect = scheme.split("+")[0]
+    if dialect in ("postgresql", "postgres"):
+        return f"postgresql+asyncpg{sep}{rest}"
+    if dialect == "sqlite":
+        return f"sqlite+aiosqlite{sep}{rest}"
+    return url
+
+
+def engine_options(url: str) -> dict:
+    """Pool sizing, pre-ping and a server-side statement timeout for a database URL"""
+    scheme = url.partition("://")[0]
+    if scheme.startswith("sqlite"):
+        #SQLite has no server to time statements out or recycle connections for
+        return {"pool_pre_ping": True}
+    options = {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": True,
+    }
+    if scheme.startswith("postgres"):
+        if "asyncpg" in scheme:
+            options["connect_args"] = {"server_settings": {"statement_timeout": str(DB_STATEMENT_TIMEOUT_MS)}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    return options
+
+
+engine = create_engine(DATABASE_URL, echo=False, **engine_options(DATABASE_URL))
 def init_db():
     SQLModel.metadata.create_all(engine)
 
 def get_session():
-    return Session(engine)
\ No newline at end of file
+    return Session(engine)
+
+def get_db() -> Iterator[Session]:
+    """Dependency: one session per request, closed once the response is sent"""
+    with Session(engine) as session:
+        yield session
+
+
+_async_engine = None
+
+def get_async_engine():
+    """Created on first use, so processes that never serve async routes never load the driver"""
+    global _async_engine
+    if _async_engine is None:
+        url = ASYNC_DATABASE_URL or async_url(DATABASE_URL)
+        _async_engine = create_async_engine(url, echo=False, **engine_options(url))
+    return _async_engine
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """
+    Dependency: one async session per request.
+
+    Objects stay loaded after commit, since touching an expired attribute would
+    need a lazy load that async sessions cannot do implicitly.
+    """
+    async with AsyncSession(get_async_engine(), expire_on_commit=False) as session:
+        yield session
+
+async def dispose_async_engine():
+    global _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
@@ -1,16 +1,67 @@
+from contextlib import asynccontextmanager
+import importlib
+import logging
+import os
+import threading
 from fastapi import FastAPI
 from dotenv import load_dotenv
 from app.routes import generate, backtest, explain, plot, strategy, export, auth_otp, builder, leaderboard, metrics, paper_trading
-from app.scheduler import start_scheduler
-from app.db import init_db
+from app.db import dispose_async_engine, init_db
 from fastapi.middleware.cors import CORSMiddleware
 
+load_dotenv()
+logger = logging.getLogger("main")
+
+#What this process runs besides serving requests: "api" creates the tables, "worker" runs
+#the nightly jobs, "executor" runs the paper trading executor in-process
+APP_ROLES = {r.strip() for r in os.getenv("APP_ROLES", "api,worker").split(",") if r.strip()}
+#Import the backtest, plot and LLM stacks in the background once started, so the first
+#request after a deploy does not pay for them; off by default to keep short-lived workers lean
+APP_WARMUP = os.getenv("APP_WARMUP", "0") == "1"
+WARMUP_MODULES = [
+    "app.services.backtest_service",
+    "app.services.metrics",
+    "app.services.plot_service",
+    "google.generativeai",
+]
+
+def _warm_up():
+    for name in WARMUP_MODULES:
+        try:
+            importlib.import_module(name)
+        except Exception as e:
+            logger.warning(f"Warm-up import of {name} failed: {e}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    scheduler = executor = None
+    if "api" in APP_ROLES:
+        init_db()
+    if "worker" in APP_ROLES:
+        from app.scheduler import start_scheduler
+        scheduler = start_scheduler()
+    if "executor" in APP_ROLES:
+        from app.services.paper_trading_executor import get_executor
+        executor = get_executor()
+        executor.start()
+    if APP_WARMUP:
+        threading.Thread(target=_warm_up, name="warmup", daemon=True).start()
+    logger.info(f"Started with roles: {', '.join(sorted(APP_ROLES))}")
+    try:
+        yield
+    finally:
+        if executor is not None:
+            executor.stop()
+        if scheduler is not None:
+            scheduler.shutdown()
+        await dispose_async_engine()
+
 app = FastAPI(
     title="Quant Copilot API",
     description="Quantitative Trading Strategy Platform",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
-init_db()
 app.include_router(generate.router)
 app.include_router(backtest.router)
 app.include_router(explain.router)
@@ -22,7 +73,6 @@ app.include_router(builder.router)
 app.include_router(leaderboard.router)
 app.include_router(metrics.router)
 app.include_router(paper_trading.router)
-start_scheduler(app)
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
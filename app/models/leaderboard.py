@@ -1,8 +1,15 @@
 from sqlmodel import SQLModel, Field
+from sqlalchemy import Column, Index, LargeBinary, UniqueConstraint
 from typing import Optional
-from datetime import datetime
+from datetime import date, datetime
 
 class LeaderboardEntry(SQLModel, table=True):
+    # Keyset pagination walks (score, id) backwards, optionally within a dataset or strategy
+    __table_args__ = (
+        Index("ix_leaderboard_score_id", "score", "id"),
+        Index("ix_leaderboard_dataset_score_id", "dataset", "score", "id"),
+        Index("ix_leaderboard_strategy_score_id", "strategy_id", "score", "id"),
+    )
     id: Optional[int] = Field(default=None, primary_key=True)
     user_id: Optional[int]= Field(default=None, foreign_key="user.id", index=True)
     username: Optional[str]= Field(default=None)
@@ -15,4 +22,18 @@ class LeaderboardEntry(SQLModel, table=True):
     sharpe: Optional[float] = Field(default=None)
     max_drawdown: Optional[float] = Field(default=None)
     score: float = Field(default=0.0)
-    notes: Optional[str] = Field(default=None)
\ No newline at end of file
+    score_version: int = Field(default=1, index=True)
+    notes: Optional[str] = Field(default=None)
+
+class LeaderboardSnapshot(SQLModel, table=True):
+    __tablename__ = "leaderboard_snapshots"
+    __table_args__ = (UniqueConstraint("period", "dataset", "as_of"),)
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    period: str = Field(index=True)
+    dataset: str = Field(default="*")
+    as_of: date = Field(index=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    entry_count: int = Field(default=0)
+    content_hash: str
+    payload: bytes = Field(sa_column=Column(LargeBinary, nullable=False))
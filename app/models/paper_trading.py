@@ -1,6 +1,7 @@
 from sqlmodel import SQLModel, Field, Relationship
-from typing import Optional, List
-from datetime import datetime
+from sqlalchemy import Column, Index, JSON, UniqueConstraint
+from typing import Optional, List, Dict, Any
+from datetime import date, datetime
 from enum import Enum
 from decimal import Decimal
 
@@ -29,23 +30,40 @@ class PaperTradingAccount(SQLModel, table=True):
     current_balance: float = Field(default=100000.0)
     available_cash: float = Field(default=100000.0)
     is_active: bool = Field(default=True)
-    created_at: bool = Field(default_factory=datetime.utcnow)
-    updated_at: bool = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
 
 class PaperOrder(SQLModel, table=True):
     __tablename__ = "paper_orders"
+    # Keyset pagination walks (created_at, id) backwards within an account
+    __table_args__ = (
+        Index("ix_paper_orders_account_created", "account_id", "created_at", "id"),
+        Index("ix_paper_orders_account_status_created", "account_id", "status", "created_at", "id"),
+        Index("ix_paper_orders_account_symbol_created", "account_id", "symbol", "created_at", "id"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     account_id: int = Field(foreign_key="paper_trading_accounts.id", index=True)
     strategy_id: Optional[int] = Field(default=None, foreign_key="strategy.id", index=True)
     symbol : str = Field(index = True)
     side: OrderSide
+    order_type: OrderType = Field(default=OrderType.MARKET)
     quantity: float
-    price: float
-    timestamp: datetime = Field(default_factory = datetime.utcnow, index=True)
+    price: Optional[float] = Field(default=None)
+    stop_price: Optional[float] = Field(default=None)
+    status: OrderStatus = Field(default=OrderStatus.PENDING, index=True)
+    filled_quantity: float = Field(default=0.0)
+    average_fill_price: Optional[float] = Field(default=None)
+    created_at: datetime = Field(default_factory = datetime.utcnow, index=True)
+    filled_at: Optional[datetime] = Field(default=None)
 
 class PaperTrade(SQLModel, table=True):
-    __tablename___ = "paper_trades"
+    __tablename__ = "paper_trades"
+    __table_args__ = (
+        Index("ix_paper_trades_account_timestamp", "account_id", "timestamp", "id"),
+        Index("ix_paper_trades_account_symbol_timestamp", "account_id", "symbol", "timestamp", "id"),
+        Index("ix_paper_trades_account_strategy_timestamp", "account_id", "strategy_id", "timestamp", "id"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     account_id: int = Field(foreign_key="paper_trading_accounts.id", index=True)
@@ -58,7 +76,7 @@ class PaperTrade(SQLModel, table=True):
     timestamp: datetime = Field(default_factory=datetime.utcnow, index=True)
 
 class PaperPosition(SQLModel, table=True):
-    __tablename___ = "paper_positions"
+    __tablename__ = "paper_positions"
     id: Optional[int] = Field(default=None, primary_key=True)
     account_id: int = Field(foreign_key="paper_trading_accounts.id", index=True)
     symbol: str = Field(index=True)
@@ -69,5 +87,59 @@ class PaperPosition(SQLModel, table=True):
     realized_pnl: float = Field(default=0.0)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
-    
-    
\ No newline at end of file
+
+class PaperPortfolioSnapshot(SQLModel, table=True):
+    """Mark-to-market valuation of an account and its positions at one point in time"""
+    __tablename__ = "paper_portfolio_snapshots"
+    __table_args__ = (
+        Index("ix_paper_portfolio_snapshots_account_timestamp", "account_id", "timestamp"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    account_id: int = Field(foreign_key="paper_trading_accounts.id")
+    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    cash: float
+    equity: float
+    unrealized_pnl: float = Field(default=0.0)
+    realized_pnl: float = Field(default=0.0)
+    #[{symbol, quantity, avg_entry_price, current_price, unrealized_pnl, realized_pnl, market_value}]
+    positions: List[Dict[str, Any]] = Field(default_factory=list, sa_column=Column(JSON))
+
+class PaperEquityPoint(SQLModel, table=True):
+    """One equity sample of an account; kept narrow so long curves stay cheap to scan"""
+    __tablename__ = "paper_equity_points"
+
+    account_id: int = Field(foreign_key="paper_trading_accounts.id", primary_key=True)
+    timestamp: datetime = Field(primary_key=True)
+    equity: float
+
+class PaperStrategyDeployment(SQLModel, table=True):
+    """A saved strategy running live against one symbol on behalf of a paper account"""
+    __tablename__ = "paper_strategy_deployments"
+    __table_args__ = (
+        UniqueConstraint("account_id", "strategy_id", "symbol", name="uq_paper_deployment"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    account_id: int = Field(foreign_key="paper_trading_accounts.id", index=True)
+    strategy_id: int = Field(foreign_key="strategy.id")
+    symbol: str
+    interval: str = Field(default="1m")
+    is_active: bool = Field(default=True, index=True)
+    last_bar_at: Optional[datetime] = None
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class PaperArchivePartition(SQLModel, table=True):
+    """Manifest entry for a month of paper trades or orders moved to a Parquet file"""
+    __tablename__ = "paper_archive_partitions"
+    __table_args__ = (
+        Index("ix_paper_archive_partitions_table_month", "table_name", "month"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    table_name: str
+    month: date
+    path: str
+    row_count: int
+    created_at: datetime = Field(default_factory=datetime.utcnow)
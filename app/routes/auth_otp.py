@@ -8,6 +8,7 @@ from app.utility.redis_client import redis_client
 from app.db import get_session
 from sqlmodel import select
 from app.models.users import User
+from app.services import user_cache
 
 router = APIRouter(prefix="/auth")
 
@@ -141,6 +142,8 @@ def verify_otp(email:str, otp_code:str):
             session.add(user)
             session.commit()
             session.refresh(user)
+            #A row deleted and recreated under this email must not resolve to the old id
+            user_cache.invalidate(user.email)
 
     token = jwt.encode(
         {"sub":user.email, "exp": datetime.utcnow()+timedelta(days=JWT_EXPIRY_DATES)},
@@ -1,14 +1,20 @@
 from fastapi import APIRouter
 from pydantic import BaseModel
-from app.services.backtest_service import run_backtest_on_code
+from typing import Optional
+from datetime import datetime
 
 router = APIRouter()
 
 class BacktestRequest(BaseModel):
     strategy_code:str
     ticker:str
+    #Evaluation window; without start the last year is used
+    start: Optional[datetime] = None
+    end: Optional[datetime] = None
 
 @router.post("/backtest")
 def backtest(request: BacktestRequest):
-    results = run_backtest_on_code(request.strategy_code, request.ticker)
+    from app.services.backtest_service import run_backtest_on_code
+
+    results = run_backtest_on_code(request.strategy_code, request.ticker, request.start, request.end)
     return results
\ No newline at end of file
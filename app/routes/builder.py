@@ -1,12 +1,43 @@
-from fastapi import APIRouter
+from typing import AsyncIterator
+from fastapi import APIRouter, HTTPException
 from app.models.strategy_blueprint import StrategyBlueprint
+from app.services.blueprint_compiler import BlueprintCompileError, compile_blueprint
 from app.services.builder_service import blueprint_to_prompt
-from app.services.llm_service import generate_strategy_code
+from app.services.llm_service import generate_strategy_code_async, stream_strategy_code
+from app.utility.sse import sse_response
 
 router = APIRouter()
 
 @router.post("/builder/translate")
-def translate_blueprint(bp: StrategyBlueprint):
+async def translate_blueprint(bp: StrategyBlueprint, use_llm: bool = False):
+    """
+    Backtrader code for a blueprint from the template compiler; with use_llm=true,
+    blueprints the compiler cannot express are handed to the LLM instead.
+    """
     prompt = blueprint_to_prompt(bp)
-    code = generate_strategy_code(prompt)
-    return {"prompt": prompt, "generated_code": code}
\ No newline at end of file
+    try:
+        return {"prompt": prompt, "generated_code": compile_blueprint(bp), "source": "compiler"}
+    except BlueprintCompileError as e:
+        if not use_llm:
+            raise HTTPException(status_code=422, detail=str(e))
+    code = await generate_strategy_code_async(prompt)
+    return {"prompt": prompt, "generated_code": code, "source": "llm"}
+
+async def _whole(text: str) -> AsyncIterator[str]:
+    yield text
+
+@router.post("/builder/translate/stream")
+async def translate_blueprint_stream(bp: StrategyBlueprint, use_llm: bool = False):
+    """
+    Code for a blueprint as server-sent events, after a meta event carrying the prompt
+    and source. Compiled code arrives as a single delta; with use_llm=true, blueprints
+    the compiler cannot express stream from the LLM instead.
+    """
+    prompt = blueprint_to_prompt(bp)
+    try:
+        code = compile_blueprint(bp)
+    except BlueprintCompileError as e:
+        if not use_llm:
+            raise HTTPException(status_code=422, detail=str(e))
+        return sse_response(stream_strategy_code(prompt), meta={"prompt": prompt, "source": "llm"})
+    return sse_response(_whole(code), meta={"prompt": prompt, "source": "compiler"})
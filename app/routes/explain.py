@@ -1,6 +1,7 @@
 from fastapi import APIRouter
 from pydantic import BaseModel
-from app.services.explain_service import explain_strategy
+from app.services.explain_service import explain_strategy_async, stream_explanation
+from app.utility.sse import sse_response
 
 router = APIRouter()
 
@@ -8,6 +9,11 @@ class ExplainRequest(BaseModel):
     strategy_code: str
 
 @router.post("/explain")
-def explain(request: ExplainRequest):
-    explanation = explain_strategy(request.strategy_code)
-    return {"explanation": explanation}
\ No newline at end of file
+async def explain(request: ExplainRequest):
+    explanation = await explain_strategy_async(request.strategy_code)
+    return {"explanation": explanation}
+
+@router.post("/explain/stream")
+async def explain_stream(request: ExplainRequest):
+    """Explanation as server-sent events: delta chunks, then done with the full text"""
+    return sse_response(stream_explanation(request.strategy_code))
@@ -2,7 +2,6 @@ from fastapi import APIRouter, Response
 from fastapi.responses import StreamingResponse
 from app.models.strategy import Strategy
 from app.db import get_session
-from app.services.backtest_service import run_backtest_on_code
 from sqlmodel import select
 import io
 import csv
@@ -23,6 +22,8 @@ def export_strategy_code(strategy_id: int):
 
 @router.get("/export/csv/{strategy_id}")
 def export_strategy_csv(strategy_id: int):
+    from app.services.backtest_service import run_backtest_on_code
+
     with get_session() as session:
         strategy = session.get(Strategy, strategy_id)
         if not strategy:
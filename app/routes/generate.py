@@ -1,13 +1,38 @@
 from fastapi import APIRouter
-from pydantic import BaseModel
-from app.services.llm_service import generate_strategy_code
+from pydantic import BaseModel, Field
+from app.services.llm_service import generate_strategy_code_async, stream_strategy_code
+from app.services import llm_cache
+from app.services.batch_generation_service import MAX_VARIANTS, generate_batch
+from app.utility.sse import sse_response
 
 router = APIRouter()
 
 class PromptRequest(BaseModel):
     user_prompt: str
 
+class BatchPromptRequest(BaseModel):
+    user_prompt: str
+    variants: int = Field(4, ge=1, le=MAX_VARIANTS)
+
 @router.post("/generate")
-def generate(prompt: PromptRequest):
-    code = generate_strategy_code(prompt.user_prompt)
+async def generate(prompt: PromptRequest):
+    code = await generate_strategy_code_async(prompt.user_prompt)
     return {"generated_code": code}
+
+
+@router.post("/generate/stream")
+async def generate_stream(prompt: PromptRequest):
+    """Generated code as server-sent events: delta chunks, then done with the full code"""
+    return sse_response(stream_strategy_code(prompt.user_prompt))
+
+
+@router.post("/generate/batch")
+async def generate_variants(request: BatchPromptRequest):
+    """Several variants at once; only those that validate and survive a smoke backtest, best first"""
+    return await generate_batch(request.user_prompt, request.variants)
+
+
+@router.get("/llm/cache/stats")
+def llm_cache_stats():
+    """Hit rates of the LLM response cache for /generate, /builder/translate and /explain"""
+    return llm_cache.stats()
@@ -1,11 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from starlette.concurrency import run_in_threadpool
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import Optional
-from app.services.leaderboard_service import submit_and_record, query_leaderboard
+from datetime import date, datetime
+from app.services.leaderboard_service import (
+    submit_and_record, query_leaderboard_cached, query_leaderboard_page_async, query_user_rank_cached, query_around_cached
+)
+from app.services import leaderboard_cache, leaderboard_snapshot_service
 from app.auth.utils import get_current_user
+from app.models.users import User
+from app.db import get_async_db
+from app.utility.pagination import encode_cursor
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/leaderboard")
 
+PERIOD_REGEX = "^(daily|weekly|alltime)$"
+SNAPSHOT_PERIOD_REGEX = "^(daily|weekly)$"
+
 class SubmitRequest(BaseModel):
     strategy_id: Optional[int]
     strategy_name: Optional[str]
@@ -14,7 +26,7 @@ class SubmitRequest(BaseModel):
     ticker: Optional[str] = "RELIANCE.NS"
 
 @router.post("/submit")
-def submit_result(req: SubmitRequest, current_user = Depends(get_current_user)):
+def submit_result(req: SubmitRequest, current_user: User = Depends(get_current_user)):
     res = submit_and_record(current_user, req.strategy_id, req.strategy_name or "unnamed", req.code, req.dataset, req.ticker)
     if "error" in res:
         raise HTTPException(status_code=400, detail=res["error"])
@@ -22,5 +34,83 @@ def submit_result(req: SubmitRequest, current_user = Depends(get_current_user)):
 
 
 @router.get("/top")
-def get_top(period: Optional[str] = Query("daily", regex="^(daily|weekly|alltime)$"), dataset: Optional[str] = None, limit: int = 50):
-    return {"period": period, "dataset": dataset, "top": query_leaderboard(period=period, dataset=dataset, limit=limit)}
\ No newline at end of file
+async def get_top(
+    period: Optional[str] = Query("daily", regex=PERIOD_REGEX),
+    dataset: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    strategy_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    # The unfiltered first page comes from Redis; later pages and filtered views seek in SQL
+    if cursor or strategy_id is not None or start or end:
+        try:
+            result = await query_leaderboard_page_async(db, period, dataset, limit, cursor, strategy_id, start, end)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"period": period, "dataset": dataset, "top": result["items"], "next_cursor": result["next_cursor"]}
+
+    #Sync Redis client, with a SQL fallback on a Redis outage
+    top = await run_in_threadpool(query_leaderboard_cached, period=period, dataset=dataset, limit=limit + 1)
+    next_cursor = encode_cursor((top[limit - 1]["score"], top[limit - 1]["id"])) if len(top) > limit else None
+    return {"period": period, "dataset": dataset, "top": top[:limit], "next_cursor": next_cursor}
+
+
+@router.get("/rank/me")
+def get_my_rank(period: Optional[str] = Query("daily", regex=PERIOD_REGEX), dataset: Optional[str] = None, current_user: User = Depends(get_current_user)):
+    entry = query_user_rank_cached(current_user.email, period=period, dataset=dataset)
+    if not entry:
+        raise HTTPException(status_code=404, detail="No leaderboard entry for this period")
+    return {"period": period, "dataset": dataset, "rank": entry["rank"], "entry": entry}
+
+
+@router.get("/around")
+def get_around(
+    rank: int = Query(..., ge=1),
+    radius: int = Query(5, ge=0, le=50),
+    period: Optional[str] = Query("daily", regex=PERIOD_REGEX),
+    dataset: Optional[str] = None
+):
+    return {"period": period, "dataset": dataset, "entries": query_around_cached(rank, radius, period=period, dataset=dataset)}
+
+
+@router.get("/snapshots/{period}")
+def list_snapshots(
+    period: str,
+    dataset: str = leaderboard_cache.ALL_DATASETS,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    limit: int = Query(100, le=1000)
+):
+    if period not in leaderboard_snapshot_service.SNAPSHOT_PERIODS:
+        raise HTTPException(status_code=404, detail="Unknown snapshot period")
+    return {"period": period, "dataset": dataset, "snapshots": leaderboard_snapshot_service.list_snapshots(period, dataset, start, end, limit)}
+
+
+@router.get("/snapshot/{period}")
+def get_snapshot(
+    period: str,
+    request: Request,
+    as_of: Optional[date] = Query(None, alias="date"),
+    dataset: str = leaderboard_cache.ALL_DATASETS
+):
+    """Frozen leaderboard as of a date (latest when no date is given), with ETag revalidation"""
+    if period not in leaderboard_snapshot_service.SNAPSHOT_PERIODS:
+        raise HTTPException(status_code=404, detail="Unknown snapshot period")
+    found = leaderboard_snapshot_service.get_snapshot(period, dataset, as_of)
+    if not found:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+
+    payload, content_hash, snapshot_date = found
+    # A dated snapshot never changes; "latest" moves once a day
+    headers = {
+        "ETag": f'"{content_hash}"',
+        "Cache-Control": "public, max-age=86400, immutable" if as_of else "public, max-age=300",
+        "X-Snapshot-Date": snapshot_date.isoformat()
+    }
+    if_none_match = request.headers.get("if-none-match", "")
+    if content_hash in [tag.strip().removeprefix("W/").strip('"') for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    return Response(content=payload, media_type="application/json", headers=headers)
\ No newline at end of file
@@ -1,26 +1,25 @@
 from datetime import datetime
 from typing import List
 
-from app.db import get_session
+from app.db import get_async_db, get_db
 from app.models.strategy_metrics import StrategyMetricsModel
-from app.services.backtest_service import get_strategy_returns
-from app.services.metrics import PerformanceMetrics
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 router = APIRouter(prefix="/metrics", tags=["metrics"])
 
 @router.get("/{strategy_id}")
 async def get_strategy_metrics(
     strategy_id: int,
-    session: Session = Depends(get_session)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get latest metrics for a strategy"""
     statement = select(StrategyMetricsModel).where(
         StrategyMetricsModel.strategy_id == strategy_id
-    ).order_by(StrategyMetricsModel.calculation_date.desc())
+    ).order_by(StrategyMetricsModel.calculation_date.desc()).limit(1)
     
-    metrics = session.exec(statement).first()
+    metrics = (await db.exec(statement)).first()
     
     if not metrics: 
         raise HTTPException(status_code=404, detail="Metrics not found for the given strategy ID")
@@ -31,9 +30,12 @@ async def get_strategy_metrics(
 async def calculate_strategy_metrics(
     strategy_id: int, 
     ticker: str = Query(default="AAPL", min_length=1, max_length=10),
-    session: Session = Depends(get_session)
+    session: Session = Depends(get_db)
 ):
     """Calculate and store metrics for a given strategy"""
+    from app.services.backtest_service import get_strategy_returns
+    from app.services.metrics import PerformanceMetrics
+
     try:
         print(f"[DEBUG] Ticker type: {type(ticker)}, value: {ticker}")
         # Pass the session to get_strategy_returns
@@ -65,9 +67,12 @@ async def calculate_strategy_metrics(
 async def get_strategy_returns_metrics(
     strategy_id: int,
     ticker: str = Query(default="AAPL", min_length=1, max_length=10),
-    session: Session = Depends(get_session)
+    session: Session = Depends(get_db)
 ):
     """Calculate metrics for a strategy based on its returns"""
+    from app.services.backtest_service import get_strategy_returns
+    from app.services.metrics import PerformanceMetrics
+
     try:
         print(f"[DEBUG] Ticker type: {type(ticker)}, value: {ticker}")
         # Ensure ticker is properly formatted
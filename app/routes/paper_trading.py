@@ -1,15 +1,23 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
 from typing import Optional, List
+from datetime import datetime
 from sqlmodel import Session
-from app.db import get_session
-from app.auth.utils import get_current_user
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.db import get_async_db, get_db, get_session
+from app.auth.utils import get_current_user, get_user_from_token
 from app.models.users import User
-from app.models.paper_trading import OrderSide, OrderType, PaperOrder
+from app.models.paper_trading import OrderSide, OrderType, OrderStatus, PaperOrder
 from app.services.paper_trading_service import PaperTradingService
+from app.services.paper_events import get_event_hub, pump
 
 router = APIRouter(prefix="/paper", tags=["Paper Trading"])
 
+#Routes that only read and write the database run on the async session. Routes that may
+#quote prices (market orders, live revaluation) stay sync so the quotes block a pool thread
+#rather than the event loop; service calls without an async version go through run_sync.
+
 class CreateOrderRequest(BaseModel):
     symbol: str
     side: OrderSide
@@ -19,6 +27,11 @@ class CreateOrderRequest(BaseModel):
     stop_price: Optional[float] = None
     strategy_id: Optional[int] = None
 
+class DeployStrategyRequest(BaseModel):
+    strategy_id: int
+    symbol: str
+    interval: str = Field("1m", pattern="^(1m|5m|15m|30m|1h|1d)$")
+
 class AccountResponse(BaseModel):
     id: int
     initial_capital: float
@@ -28,84 +41,83 @@ class AccountResponse(BaseModel):
     total_return_pct: float
 
 @router.post("/account/create")
-def create_account(
+async def create_account(
     initial_capital: float = Query(default=100000.0, ge=1000.0),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create or get paper trading account"""
-    with get_session() as session:
-        account = PaperTradingService.get_or_create_account(
-            user_id = current_user.id,
-            initial_capital = initial_capital,
-            session = session
-        )
-        return {
-            "account_id": account.id,
-            "initial_capital": account.initial_capital,
-            "current_balance": account.current_balance,
-            "available_cash": account.available_cash
-        }
+    account = await PaperTradingService.get_or_create_account_async(
+        user_id = current_user.id,
+        initial_capital = initial_capital,
+        db = db
+    )
+    return {
+        "account_id": account.id,
+        "initial_capital": account.initial_capital,
+        "current_balance": account.current_balance,
+        "available_cash": account.available_cash
+    }
 
 @router.get("/account")
-def get_account(current_user: User = Depends(get_current_user)):
+async def get_account(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     """Get Users paper trading account"""
-    with get_session() as session:
-        account = PaperTradingService.get_or_create_account(
-            user_id = current_user.id,
-            session = session
-        )
-        return {
-            "id": account.id,
-            "initial_capital": account.initial_capital,
-            "current_balance": account.current_balance,
-            "available_cash": account.available_cash,
-            "total_pnl": account.current_balance - account.initial_capital,
-            "total_return_pct": ((account.current_balance - account.initial_capital)/account.initial_capital)
-        }
+    account = await PaperTradingService.get_or_create_account_async(user_id = current_user.id, db = db)
+    return {
+        "id": account.id,
+        "initial_capital": account.initial_capital,
+        "current_balance": account.current_balance,
+        "available_cash": account.available_cash,
+        "total_pnl": account.current_balance - account.initial_capital,
+        "total_return_pct": ((account.current_balance - account.initial_capital)/account.initial_capital)
+    }
 
 
 @router.get("/portfolio")
-def get_portfolio(current_user: User = Depends(get_current_user)):
+def get_portfolio(
+    refresh: bool = Query(False, description="Revalue at live quotes instead of reading the latest snapshot"),
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_db)
+):
     """Get Complete Portfolio information"""
-    with get_session() as session:
-        account = PaperTradingService.get_or_create_account(
-            user_id = current_user.id,
-            session = session
-        )
-        portfolio = PaperTradingService.get_portfolio(account.id, session)
-        return portfolio
+    account = PaperTradingService.get_or_create_account(
+        user_id = current_user.id,
+        session = session
+    )
+    portfolio = PaperTradingService.get_portfolio(account.id, session, refresh=refresh)
+    return portfolio
 
 @router.post("/order")
 def create_order(
     request: CreateOrderRequest,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_db)
 ):
     """Create a new paper trading order"""
     try:
-        with get_session() as session:
-            account = PaperTradingService.get_or_create_account(
-                user_id = current_user.id,
-                session=session
-            )
-            order = PaperTradingService.create_order(
-                account_id=account.id,
-                symbol = request.symbol,
-                side = request.side,
-                order_type = request.order_type,
-                quanity = request.quantity,
-                price = request.price,
-                stop_price = request.stop_price,
-                strategy_id = request.strategy_id,
-                session = session
-            )
-            return {
-                "order_id": order.id,
-                "status": order.status,
-                "symbol": order.symbol,
-                "side": order.side,
-                "quantity": order.quantity,
-                "order_type": order.order_type
-            }
+        account = PaperTradingService.get_or_create_account(
+            user_id = current_user.id,
+            session=session
+        )
+        order = PaperTradingService.create_order(
+            account_id=account.id,
+            symbol = request.symbol,
+            side = request.side,
+            order_type = request.order_type,
+            quantity = request.quantity,
+            price = request.price,
+            stop_price = request.stop_price,
+            strategy_id = request.strategy_id,
+            session = session
+        )
+        return {
+            "order_id": order.id,
+            "status": order.status,
+            "symbol": order.symbol,
+            "side": order.side,
+            "quantity": order.quantity,
+            "order_type": order.order_type
+        }
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -113,115 +125,249 @@ def create_order(
 
 
 @router.get("/orders")
-def get_orders(
+async def get_orders(
     status: Optional[str] = Query(None),
-    limit: int = Query(default=50, le=100),
-    current_user: User = Depends(get_current_user)
+    symbol: Optional[str] = None,
+    strategy_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(default=50, ge=1, le=100),
+    cursor: Optional[str] = None,
+    paginated: bool = False,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get User's orders"""
-    with get_session() as session:
-        from sqlmodel import select
-        from app.models.paper_trading import PaperOrder, OrderStatus
+    """
+    Get User's orders, newest first, as a list.
 
-        account = PaperTradingService.get_or_create_account(
-            user_id = current_user.id,
-            session=session
-        )
+    With paginated=true (implied by cursor) the response is {items, next_cursor};
+    pass next_cursor back as cursor for the next page.
+    """
+    account = await PaperTradingService.get_or_create_account_async(user_id = current_user.id, db = db)
+
+    order_status = None
+    if status:
+        try:
+            order_status = OrderStatus(status.upper())
+        except ValueError:
+            pass
+
+    try:
+        result = await db.run_sync(lambda session: PaperTradingService.list_orders(
+            account.id, session,
+            status=order_status, symbol=symbol, strategy_id=strategy_id,
+            start=start, end=end, limit=limit, cursor=cursor
+        ))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        query = select(PaperOrder).where(PaperOrder.account_id == account.id)
-
-        if status:
-            try:
-                order_status = OrderStatus(status.upper())
-                query = query.where(PaperOrder.status == order_status)
-            except ValueError:
-                pass
-        
-        orders = session.exec(query.order_by(PaperOrder.created_at.desc()).limit()).all()
-        return [
-            {
-                "id": o.id,
-                "symbol": o.symbol,
-                "side": o.side,
-                "order_type": o.order_type,
-                "quantity": o.quantity,
-                "price": o.price,
-                "filled_quantity": o.filled_quantity,
-                "average_fill_price": o.average_fill_price,
-                "status": o.status,
-                "created_at": o.created_at.isoformat(),
-                "filled_at": o.filled_at.isoformat() if o.filled_at else None
-            }
-            for o in orders
-        ]
+    items = [
+        {
+            "id": o.id,
+            "symbol": o.symbol,
+            "side": o.side,
+            "order_type": o.order_type,
+            "quantity": o.quantity,
+            "price": o.price,
+            "filled_quantity": o.filled_quantity,
+            "average_fill_price": o.average_fill_price,
+            "status": o.status,
+            "strategy_id": o.strategy_id,
+            "created_at": o.created_at.isoformat(),
+            "filled_at": o.filled_at.isoformat() if o.filled_at else None
+        }
+        for o in result["items"]
+    ]
+    if not (paginated or cursor):
+        return items
+    return {"items": items, "next_cursor": result["next_cursor"]}
 
 @router.delete("/order/{order_id}")
-def cancel_order(order_id: int, current_user: User = Depends(get_current_user)):
+async def cancel_order(order_id: int, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
     """Cancel a pending order"""
-    with get_session() as session:
-        from app.models.paper_trading import PaperOrder
-
-        order = session.get(PaperOrder, order_id)
-        if not order:
-            raise HTTPException(status_code=404, detail="Order not found")
+    order = await db.get(PaperOrder, order_id)
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
 
-        account = PaperTradingService.get_or_create_account(
-            user_id=current_user.id,
-            session=session
-        )
+    account = await PaperTradingService.get_or_create_account_async(user_id=current_user.id, db=db)
 
-        if order.account_id != account.id:
-            raise HTTPException(status_code=403, detail="Not your order")
-        
-        success = PapertradingService.cancel_order(order_id, session)
-        if not success:
-            raise HTTPException(status_code=400, detail="Cannot cancel this order")
-        
-        return {"message": "Order Cancelled"}
+    if order.account_id != account.id:
+        raise HTTPException(status_code=403, detail="Not your order")
+    
+    success = await db.run_sync(lambda session: PaperTradingService.cancel_order(order_id, session))
+    if not success:
+        raise HTTPException(status_code=400, detail="Cannot cancel this order")
+    
+    return {"message": "Order Cancelled"}
 
 
 @router.get("/trades")
-def get_trades(
+async def get_trades(
     symbol: Optional[str] = None,
-    limit: int = Query(default=100, le=500),
-    current_user: User = Depends(get_current_user)
+    strategy_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(default=100, ge=1, le=500),
+    cursor: Optional[str] = None,
+    paginated: bool = False,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get user's trade history"""
-    with get_session() as session:
-        from sqlmodel import select
-        from app.model.paper_trading import PaperTrade
+    """
+    Get user's trade history, newest first, as a list.
 
-        account = PapertradingService.get_or_create_account(
-            user_id=current_user.id,
-            session=session
-        )
+    With paginated=true (implied by cursor) the response is {items, next_cursor};
+    pass next_cursor back as cursor for the next page.
+    """
+    account = await PaperTradingService.get_or_create_account_async(user_id=current_user.id, db=db)
 
-        query = select(PaperTrade).where(PaperTrade.account_id == account.id)
-        if symbol:
-            query = query.where(PaperTrade.symbol == symbol)
-        trades = session.exec(query.order_by(PaperTrade.timestamp.desc()).limit(limit)).all()
-
-        return [
-            {
-                "id": t.id,
-                "symbol": t.symbol,
-                "side": t.side,
-                "quantity": t.quantity,
-                "price": t.price,
-                "timestamp": t.timestamp.isoformat(),
-                "strategy_id": t.strategy_id
-            }
-            for t in trades
-        ]
+    try:
+        result = await db.run_sync(lambda session: PaperTradingService.list_trades(
+            account.id, session,
+            symbol=symbol, strategy_id=strategy_id,
+            start=start, end=end, limit=limit, cursor=cursor
+        ))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    items = [
+        {
+            "id": t.id,
+            "symbol": t.symbol,
+            "side": t.side,
+            "quantity": t.quantity,
+            "price": t.price,
+            "timestamp": t.timestamp.isoformat(),
+            "strategy_id": t.strategy_id
+        }
+        for t in result["items"]
+    ]
+    if not (paginated or cursor):
+        return items
+    return {"items": items, "next_cursor": result["next_cursor"]}
+
+@router.get("/equity-curve")
+def get_equity_curve(
+    points: int = Query(500, ge=2, le=5000),
+    method: str = Query("lttb", pattern="^(lttb|minmax)$"),
+    start: Optional[datetime] = Query(None),
+    end: Optional[datetime] = Query(None),
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(get_db)
+):
+    """Get the account's equity history downsampled to at most `points` samples"""
+    #Sync: downsampling a long history is CPU work that belongs on a pool thread
+    account = PaperTradingService.get_or_create_account(
+        user_id=current_user.id,
+        session=session
+    )
+    return PaperTradingService.get_equity_curve(
+        account.id, session, start=start, end=end, points=points, method=method
+    )
 
 @router.get("/positions")
-def get_positions(current_user: User=Depends(get_current_user)):
+def get_positions(
+    refresh: bool = Query(False, description="Revalue at live quotes instead of reading the latest snapshot"),
+    current_user: User=Depends(get_current_user),
+    session: Session = Depends(get_db)
+):
     """Get user's current positions"""
-    with get_session() as session:
-        account = PaperTradingService.get_or_create_account(
-            user_id=current_user.id,
-            session=session
-        )
+    account = PaperTradingService.get_or_create_account(
+        user_id=current_user.id,
+        session=session
+    )
 
-        portfolio = PaperTradingService.get_portfolio(account.id, session)
-        return portfolio
\ No newline at end of file
+    valuation = PaperTradingService.get_valuation(account.id, session, refresh=refresh)
+    return {
+        "positions": valuation["positions"],
+        "valuation": {
+            "source": valuation["source"],
+            "as_of": valuation["as_of"],
+            "age_seconds": valuation["age_seconds"]
+        }
+    }
+
+def _deployment_to_dict(d) -> dict:
+    return {
+        "id": d.id,
+        "strategy_id": d.strategy_id,
+        "symbol": d.symbol,
+        "interval": d.interval,
+        "is_active": d.is_active,
+        "last_bar_at": d.last_bar_at.isoformat() if d.last_bar_at else None,
+        "error": d.error,
+        "created_at": d.created_at.isoformat()
+    }
+
+@router.post("/deployments")
+async def deploy_strategy(
+    request: DeployStrategyRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Run a saved strategy live against a symbol; its orders are placed on the user's account"""
+    account = await PaperTradingService.get_or_create_account_async(user_id=current_user.id, db=db)
+    try:
+        deployment = await db.run_sync(lambda session: PaperTradingService.deploy_strategy(
+            account.id, request.strategy_id, request.symbol, request.interval, session, owner=current_user.email
+        ))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return _deployment_to_dict(deployment)
+
+@router.get("/deployments")
+async def list_deployments(current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    """List the user's live strategy deployments"""
+    account = await PaperTradingService.get_or_create_account_async(user_id=current_user.id, db=db)
+    deployments = await db.run_sync(lambda session: PaperTradingService.list_deployments(account.id, session))
+    return [_deployment_to_dict(d) for d in deployments]
+
+@router.delete("/deployments/{deployment_id}")
+async def stop_deployment(deployment_id: int, current_user: User = Depends(get_current_user), db: AsyncSession = Depends(get_async_db)):
+    """Stop a live strategy deployment"""
+    account = await PaperTradingService.get_or_create_account_async(user_id=current_user.id, db=db)
+    stopped = await db.run_sync(lambda session: PaperTradingService.stop_deployment(deployment_id, account.id, session))
+    if not stopped:
+        raise HTTPException(status_code=404, detail="Deployment not found")
+    return {"message": "Deployment stopped"}
+
+
+@router.websocket("/ws")
+async def paper_events_socket(websocket: WebSocket, token: str = Query(...)):
+    """
+    Push fills, order status changes and valuation updates for the user's account.
+
+    The first message is the latest valuation snapshot; after that only changes are
+    sent. A client that falls too far behind is closed with code 1013 and should
+    reload over REST before reconnecting.
+    """
+    user = await run_in_threadpool(get_user_from_token, token)
+    if not user:
+        await websocket.close(code=1008)
+        return
+
+    def load_account_id():
+        with get_session() as session:
+            return PaperTradingService.get_or_create_account(user_id=user.id, session=session).id
+
+    def load_valuation():
+        with get_session() as session:
+            return PaperTradingService.get_valuation(account_id, session)
+
+    account_id = await run_in_threadpool(load_account_id)
+    await websocket.accept()
+
+    hub = get_event_hub()
+    try:
+        subscriber = await hub.subscribe(account_id)
+    except Exception:
+        #Redis is unreachable; the client reconnects later
+        await websocket.close(code=1011)
+        return
+    try:
+        #Read only once the subscription is live, so nothing committed in between is missed
+        valuation = await run_in_threadpool(load_valuation)
+        await websocket.send_json({"type": "snapshot", "account_id": account_id, "data": valuation})
+        await pump(websocket, subscriber)
+    finally:
+        await hub.unsubscribe(account_id, subscriber)
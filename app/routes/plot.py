@@ -1,10 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from app.services.plot_service import generate_backtest_plot
 from app.models.strategy import Strategy
-from app.db import get_session
+from app.db import get_db
 from sqlmodel import Session, select
-from app.services.plot_service import generate_backtest_plot
 
 router = APIRouter()
 
@@ -13,7 +11,9 @@ class PlotRequest(BaseModel):
     ticker: str
 
 @router.post("/plot")
-def plot_backtest(request: PlotRequest, session: Session = Depends(get_session)):
+def plot_backtest(request: PlotRequest, session: Session = Depends(get_db)):
+    from app.services.plot_service import generate_backtest_plot
+
     try:
         query = select(Strategy).where(Strategy.id == int(request.strategy_id))
         strategy = session.exec(query).first()
@@ -3,12 +3,13 @@ from sqlmodel import select
 from app.db import get_session
 from app.models.strategy import Strategy
 from app.auth.utils import get_current_user
+from app.models.users import User
 
 router = APIRouter()
 
 @router.post("/strategy/save")
-def save_strategy(strategy: Strategy, user_email: str = Depends(get_current_user)):
-    strategy.user_id = user_email
+def save_strategy(strategy: Strategy, current_user: User = Depends(get_current_user)):
+    strategy.user_id = current_user.email
     with get_session() as session:
         session.add(strategy)
         session.commit()
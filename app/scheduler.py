@@ -1,20 +1,43 @@
-from apscheduler.schedulers.background import BackgroundScheduler
 from datetime import datetime
-from app.services.leaderboard_service import query_leaderboard
+from app.utility.redis_lock import run_once
 import logging
 
 logger = logging.getLogger("scheduler")
 
-def start_scheduler(app):
+def start_scheduler():
+    """Start the nightly jobs; the caller shuts the returned scheduler down"""
+    from apscheduler.schedulers.background import BackgroundScheduler
+
     scheduler = BackgroundScheduler()
+    #Every uvicorn worker schedules these; the Redis lock lets one of them run each firing
+    #Job modules are imported when a job first runs, keeping pandas and yfinance out of startup
+    @run_once("nightly_recompute", ttl_seconds=6 * 3600)
     def daily_job():
-        logger.info("Running daily leaderboard job at %s", datetime.utcnow())
-        top_daily = query_leaderboard(period="daily", limit=100)
-        logger.info("Top daily leaderboard: %s", len(top_daily))
+        from app.services.nightly_recompute_service import run_nightly_recompute
+        logger.info("Running nightly recompute job at %s", datetime.utcnow())
+        summary = run_nightly_recompute()
+        logger.info("Nightly recompute summary: %s", summary)
+
+    @run_once("leaderboard_snapshots", ttl_seconds=3600)
+    def snapshot_job():
+        from app.services.leaderboard_snapshot_service import freeze_daily_snapshots
+        logger.info("Freezing leaderboard snapshots at %s", datetime.utcnow())
+        freeze_daily_snapshots()
+
+    @run_once("leaderboard_trim", ttl_seconds=3600)
+    def trim_job():
+        from app.services.leaderboard_cache import trim
+        logger.info("Trimmed %s leaderboard cache entries", trim())
+
+    @run_once("paper_archive", ttl_seconds=3600)
+    def archive_job():
+        from app.services.paper_archive_service import archive_old_partitions
+        logger.info("Archiving old paper trades and orders at %s", datetime.utcnow())
+        logger.info("Paper archive summary: %s", archive_old_partitions())
 
     scheduler.add_job(daily_job, "cron", hour=0, minute=5)
+    scheduler.add_job(archive_job, "cron", hour=1, minute=0)
+    scheduler.add_job(snapshot_job, "cron", hour=0, minute=1)
+    scheduler.add_job(trim_job, "cron", hour=0, minute=30)
     scheduler.start()
-
-    @app.on_event("shutdown")
-    def _():
-        scheduler.shutdown()
+    return scheduler
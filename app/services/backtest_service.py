@@ -1,11 +1,20 @@
 import backtrader as bt
+import backtrader.metabase
 import yfinance as yf
 import numpy as np
 import pandas as pd
-from app.utility.validators import validate_strategy_code
+import threading
+from collections import OrderedDict
+from app.utility.code_fingerprint import fingerprint
+from app.utility.validators import SANDBOX_MODULE, strategy_namespace, validate_strategy_code
+from app.services.data_requirements import analyze_code
+from app.services.market_data_service import MarketDataService
 from app.models.strategy import Strategy
 from app.db import get_session
 from sqlmodel import select, Session
+from datetime import datetime
+from types import CodeType
+from typing import Optional
 
 def calculate_cagr(initial_value, final_value, periods):
     return ((final_value / initial_value) ** (1 / periods)) - 1
@@ -13,19 +22,114 @@ def calculate_cagr(initial_value, final_value, periods):
 def calculate_sharpe_ratio(returns):
     return np.mean(returns)/np.std(returns) * np.sqrt(252)  if np.std(returns) else 0
 
-def run_backtest_on_code(strategy_code: str, ticker: str):
-    local_vars = {}
+#Compiled strategy code by fingerprint, least recently used first
+STRATEGY_CODE_CACHE_SIZE = 256
+_strategy_code: "OrderedDict[str, CodeType]" = OrderedDict()
+_strategy_code_lock = threading.Lock()
+#backtrader names each params class it derives on backtrader.metabase, adding digits until the
+#name is free; execs are serialized so the names one adds can be dropped again afterwards
+_exec_lock = threading.Lock()
+
+def _compiled(strategy_code: str) -> CodeType:
+    key = fingerprint(strategy_code)
+    with _strategy_code_lock:
+        code = _strategy_code.get(key)
+        if code is not None:
+            _strategy_code.move_to_end(key)
+            return code
+    code = compile(strategy_code, "<strategy>", "exec")
+    with _strategy_code_lock:
+        _strategy_code[key] = code
+        if len(_strategy_code) > STRATEGY_CODE_CACHE_SIZE:
+            _strategy_code.popitem(last=False)
+    return code
+
+def load_strategy_class(strategy_code: str):
+    """
+    Exec strategy code and return the first backtrader Strategy subclass it defines.
+
+    Code that fails validate_strategy_code raises ValueError without being run; valid
+    code runs with the safe builtins only. The compiled code is reused for code with
+    the same fingerprint, but every call execs it into fresh globals, so state a run
+    leaves on its class never reaches the next one.
+    """
+    validation = validate_strategy_code(strategy_code)
+    if not validation["valid"]:
+        raise ValueError(validation["reason"])
+
+    code = _compiled(strategy_code)
+    namespace = strategy_namespace(bt=bt)
+    with _exec_lock:
+        registered = set(vars(backtrader.metabase))
+        try:
+            exec(code, namespace)
+        finally:
+            #Otherwise every exec makes the next one's search for a free name longer
+            for name in set(vars(backtrader.metabase)) - registered:
+                delattr(backtrader.metabase, name)
+    return next(
+        (v for v in namespace.values() if isinstance(v, type) and issubclass(v, bt.Strategy) and v.__module__ == SANDBOX_MODULE),
+        None
+    )
+
+def normalize_ohlcv(df: pd.DataFrame) -> pd.DataFrame:
+    """Flatten yfinance MultiIndex columns and lowercase them for PandasData"""
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = [col[0] if isinstance(col, tuple) else col for col in df.columns]
+    df.columns = [str(col).lower() for col in df.columns]
+    return df
+
+def run_backtest_on_frame(strategy_code: str, df: pd.DataFrame) -> dict:
+    """Run a strategy over already loaded bars and return daily returns plus leaderboard metrics"""
+    strategy_class = load_strategy_class(strategy_code)
+    if not strategy_class:
+        return {"error": "No valid backtrader Strategy found in code."}
+    if df is None or df.empty:
+        return {"error": "No data for backtest"}
+
+    cerebro = bt.Cerebro()
+    cerebro.broker.setcash(100000)
+    cerebro.adddata(bt.feeds.PandasData(dataname=df))
+    cerebro.addstrategy(strategy_class)
+    cerebro.addanalyzer(bt.analyzers.TimeReturn, _name='timereturn')
+    cerebro.addanalyzer(bt.analyzers.SharpeRatio, _name='sharpe')
+    cerebro.addanalyzer(bt.analyzers.DrawDown, _name='drawdown')
+    cerebro.addanalyzer(bt.analyzers.Returns, _name='returns')
+    r = cerebro.run()[0]
+
+    returns = pd.Series(r.analyzers.timereturn.get_analysis(), dtype=float)
+    if returns.empty:
+        returns = pd.Series([0.0] * len(df))
+
+    # DrawDown reports percent; store a fraction like rtot so compute_score scales both alike
+    max_dd = r.analyzers.drawdown.get_analysis().get('max', {}).get('drawdown')
+    return {
+        "returns": returns,
+        "metrics": {
+            "Sharpe Ratio": r.analyzers.sharpe.get_analysis().get('sharperatio', None),
+            "Max Drawdown": -max_dd / 100.0 if max_dd is not None else None,
+            "Total Return": r.analyzers.returns.get_analysis().get('rtot', None)
+        }
+    }
+
+def load_backtest_data(strategy_code: str, ticker: str, start: Optional[datetime] = None, end: Optional[datetime] = None):
+    """
+    A year of daily bars, or with a start date just the window plus the warmup the
+    strategy's indicators need, as worked out from its code.
+    """
+    if start is None:
+        return yf.download(ticker, period="1y")
+    requirements = analyze_code(strategy_code)
+    return MarketDataService.get_history(ticker, start, end, requirements.warmup_bars, requirements.interval)
+
+def run_backtest_on_code(strategy_code: str, ticker: str, start: Optional[datetime] = None, end: Optional[datetime] = None):
     try:
-        exec(strategy_code, globals(), local_vars)
-        strategy_class = next(
-            (v for v in local_vars.values() if isinstance(v, type) and issubclass(v, bt.Strategy)), 
-            None
-        )
+        strategy_class = load_strategy_class(strategy_code)
         if not strategy_class:
             return {"error": "No valid backtrader Strategy found in code."}
 
-        df = yf.download(ticker, period="1y")
-        if df.empty:
+        df = load_backtest_data(strategy_code, ticker, start, end)
+        if df is None or df.empty:
             return {"error": f"No data for ticker: {ticker}"}
 
         cerebro = bt.Cerebro()
@@ -46,22 +150,20 @@ def run_backtest_on_code(strategy_code: str, ticker: str):
     except Exception as e:
         return {"error": str(e)}
 
-def run_backtest_results_only(strategy_code:str, ticker:str):
+def run_backtest_results_only(strategy_code:str, ticker:str, start: Optional[datetime] = None, end: Optional[datetime] = None):
     validation = validate_strategy_code(strategy_code)
     if not validation["valid"]:
-        return {"error": validation["message"]}
+        return {"error": validation["reason"]}
     
-    local_vars = {}
     try:
-        exec(strategy_code, globals(), local_vars)
-        strategy_class = next(
-            (v for v in local_vars.values() if isinstance(v, type) and issubclass(v, bt.Strategy)), 
-        )
+        strategy_class = load_strategy_class(strategy_code)
         if not strategy_class:
             return {"error":"No valid Strategy Class"}
         
-        df = yf.download(ticker, period="1y")
-        if isinstance(df.columns, pd.MultIndex):
+        df = load_backtest_data(strategy_code, ticker, start, end)
+        if df is None or df.empty:
+            return {"error": f"No data for ticker: {ticker}"}
+        if isinstance(df.columns, pd.MultiIndex):
             df.columns = [col[0] if isinstance(col, tuple) else col for col in df.columns]
         
         cerebro = bt.Cerebro()
@@ -76,10 +178,11 @@ def run_backtest_results_only(strategy_code:str, ticker:str):
 
         results = cerebro.run()
         r = results[0]
+        max_dd = r.analyzers.drawdown.get_analysis().get('max', {}).get('drawdown')
 
         metrics = {
-            "Share Ratio": r.analyzers.sharpe.get_analysis().get('sharperatio', None),
-            "Max Drawdown": r.analyzers.drawdown.get_analysis().get('max', None),
+            "Sharpe Ratio": r.analyzers.sharpe.get_analysis().get('sharperatio', None),
+            "Max Drawdown": -max_dd / 100.0 if max_dd is not None else None,
             "Total Return": r.analyzers.returns.get_analysis().get('rtot', None)
         }
 
@@ -117,14 +220,8 @@ async def get_strategy_returns(strategy_id: int, session: Session, ticker: str =
         print(f"[DEBUG] Strategy code preview: {strategy.code[:100] if strategy.code else 'None'}")
             
         # Execute strategy code
-        local_vars = {}
         print(f"[DEBUG] Executing strategy code")
-        exec(strategy.code, globals(), local_vars)
-        strategy_class = next(
-            (v for v in local_vars.values() 
-             if isinstance(v, type) and issubclass(v, bt.Strategy)),
-            None
-        )
+        strategy_class = load_strategy_class(strategy.code)
         
         if not strategy_class:
             raise ValueError("No valid Strategy class found")
@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import re
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict, List
+
+from app.services import llm_cache, llm_client
+from app.services.leaderboard_service import compute_score
+from app.services.llm_service import GENERATE_TEMPLATE_VERSION, build_generate_prompt
+from app.utility.validators import validate_strategy_code
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger("batch_generation")
+
+MAX_VARIANTS = int(os.getenv("BATCH_MAX_VARIANTS", 8))
+SMOKE_WORKERS = int(os.getenv("BATCH_SMOKE_WORKERS", min(4, os.cpu_count() or 2)))
+SMOKE_TIMEOUT_SECONDS = float(os.getenv("BATCH_SMOKE_TIMEOUT_SECONDS", 20))
+#Address space of a smoke-test process; a candidate allocating without bound fails instead
+SMOKE_MEMORY_MB = int(os.getenv("BATCH_SMOKE_MEMORY_MB", 1024))
+#A year of daily bars: enough for long lookbacks to warm up and still trade
+SMOKE_BARS = 260
+SMOKE_SEED = 42
+
+_FENCE = re.compile(r"^```[\w]*\n(.*?)\n?```\s*$", re.S)
+
+
+def variant_prompt(user_prompt: str, variant: int, variants: int) -> str:
+    """Each variant gets its own prompt, so each gets its own LLM answer and cache entry"""
+    if variants == 1:
+        return user_prompt
+    return (
+        f"{user_prompt}\n\n"
+        f"This is variant {variant + 1} of {variants}: take a distinct approach from the other variants, "
+        "for example different indicators, parameters or exit rules."
+    )
+
+
+def strip_fences(code: str) -> str:
+    """Drop a markdown code fence the model added despite being asked not to"""
+    match = _FENCE.match(code.strip())
+    return match.group(1) if match else code
+
+
+@lru_cache(maxsize=1)
+def smoke_bars() -> "pd.DataFrame":
+    """Deterministic random-walk daily OHLCV with some trend and volatility changes"""
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(SMOKE_SEED)
+    drift = np.repeat(rng.normal(0, 0.002, SMOKE_BARS // 20 + 1), 20)[:SMOKE_BARS]
+    vol = np.repeat(rng.uniform(0.008, 0.03, SMOKE_BARS // 20 + 1), 20)[:SMOKE_BARS]
+    close = 100 * np.exp(np.cumsum(rng.normal(drift, vol)))
+    spread = close * rng.uniform(0.002, 0.02, SMOKE_BARS)
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    return pd.DataFrame({
+        "open": open_,
+        "high": np.maximum(open_, close) + spread / 2,
+        "low": np.minimum(open_, close) - spread / 2,
+        "close": close,
+        "volume": rng.integers(100_000, 1_000_000, SMOKE_BARS).astype(float),
+    }, index=pd.bdate_range("2020-01-01", periods=SMOKE_BARS))
+
+
+def smoke_test(code: str) -> Dict[str, Any]:
+    """A short backtest on the synthetic bars, errors returned rather than raised"""
+    from app.services.backtest_service import run_backtest_on_frame
+
+    try:
+        result = run_backtest_on_frame(code, smoke_bars().iloc[:SMOKE_BARS].copy())
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+    if "error" in result:
+        return result
+    return {"metrics": result["metrics"]}
+
+
+def _smoke_child(code: str, conn):
+    """Entry point of a smoke-test process: CPU and memory capped, result sent back on conn"""
+    import resource
+    cpu = int(SMOKE_TIMEOUT_SECONDS) + 1
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu))
+    memory = SMOKE_MEMORY_MB * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+    try:
+        conn.send(smoke_test(code))
+    except MemoryError:
+        conn.send({"error": f"Smoke test used more than {SMOKE_MEMORY_MB} MB"})
+    finally:
+        conn.close()
+
+
+_context = None
+
+def _smoke_context():
+    """forkserver: each test forks from a server that already imported the backtest stack"""
+    global _context
+    if _context is None:
+        _context = multiprocessing.get_context("forkserver")
+        _context.set_forkserver_preload(["app.services.backtest_service", __name__])
+    return _context
+
+
+def run_smoke_process(code: str, timeout: float = SMOKE_TIMEOUT_SECONDS) -> Dict[str, Any]:
+    """
+    Smoke-test code in a process of its own, killed once the timeout passes.
+
+    A candidate stuck in next() dies with its process instead of holding a shared
+    worker for later requests.
+    """
+    ctx = _smoke_context()
+    receiver, sender = ctx.Pipe(duplex=False)
+    process = ctx.Process(target=_smoke_child, args=(code, sender), daemon=True)
+    process.start()
+    sender.close()
+    try:
+        if receiver.poll(timeout):
+            return receiver.recv()
+        return {"error": f"Smoke test took longer than {timeout:.0f}s"}
+    except EOFError:
+        #Killed by its CPU limit, or crashed, before sending a result
+        return {"error": f"Smoke test process exited with code {process.exitcode}"}
+    finally:
+        receiver.close()
+        if process.is_alive():
+            process.terminate()
+            process.join(1)
+            if process.is_alive():
+                process.kill()
+        process.join()
+
+
+_slots = None
+
+def _smoke_slots() -> asyncio.Semaphore:
+    """At most SMOKE_WORKERS smoke processes per API process, across requests"""
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(SMOKE_WORKERS)
+    return _slots
+
+
+async def _generate(user_prompt: str, variant: int, variants: int) -> str:
+    prompt = variant_prompt(user_prompt, variant, variants)
+    code = await llm_client.complete_cached(
+        "generate", GENERATE_TEMPLATE_VERSION, llm_cache.normalize_prompt(prompt), build_generate_prompt(prompt)
+    )
+    return strip_fences(code)
+
+
+async def _smoke(code: str) -> Dict[str, Any]:
+    async with _smoke_slots():
+        return await asyncio.to_thread(run_smoke_process, code)
+
+
+async def generate_batch(user_prompt: str, variants: int) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Generate variants concurrently, validate them and smoke-test the valid ones in
+    parallel. Returns the candidates that passed, best compute_score first, and
+    the stage and reason each other variant failed at.
+    """
+    generated = await asyncio.gather(
+        *[_generate(user_prompt, i, variants) for i in range(variants)], return_exceptions=True
+    )
+
+    rejected, valid = [], []
+    for i, code in enumerate(generated):
+        if isinstance(code, Exception):
+            logger.warning(f"Variant {i} generation failed: {code!r}")
+            rejected.append({"variant": i, "stage": "generate", "reason": str(code)})
+            continue
+        validation = validate_strategy_code(code)
+        if not validation["valid"]:
+            rejected.append({"variant": i, "stage": "validate", "reason": validation["reason"]})
+            continue
+        valid.append((i, code))
+
+    smoked = await asyncio.gather(*[_smoke(code) for _, code in valid])
+
+    candidates = []
+    for (i, code), result in zip(valid, smoked):
+        if "error" in result:
+            rejected.append({"variant": i, "stage": "smoke", "reason": result["error"]})
+            continue
+        candidates.append({
+            "variant": i,
+            "code": code,
+            "smoke_metrics": result["metrics"],
+            "smoke_score": compute_score(result["metrics"]),
+        })
+
+    candidates.sort(key=lambda c: c["smoke_score"], reverse=True)
+    rejected.sort(key=lambda r: r["variant"])
+    return {"candidates": candidates, "rejected": rejected}
@@ -0,0 +1,259 @@
+import math
+import re
+from typing import List, Optional, Tuple, Union
+
+from app.models.strategy_blueprint import StrategyBlueprint, EntryCondition, ExitCondition, RiskManagement
+
+DEFAULT_LOOKBACK = {"sma": 20, "ema": 20, "rsi": 14, "zscore": 20, "bollinger": 20, "atr": 14}
+#Level compared against when a condition has neither a value nor a threshold
+DEFAULT_LEVEL = {"rsi": 50.0, "zscore": 0.0, "macd": 0.0}
+ATR_STOP_PERIOD = 14
+DEFAULT_ATR_STOP_MULTIPLE = 2.0
+
+COMPARISONS = {">", "<", ">=", "<="}
+CROSSES = {"crosses_above": "> 0", "crosses_below": "< 0"}
+
+
+class BlueprintCompileError(ValueError):
+    """The blueprint asks for something the templates cannot express"""
+
+
+#A condition operand: a backtrader line expression, or a number emitted as a literal
+Operand = Union[str, float]
+
+
+def _number(value: float) -> str:
+    value = float(value)
+    if not math.isfinite(value):
+        raise BlueprintCompileError(f"{value} is not a usable level")
+    return repr(value)
+
+
+def _level(cond) -> Optional[float]:
+    if cond.value is not None:
+        return cond.value
+    if cond.params.threshold is not None:
+        return cond.params.threshold
+    return DEFAULT_LEVEL.get(cond.indicator)
+
+
+def _indicator(cond, name: str) -> List[str]:
+    """__init__ lines that build the indicator of one condition as self.<name>"""
+    p = cond.params
+    lookback = p.lookback or DEFAULT_LOOKBACK.get(cond.indicator)
+    if lookback is not None and lookback < 1:
+        raise BlueprintCompileError(f"{cond.indicator} lookback must be at least 1")
+    close = "self.data.close"
+    if cond.indicator == "sma":
+        return [f"self.{name} = bt.indicators.SMA({close}, period={lookback})"]
+    if cond.indicator == "ema":
+        return [f"self.{name} = bt.indicators.EMA({close}, period={lookback})"]
+    if cond.indicator == "rsi":
+        return [f"self.{name} = bt.indicators.RSI({close}, period={lookback})"]
+    if cond.indicator == "atr":
+        return [f"self.{name} = bt.indicators.ATR(self.data, period={lookback})"]
+    if cond.indicator == "zscore":
+        return [
+            f"self.{name} = bt.DivByZero(",
+            f"    {close} - bt.indicators.SMA({close}, period={lookback}),",
+            f"    bt.indicators.StdDev({close}, period={lookback}),",
+            "    0.0",
+            ")",
+        ]
+    if cond.indicator == "macd":
+        return [f"self.{name} = bt.indicators.MACD({close})"]
+    if cond.indicator == "bollinger":
+        return [f"self.{name} = bt.indicators.BollingerBands({close}, period={lookback}, devfactor={_number(p.multiplier or 2.0)})"]
+    raise BlueprintCompileError(f"Unsupported indicator: {cond.indicator}")
+
+
+def _operands(cond, name: str) -> Tuple[Operand, Operand]:
+    """
+    The two lines a condition compares, as backtrader line expressions.
+
+    Price-scale indicators (moving averages, Bollinger bands) are compared with the
+    close when no value is given; oscillators with their value, threshold or a
+    neutral default. MACD without a value is compared with its signal line, ATR
+    without one with its own moving average, and Bollinger with a value compares %B
+    (0 = lower band, 1 = upper band).
+    """
+    ind = f"self.{name}"
+    level = _level(cond)
+    if cond.indicator in ("sma", "ema"):
+        return ("self.data.close", ind) if cond.value is None else (ind, float(cond.value))
+    if cond.indicator == "macd":
+        return (f"{ind}.macd", f"{ind}.signal") if cond.value is None else (f"{ind}.macd", float(cond.value))
+    if cond.indicator == "atr" and level is None:
+        #ATR is in price units, so no fixed level fits every asset; above average means expanding
+        lookback = cond.params.lookback or DEFAULT_LOOKBACK["atr"]
+        return ind, f"bt.indicators.SMA({ind}, period={lookback})"
+    if cond.indicator == "bollinger":
+        if cond.value is not None:
+            return f"bt.DivByZero(self.data.close - {ind}.bot, {ind}.top - {ind}.bot, 0.5)", float(cond.value)
+        band = "top" if cond.operator in (">", ">=", "crosses_above") else "bot"
+        return "self.data.close", f"{ind}.{band}"
+    if level is None:
+        raise BlueprintCompileError(f"{cond.indicator} {cond.operator} needs a value or threshold")
+    return ind, float(level)
+
+
+def _condition(cond, name: str) -> Tuple[List[str], str]:
+    """__init__ lines and the next() expression for one entry or exit condition"""
+    init = _indicator(cond, name)
+    left, right = _operands(cond, name)
+    if cond.operator in CROSSES:
+        init.append(f"self.{name}_cross = bt.indicators.CrossOver({_source(left)}, {_source(right)})")
+        return init, f"self.{name}_cross[0] {CROSSES[cond.operator]}"
+    if cond.operator not in COMPARISONS:
+        raise BlueprintCompileError(f"Unsupported operator: {cond.operator}")
+    return init, f"{_current(left, init, f'{name}_left')} {cond.operator} {_current(right, init, f'{name}_right')}"
+
+
+def _source(operand: Operand) -> str:
+    return operand if isinstance(operand, str) else _number(operand)
+
+
+def _current(expr: Operand, init: List[str], name: str) -> str:
+    """Current value of an operand in next(); computed expressions become lines in __init__"""
+    if not isinstance(expr, str):
+        return _number(expr)
+    if not re.fullmatch(r"[\w.]+", expr):
+        init.append(f"self.{name} = {expr}")
+        expr = f"self.{name}"
+    return f"{expr}[0]"
+
+
+def _parse_stop(stop_loss: Union[float, str, None]) -> Tuple[Optional[float], Optional[float]]:
+    """(percent, ATR multiple) from a stop loss like 2, "2%", "atr" or "1.5 x ATR" """
+    if stop_loss is None:
+        return None, None
+    if isinstance(stop_loss, (int, float)):
+        return float(stop_loss), None
+    text = stop_loss.strip().lower()
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)?\s*[x*]?\s*atr", text)
+    if match:
+        return None, float(match.group(1)) if match.group(1) else DEFAULT_ATR_STOP_MULTIPLE
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*%?", text)
+    if match:
+        return float(match.group(1)), None
+    raise BlueprintCompileError(f"Unrecognized stop loss: {stop_loss!r}")
+
+
+def compile_blueprint(bp: StrategyBlueprint) -> str:
+    """
+    Backtrader source for a blueprint, without the LLM.
+
+    Entry conditions must all hold to open a long position; any exit condition,
+    stop, take profit or trailing stop closes it. Raises BlueprintCompileError for
+    blueprints the templates cannot express.
+    """
+    if not bp.entry:
+        raise BlueprintCompileError("A blueprint needs at least one entry condition")
+
+    init: List[str] = []
+    entry_exprs, exit_exprs = [], []
+    for i, cond in enumerate(bp.entry):
+        lines, expr = _condition(cond, f"entry_{i}")
+        init += lines
+        entry_exprs.append(expr)
+    for i, cond in enumerate(bp.exit):
+        lines, expr = _condition(cond, f"exit_{i}")
+        init += lines
+        exit_exprs.append(expr)
+
+    risk = bp.risk or RiskManagement(stop_loss=None, take_profit=None, trailing_stop=None)
+    stop_pct, stop_atr = _parse_stop(risk.stop_loss)
+    sizing = bp.position_sizing or "fixed"
+
+    params = []
+    if stop_pct is not None:
+        params.append(("stop_loss", stop_pct / 100))
+    if stop_atr is not None:
+        params.append(("stop_atr", stop_atr))
+    if risk.take_profit is not None:
+        params.append(("take_profit", risk.take_profit / 100))
+    if risk.trailing_stop is not None:
+        params.append(("trailing_stop", risk.trailing_stop / 100))
+    if sizing == "fixed":
+        params.append(("stake", 10))
+    elif sizing == "percent":
+        params.append(("percent", 0.1))
+    else:
+        params.append(("risk_per_trade", 0.01))
+
+    needs_atr = stop_atr is not None or (sizing == "risk_adjusted" and stop_pct is None)
+    if needs_atr:
+        init.append(f"self.stop_range = bt.indicators.ATR(self.data, period={ATR_STOP_PERIOD})")
+
+    if sizing == "fixed":
+        size = "self.p.stake"
+    elif sizing == "percent":
+        size = "int(self.broker.getvalue() * self.p.percent / price)"
+    else:
+        if stop_pct is not None:
+            distance = "price * self.p.stop_loss"
+        elif stop_atr is not None:
+            distance = "self.p.stop_atr * self.stop_range[0]"
+        else:
+            distance = f"{_number(DEFAULT_ATR_STOP_MULTIPLE)} * self.stop_range[0]"
+        size = f"int(self.broker.getvalue() * self.p.risk_per_trade / max({distance}, 1e-9))"
+
+    closes = []
+    if stop_pct is not None:
+        closes.append("price <= self.entry_price * (1 - self.p.stop_loss)")
+    if stop_atr is not None:
+        closes.append("price <= self.entry_price - self.p.stop_atr * self.entry_range")
+    if risk.take_profit is not None:
+        closes.append("price >= self.entry_price * (1 + self.p.take_profit)")
+    if risk.trailing_stop is not None:
+        closes.append("price <= self.peak * (1 - self.p.trailing_stop)")
+    closes += exit_exprs
+
+    out = [
+        "import backtrader as bt",
+        "",
+        "",
+        "class BlueprintStrategy(bt.Strategy):",
+        #Blueprint strings stay out of the source; only validated numbers and names are emitted
+        '    """Compiled from a strategy blueprint"""',
+        "",
+        "    params = (",
+        *[f"        ({name!r}, {value if isinstance(value, int) else _number(value)})," for name, value in params],
+        "    )",
+        "",
+        "    def __init__(self):",
+        "        self.order = None",
+        "        self.entry_price = None",
+        "        self.entry_range = None",
+        "        self.peak = None",
+        *[f"        {line}" for line in init],
+        "",
+        "    def notify_order(self, order):",
+        "        if order.status in [order.Submitted, order.Accepted]:",
+        "            return",
+        "        if order.status == order.Completed and order.isbuy():",
+        "            self.entry_price = order.executed.price",
+        "            self.peak = order.executed.price",
+        *(["            self.entry_range = self.stop_range[0]"] if stop_atr is not None else []),
+        "        self.order = None",
+        "",
+        "    def next(self):",
+        "        if self.order:",
+        "            return",
+        "        price = self.data.close[0]",
+        "        if not self.position:",
+        f"            if {' and '.join(entry_exprs)}:",
+        f"                size = {size}",
+        "                if size > 0:",
+        "                    self.order = self.buy(size=size)",
+        "            return",
+        "        self.peak = max(self.peak, price)",
+    ]
+    if closes:
+        out += [
+            "        if (",
+            *[f"            {expr}{' or' if i < len(closes) - 1 else ''}" for i, expr in enumerate(closes)],
+            "        ):",
+            "            self.order = self.close()",
+        ]
+    return "\n".join(out) + "\n"
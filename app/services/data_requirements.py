@@ -0,0 +1,256 @@
+import ast
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Dict, List, Optional
+
+from app.models.strategy_blueprint import StrategyBlueprint
+from app.utility.code_fingerprint import canonical_tree, fingerprint
+
+logger = logging.getLogger("data_requirements")
+
+#Exponentially smoothed indicators are not settled at their minimum period; give them this many periods
+EXPONENTIAL_SETTLE = 3
+#Lookback for indicators that are unknown or whose period cannot be worked out statically
+DEFAULT_LOOKBACK = 30
+
+_MA = {"period": 30}
+#backtrader indicator -> (period params with their defaults, bars needed from them, exponentially smoothed)
+INDICATORS = {
+    **{name: (_MA, lambda p: p["period"], False) for name in (
+        "SMA", "MovingAverageSimple", "SimpleMovingAverage", "WMA", "WeightedMovingAverage", "HMA", "HullMovingAverage"
+    )},
+    **{name: (_MA, lambda p: p["period"], True) for name in (
+        "EMA", "ExponentialMovingAverage", "MovingAverageExponential", "SMMA", "SmoothedMovingAverage",
+        "KAMA", "AdaptiveMovingAverage", "ZLEMA", "ZeroLagExponentialMovingAverage"
+    )},
+    "DEMA": (_MA, lambda p: 2 * p["period"], True),
+    "TEMA": (_MA, lambda p: 3 * p["period"], True),
+    "RSI": ({"period": 14}, lambda p: p["period"] + 1, True),
+    "RelativeStrengthIndex": ({"period": 14}, lambda p: p["period"] + 1, True),
+    "MACD": ({"period_me1": 12, "period_me2": 26, "period_signal": 9},
+             lambda p: max(p["period_me1"], p["period_me2"]) + p["period_signal"], True),
+    "MACDHisto": ({"period_me1": 12, "period_me2": 26, "period_signal": 9},
+                  lambda p: max(p["period_me1"], p["period_me2"]) + p["period_signal"], True),
+    "BollingerBands": ({"period": 20}, lambda p: p["period"], False),
+    "BBands": ({"period": 20}, lambda p: p["period"], False),
+    "StdDev": ({"period": 20}, lambda p: p["period"], False),
+    "StandardDeviation": ({"period": 20}, lambda p: p["period"], False),
+    "ATR": ({"period": 14}, lambda p: p["period"] + 1, True),
+    "AverageTrueRange": ({"period": 14}, lambda p: p["period"] + 1, True),
+    "Stochastic": ({"period": 14, "period_dfast": 3, "period_dslow": 3},
+                   lambda p: p["period"] + p["period_dfast"] + p["period_dslow"] - 2, False),
+    "StochasticSlow": ({"period": 14, "period_dfast": 3, "period_dslow": 3},
+                       lambda p: p["period"] + p["period_dfast"] + p["period_dslow"] - 2, False),
+    "StochasticFull": ({"period": 14, "period_dfast": 3, "period_dslow": 3},
+                       lambda p: p["period"] + p["period_dfast"] + p["period_dslow"] - 2, False),
+    "StochasticFast": ({"period": 14, "period_dfast": 3}, lambda p: p["period"] + p["period_dfast"] - 1, False),
+    "CrossOver": ({}, lambda p: 2, False),
+    "CrossUp": ({}, lambda p: 2, False),
+    "CrossDown": ({}, lambda p: 2, False),
+    **{name: ({"period": 1}, lambda p: p["period"], False) for name in ("Highest", "MaxN", "Lowest", "MinN")},
+    "Momentum": ({"period": 12}, lambda p: p["period"] + 1, False),
+    "ROC": ({"period": 12}, lambda p: p["period"] + 1, False),
+    "RateOfChange": ({"period": 12}, lambda p: p["period"] + 1, False),
+    "PercentChange": ({"period": 30}, lambda p: p["period"] + 1, False),
+    "PctChange": ({"period": 30}, lambda p: p["period"] + 1, False),
+    "CCI": ({"period": 20}, lambda p: p["period"], False),
+    "CommodityChannelIndex": ({"period": 20}, lambda p: p["period"], False),
+    "WilliamsR": ({"period": 14}, lambda p: p["period"], False),
+    **{name: ({"period": 14}, lambda p: 2 * p["period"], True) for name in (
+        "ADX", "AverageDirectionalMovementIndex", "DMI", "DirectionalMovement", "PlusDI", "MinusDI", "ADXR"
+    )},
+}
+#Module paths indicators are reached through: bt.indicators.SMA, bt.ind.SMA, btind.SMA, bt.talib.SMA
+_INDICATOR_MODULES = {"indicators", "ind", "btind", "talib"}
+
+#Calendar days per bar, with room for weekends and holidays on daily bars and
+#for the 6.5 hour session on intraday ones
+CALENDAR_DAYS_PER_BAR = {
+    "1m": 1 / 390, "2m": 2 / 390, "5m": 5 / 390, "15m": 15 / 390, "30m": 30 / 390,
+    "60m": 60 / 390, "1h": 60 / 390, "1d": 1.5, "1wk": 7.0, "1mo": 31.0,
+}
+
+
+@dataclass
+class DataRequirements:
+    indicators: List[str] = field(default_factory=list)
+    warmup_bars: int = 0
+    interval: str = "1d"
+    #False when some lookback fell back to a default because it could not be read from the code
+    exact: bool = True
+
+    def warmup_timedelta(self) -> timedelta:
+        return warmup_span(self.warmup_bars, self.interval)
+
+
+def warmup_span(bars: int, interval: str = "1d") -> timedelta:
+    """Calendar time that holds `bars` bars of an interval, padded for closed sessions"""
+    days = bars * CALENDAR_DAYS_PER_BAR.get(interval, 1.5)
+    return timedelta(days=days + (3 if interval == "1d" else 1))
+
+
+class _RequirementsVisitor:
+    def __init__(self, params: Dict[str, int]):
+        self.params = params
+        self.lines: Dict[str, int] = {}
+        self.indicators: List[str] = []
+        self.exact = True
+        self.lookback = 1
+
+    def _int(self, node: ast.AST) -> Optional[int]:
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+            return int(node.value)
+        #self.p.fast / self.params.fast resolve against the class params
+        if isinstance(node, ast.Attribute) and isinstance(node.value, ast.Attribute) and node.value.attr in ("p", "params"):
+            return self.params.get(node.attr)
+        if isinstance(node, ast.BinOp):
+            left, right = self._int(node.left), self._int(node.right)
+            if left is not None and right is not None:
+                if isinstance(node.op, ast.Add):
+                    return left + right
+                if isinstance(node.op, ast.Mult):
+                    return left * right
+                if isinstance(node.op, ast.Sub):
+                    return left - right
+        return None
+
+    def _key(self, node: ast.AST) -> Optional[str]:
+        """self.sma / self.sma.lines.x / sma -> the name a line was assigned to"""
+        while isinstance(node, (ast.Attribute, ast.Subscript)) and not (
+            isinstance(node, ast.Attribute) and isinstance(node.value, ast.Name) and node.value.id == "self"
+        ):
+            node = node.value
+        if isinstance(node, ast.Attribute):
+            return f"self.{node.attr}"
+        if isinstance(node, ast.Name):
+            return node.id
+        return None
+
+    def _indicator_name(self, func: ast.AST) -> Optional[str]:
+        if isinstance(func, ast.Name):
+            return func.id if func.id in INDICATORS else None
+        if isinstance(func, ast.Attribute):
+            owner = func.value
+            owner_name = owner.attr if isinstance(owner, ast.Attribute) else getattr(owner, "id", None)
+            if func.attr in INDICATORS or owner_name in _INDICATOR_MODULES:
+                return func.attr
+        return None
+
+    def expr_lookback(self, node: ast.AST) -> int:
+        """Bars an expression needs before its first value"""
+        if isinstance(node, ast.Call):
+            name = self._indicator_name(node.func)
+            inputs = max([self.expr_lookback(a) for a in node.args] or [1])
+            if name is None:
+                return max([inputs] + [self.expr_lookback(k.value) for k in node.keywords])
+            defaults, bars, exponential = INDICATORS.get(name, ({"period": DEFAULT_LOOKBACK}, lambda p: p["period"], False))
+            values = dict(defaults)
+            for keyword in node.keywords:
+                if keyword.arg in values:
+                    value = self._int(keyword.value)
+                    if value is None:
+                        self.exact = False
+                    else:
+                        values[keyword.arg] = value
+            if name not in INDICATORS:
+                self.exact = self.exact and "period" in {k.arg for k in node.keywords}
+            own = bars(values) * (EXPONENTIAL_SETTLE if exponential else 1)
+            self.indicators.append(f"{name}({', '.join(str(v) for v in values.values())})")
+            #Stacked indicators share their first bar
+            return own + inputs - 1
+        if isinstance(node, ast.BinOp):
+            return max(self.expr_lookback(node.left), self.expr_lookback(node.right))
+        if isinstance(node, ast.UnaryOp):
+            return self.expr_lookback(node.operand)
+        if isinstance(node, (ast.Attribute, ast.Name, ast.Subscript)):
+            return self.lines.get(self._key(node), 1)
+        return 1
+
+    def visit_function(self, function: ast.AST):
+        for node in ast.walk(function):
+            if isinstance(node, ast.Assign):
+                lookback = self.expr_lookback(node.value)
+                for target in node.targets:
+                    key = self._key(target)
+                    if key is not None:
+                        self.lines[key] = lookback
+                self.lookback = max(self.lookback, lookback)
+            elif isinstance(node, ast.Expr):
+                self.lookback = max(self.lookback, self.expr_lookback(node.value))
+            #self.data.close[-5] reads five bars back
+            elif isinstance(node, ast.Subscript):
+                ago = self._int(node.slice.operand) if isinstance(node.slice, ast.UnaryOp) and isinstance(node.slice.op, ast.USub) else None
+                if ago is not None:
+                    self.lookback = max(self.lookback, self.lines.get(self._key(node.value), 1) + ago)
+
+
+def _class_params(tree: ast.Module) -> Dict[str, int]:
+    """Integer params declared as params = (("fast", 10), ...), {"fast": 10} or dict(fast=10)"""
+    params = {}
+    for node in ast.walk(tree):
+        if not (isinstance(node, ast.Assign) and any(isinstance(t, ast.Name) and t.id in ("params", "p") for t in node.targets)):
+            continue
+        try:
+            if isinstance(node.value, ast.Call) and getattr(node.value.func, "id", None) == "dict":
+                value = {k.arg: ast.literal_eval(k.value) for k in node.value.keywords if k.arg}
+            else:
+                value = ast.literal_eval(node.value)
+        except (ValueError, TypeError, SyntaxError):
+            continue
+        items = value.items() if isinstance(value, dict) else value
+        for item in items:
+            if isinstance(item, (tuple, list)) and len(item) == 2 and isinstance(item[1], (int, float)) and not isinstance(item[1], bool):
+                params[item[0]] = int(item[1])
+    return params
+
+
+#Requirements by code fingerprint, least recently used first
+REQUIREMENTS_CACHE_SIZE = 1024
+_requirements: "OrderedDict[str, DataRequirements]" = OrderedDict()
+
+
+def _analyze(code: str) -> DataRequirements:
+    try:
+        tree = canonical_tree(code)
+    except SyntaxError:
+        return DataRequirements(warmup_bars=DEFAULT_LOOKBACK, exact=False)
+    visitor = _RequirementsVisitor(_class_params(tree))
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ClassDef):
+            #__init__ first, so next() can look up the lines it built
+            methods = sorted(
+                (n for n in node.body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))),
+                key=lambda n: n.name != "__init__"
+            )
+            for method in methods:
+                visitor.visit_function(method)
+    return DataRequirements(
+        indicators=visitor.indicators, warmup_bars=visitor.lookback, exact=visitor.exact
+    )
+
+
+def analyze_code(code: str, interval: str = "1d") -> DataRequirements:
+    """
+    Indicators and warmup a strategy needs, read from its source without running it.
+
+    warmup_bars is the longest chain of lookbacks feeding any line the strategy
+    builds or indexes, so a feed that starts warmup_bars before the evaluation
+    window has every indicator settled by its first bar.
+    """
+    key = fingerprint(code)
+    requirements = _requirements.get(key)
+    if requirements is None:
+        requirements = _requirements[key] = _analyze(code)
+        if len(_requirements) > REQUIREMENTS_CACHE_SIZE:
+            _requirements.popitem(last=False)
+    else:
+        _requirements.move_to_end(key, last=True)
+    return DataRequirements(requirements.indicators, requirements.warmup_bars, interval, requirements.exact)
+
+
+def analyze_blueprint(bp: StrategyBlueprint) -> DataRequirements:
+    """Requirements of the code the blueprint compiles to, on the blueprint's timeframe"""
+    from app.services.blueprint_compiler import compile_blueprint
+    return analyze_code(compile_blueprint(bp), bp.timeframe or "1d")
@@ -0,0 +1,86 @@
+import logging
+import math
+import os
+import random
+import time
+from typing import Optional, Set
+
+from app.utility import redis_lock
+from app.utility.redis_client import redis_client
+
+logger = logging.getLogger("executor_partitions")
+
+PARTITIONS = int(os.getenv("PAPER_EXECUTOR_PARTITIONS", 16))
+LEASE_TTL_MS = int(os.getenv("PAPER_EXECUTOR_LEASE_TTL_MS", 30000))
+MEMBERS_KEY = "paper:executor:members"
+
+
+def partition_of(account_id: int, partitions: int = PARTITIONS) -> int:
+    return account_id % partitions
+
+
+def _lease_key(partition: int) -> str:
+    return f"paper:executor:lease:{partition}"
+
+
+class PartitionLeaser:
+    """
+    Splits the account partitions between live executor processes.
+
+    Each process heartbeats into a membership zset and holds at most its fair share
+    of partitions, ceil(partitions / live members), as Redis leases that expire
+    unless renewed. A process that dies stops renewing, its leases lapse, and the
+    survivors pick the partitions up on their next refresh; a new process makes
+    everyone's share shrink, so they shed extras for it to take.
+    """
+
+    def __init__(self, partitions: int = PARTITIONS, ttl_ms: int = LEASE_TTL_MS, owner: Optional[str] = None):
+        self.partitions = partitions
+        self.ttl_ms = ttl_ms
+        self.owner = owner or redis_lock.new_owner_id()
+        self.held: Set[int] = set()
+
+    def _heartbeat(self) -> int:
+        now_ms = int(time.time() * 1000)
+        pipe = redis_client.pipeline()
+        pipe.zadd(MEMBERS_KEY, {self.owner: now_ms + self.ttl_ms})
+        pipe.zremrangebyscore(MEMBERS_KEY, "-inf", now_ms)
+        pipe.zcard(MEMBERS_KEY)
+        return max(pipe.execute()[-1], 1)
+
+    def refresh(self) -> Set[int]:
+        """Renew held leases, shed or take partitions toward the fair share, return what is held"""
+        try:
+            share = math.ceil(self.partitions / self._heartbeat())
+            self.held = {p for p in self.held if redis_lock.renew(_lease_key(p), self.owner, self.ttl_ms)}
+
+            while len(self.held) > share:
+                partition = max(self.held)
+                redis_lock.release(_lease_key(partition), self.owner)
+                self.held.discard(partition)
+
+            if len(self.held) < share:
+                #Random start so processes racing for free partitions rarely collide
+                start = random.randrange(self.partitions)
+                for i in range(self.partitions):
+                    partition = (start + i) % self.partitions
+                    if partition in self.held:
+                        continue
+                    if redis_lock.acquire(_lease_key(partition), self.owner, self.ttl_ms):
+                        self.held.add(partition)
+                        if len(self.held) >= share:
+                            break
+        except Exception as e:
+            #Without Redis we cannot prove ownership, so stop working every partition
+            logger.error(f"Lease refresh failed, dropping {len(self.held)} partitions: {e}")
+            self.held = set()
+        return set(self.held)
+
+    def release_all(self):
+        try:
+            for partition in self.held:
+                redis_lock.release(_lease_key(partition), self.owner)
+            redis_client.zrem(MEMBERS_KEY, self.owner)
+        except Exception as e:
+            logger.warning(f"Could not release leases: {e}")
+        self.held = set()
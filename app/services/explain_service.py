@@ -1,22 +1,66 @@
+import logging
 import os
+from typing import AsyncIterator
 from dotenv import load_dotenv
-import google.generativeai as genai
+from app.services import llm_cache, llm_client
+from app.utility.code_fingerprint import canonicalize
 
 load_dotenv()
-api_key = os.getenv("GOOGLE_API_KEY")
-genai.configure(api_key=api_key)
+
+logger = logging.getLogger("explain_service")
+
+MODEL_NAME = llm_client.MODEL_NAME
+#Bump when the prompt template changes so cached answers to the old template are not reused
+EXPLAIN_TEMPLATE_VERSION = 2
+
+def build_explain_prompt(code: str) -> str:
+    return (
+        "Explain the following Python backtrader strategy in simple terms. "
+        "Describe what it does, how it enters/exits positions, and any indicators used. "
+        "Avoid unnecessary code repetition. Keep it under 150 words.\n\n"
+        f"{code}"
+    )
+
+def explained_source(code: str) -> str:
+    """
+    The source that is both sent to the model and keyed in the cache, so variants that
+    differ only in comments, docstrings or formatting share an explanation of the same
+    text. Code that does not parse is sent as written.
+    """
+    try:
+        return canonicalize(code)
+    except SyntaxError:
+        return code
 
 def explain_strategy(code:str) -> str:
+    source = explained_source(code)
+    cache_key = llm_cache.make_key("explain", MODEL_NAME, EXPLAIN_TEMPLATE_VERSION, source)
+    cached = llm_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     try:
-        model = genai.GenerativeModel("gemini-2.5-flash")
-        prompt=(
-            "Explain the following Python backtrader strategy in simple terms. "
-            "Describe what it does, how it enters/exits positions, and any indicators used. "
-            "Avoid unnecessary code repetition. Keep it under 150 words.\n\n"
-            f"{code}"
-        )
-        response = model.generate_content(prompt)
-        return response.text.strip() if hasattr(response, "text") else str(response)
+        response = llm_client.get_sync_model().generate_content(build_explain_prompt(source))
+        if not hasattr(response, "text"):
+            return str(response)
+        explanation = response.text.strip()
+        llm_cache.put(cache_key, explanation)
+        return explanation
     except Exception as e:
         print("Gemini LLM error in Explaining Strategy:", e)
         return f"Error: {str(e)}"
+
+async def explain_strategy_async(code: str) -> str:
+    """explain_strategy through the async client, without holding a worker thread"""
+    source = explained_source(code)
+    try:
+        return await llm_client.complete_cached(
+            "explain", EXPLAIN_TEMPLATE_VERSION, source, build_explain_prompt(source)
+        )
+    except Exception as e:
+        logger.warning(f"LLM error explaining strategy: {e!r}")
+        return f"Error: {str(e)}"
+
+def stream_explanation(code: str) -> AsyncIterator[str]:
+    source = explained_source(code)
+    return llm_client.stream_cached("explain", EXPLAIN_TEMPLATE_VERSION, source, build_explain_prompt(source))
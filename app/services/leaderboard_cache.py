@@ -0,0 +1,241 @@
+import calendar
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from sqlmodel import select
+
+from app.db import get_session
+from app.models.leaderboard import LeaderboardEntry
+from app.utility.redis_client import redis_client
+
+logger = logging.getLogger("leaderboard_cache")
+
+PERIODS = ("daily", "weekly", "alltime")
+ALL_DATASETS = "*"
+ENTRIES_KEY = "leaderboard:entries"
+# Buckets stay readable for a day after they close, then Redis drops them
+BUCKET_GRACE = timedelta(days=1)
+# Members are zero-padded ids: Redis breaks score ties by member bytes, and padding makes
+# that the same (score, id) descending order the SQL pages continue in
+MEMBER_WIDTH = 12
+# All-time buckets keep this many entries; trim drops the rest and their entry payloads
+ALLTIME_SIZE = int(os.getenv("LEADERBOARD_ALLTIME_SIZE", 10000))
+
+# ZADD the entry and keep a per-user pointer to their best entry in the bucket, atomically.
+# KEYS: zset, best-hash   ARGV: entry_id, score, user_key, expire_at (0 = never)
+_RECORD_SCRIPT = redis_client.register_script("""
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+if ARGV[3] ~= '' then
+    local cur = redis.call('HGET', KEYS[2], ARGV[3])
+    local cur_score = cur and redis.call('ZSCORE', KEYS[1], cur)
+    if not cur_score or tonumber(cur_score) < tonumber(ARGV[2]) then
+        redis.call('HSET', KEYS[2], ARGV[3], ARGV[1])
+    end
+end
+if tonumber(ARGV[4]) > 0 then
+    redis.call('EXPIREAT', KEYS[1], ARGV[4])
+    redis.call('EXPIREAT', KEYS[2], ARGV[4])
+end
+return 1
+""")
+
+
+def entry_to_dict(r: LeaderboardEntry) -> Dict[str, Any]:
+    return {
+        "id": r.id,
+        "user_id": r.user_id,
+        "username": r.username,
+        "strategy_id": r.strategy_id,
+        "strategy_name": r.strategy_name,
+        "dataset": r.dataset,
+        "run_at": r.run_at.isoformat(),
+        "return_pct": r.return_pct,
+        "sharpe": r.sharpe,
+        "max_drawdown": r.max_drawdown,
+        "score": r.score
+    }
+
+
+def _epoch(at: datetime) -> int:
+    return calendar.timegm(at.utctimetuple())
+
+
+def _bucket(period: str, at: datetime):
+    """Return (bucket name, unix expiry) for the period bucket containing `at`"""
+    day = at.replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "daily":
+        return day.strftime("%Y-%m-%d"), _epoch(day + timedelta(days=1) + BUCKET_GRACE)
+    if period == "weekly":
+        week_start = day - timedelta(days=day.weekday())
+        return week_start.strftime("%G-W%V"), _epoch(week_start + timedelta(days=7) + BUCKET_GRACE)
+    return "all", 0
+
+
+def period_start(period: str, at: datetime = None) -> Optional[datetime]:
+    """Start of the bucket containing `at`, so SQL reads cover the same window as Redis"""
+    day = (at or datetime.utcnow()).replace(hour=0, minute=0, second=0, microsecond=0)
+    if period == "daily":
+        return day
+    if period == "weekly":
+        return day - timedelta(days=day.weekday())
+    return None
+
+
+def _keys(period: str, dataset: Optional[str], at: datetime = None):
+    bucket, expire_at = _bucket(period, at or datetime.utcnow())
+    zkey = f"leaderboard:{period}:{dataset or ALL_DATASETS}:{bucket}"
+    return zkey, f"{zkey}:best", expire_at
+
+
+def _member(entry_id: int) -> str:
+    return f"{int(entry_id):0{MEMBER_WIDTH}d}"
+
+
+def _user_key(entry: LeaderboardEntry) -> str:
+    return str(entry.username or entry.user_id or "")
+
+
+def record_entry(entry: LeaderboardEntry, pipe=None):
+    """Add an entry to its daily/weekly/alltime buckets, for its dataset and for all datasets"""
+    p = pipe or redis_client.pipeline(transaction=False)
+    now = _epoch(datetime.utcnow())
+    member = _member(entry.id)
+    p.hset(ENTRIES_KEY, member, json.dumps(entry_to_dict(entry)))
+    for period in PERIODS:
+        for dataset in {entry.dataset or "default", ALL_DATASETS}:
+            zkey, best_key, expire_at = _keys(period, dataset, entry.run_at)
+            if expire_at and expire_at < now:
+                continue
+            _RECORD_SCRIPT(keys=[zkey, best_key], args=[member, entry.score, _user_key(entry), expire_at], client=p)
+    if pipe is None:
+        p.execute()
+
+
+def _load_entries(ids: List[str], scores: List[float], first_rank: int) -> List[Dict[str, Any]]:
+    if not ids:
+        return []
+    rows = []
+    for rank, (raw, score) in enumerate(zip(redis_client.hmget(ENTRIES_KEY, ids), scores), start=first_rank):
+        if raw is None:
+            continue
+        row = json.loads(raw)
+        row["rank"] = rank
+        row["score"] = score
+        rows.append(row)
+    return rows
+
+
+def top(period: str = "daily", dataset: str = None, limit: int = 50, offset: int = 0) -> Optional[List[Dict[str, Any]]]:
+    """
+    Top entries of the current bucket by (score, id) descending.
+
+    None when the bucket does not exist, e.g. after a Redis flush or before the
+    first entry of the day, so the caller can read SQL instead of showing it empty.
+    """
+    zkey, _, _ = _keys(period, dataset)
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.exists(zkey)
+    pipe.zrevrange(zkey, offset, offset + limit - 1, withscores=True)
+    exists, members = pipe.execute()
+    if not exists:
+        return None
+    return _load_entries([m for m, _ in members], [s for _, s in members], offset + 1)
+
+
+def has_bucket(period: str = "daily", dataset: str = None) -> bool:
+    return bool(redis_client.exists(_keys(period, dataset)[0]))
+
+
+def user_rank(user_key: str, period: str = "daily", dataset: str = None) -> Optional[Dict[str, Any]]:
+    """1-based rank of the user's best entry in the current bucket, or None"""
+    zkey, best_key, _ = _keys(period, dataset)
+    entry_id = redis_client.hget(best_key, user_key)
+    if entry_id is None:
+        return None
+    rank = redis_client.zrevrank(zkey, entry_id)
+    if rank is None:
+        return None
+    rows = _load_entries([entry_id], [redis_client.zscore(zkey, entry_id)], rank + 1)
+    return rows[0] if rows else None
+
+
+def around(rank: int, radius: int = 5, period: str = "daily", dataset: str = None) -> Optional[List[Dict[str, Any]]]:
+    """Entries ranked within `radius` places of a 1-based rank; None like top() without a bucket"""
+    start = max(rank - 1 - radius, 0)
+    return top(period, dataset, limit=(rank - 1 + radius) - start + 1, offset=start)
+
+
+def trim(alltime_size: int = ALLTIME_SIZE) -> int:
+    """
+    Cut every all-time bucket to its best `alltime_size` entries, then delete entry
+    payloads no live bucket references; daily and weekly buckets expire on their own.
+    """
+    live = set()
+    cursor = 0
+    while True:
+        cursor, keys = redis_client.scan(cursor, match="leaderboard:*", count=1000, _type="zset")
+        for zkey in keys:
+            if zkey.startswith("leaderboard:alltime:"):
+                redis_client.zremrangebyrank(zkey, 0, -(alltime_size + 1))
+            live.update(redis_client.zrange(zkey, 0, -1))
+        if cursor == 0:
+            break
+
+    removed = 0
+    cursor = 0
+    while True:
+        cursor, fields = redis_client.hscan(ENTRIES_KEY, cursor, count=1000)
+        stale = [f for f in fields if f not in live]
+        if stale:
+            removed += redis_client.hdel(ENTRIES_KEY, *stale)
+        if cursor == 0:
+            break
+    logger.info("Trimmed %s leaderboard entries, %s still ranked", removed, len(live))
+    return removed
+
+
+def rebuild(chunk_size: int = 5000) -> int:
+    """Drop every leaderboard key and reload them from the LeaderboardEntry table"""
+    cursor = 0
+    while True:
+        cursor, keys = redis_client.scan(cursor, match="leaderboard:*", count=1000)
+        if keys:
+            redis_client.delete(*keys)
+        if cursor == 0:
+            break
+
+    now = datetime.utcnow()
+    total, last_id = 0, 0
+    with get_session() as session:
+        while True:
+            rows = session.exec(
+                select(LeaderboardEntry)
+                .where(LeaderboardEntry.id > last_id)
+                .order_by(LeaderboardEntry.id)
+                .limit(chunk_size)
+            ).all()
+            if not rows:
+                break
+            pipe = redis_client.pipeline(transaction=False)
+            for entry in rows:
+                record_entry(entry, pipe)
+            pipe.execute()
+            total += len(rows)
+            last_id = rows[-1].id
+    logger.info("Rebuilt leaderboard cache from %s entries in %.1fs", total, (datetime.utcnow() - now).total_seconds())
+    return total
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["rebuild"]:
+        logging.basicConfig(level=logging.INFO)
+        print(f"Rebuilt leaderboard cache from {rebuild()} entries")
+    elif sys.argv[1:] == ["trim"]:
+        logging.basicConfig(level=logging.INFO)
+        print(f"Trimmed {trim()} leaderboard entries")
+    else:
+        print("usage: python -m app.services.leaderboard_cache rebuild|trim")
@@ -0,0 +1,75 @@
+import logging
+import sys
+import time
+
+from sqlalchemy import Float, Numeric, case, cast, func, or_, update
+from sqlmodel import select
+
+from app.db import get_session
+from app.models.leaderboard import LeaderboardEntry
+from app.services import leaderboard_cache
+from app.services.leaderboard_service import SCORING_VERSION, scoring_config
+
+logger = logging.getLogger("leaderboard_rescore")
+
+RESCORE_CHUNK_SIZE = 50000
+
+
+def _score_expression(version: int):
+    """compute_score written as SQL over the stored metric columns"""
+    weights = scoring_config(version)
+    ret = func.coalesce(LeaderboardEntry.return_pct, 0.0)
+    sharpe = func.coalesce(LeaderboardEntry.sharpe, 0.0)
+    dd = func.abs(func.coalesce(LeaderboardEntry.max_drawdown, 0.0))
+
+    # Values within +/-3 are fractions, anything larger is already a percentage
+    ret_pct = case((func.abs(ret) <= 3, ret * 100.0), else_=ret)
+    dd_pct = case((dd <= 3, dd * 100.0), else_=dd)
+
+    score = (weights["return_pct"] * ret_pct) + (weights["sharpe"] * sharpe * 10) - (weights["drawdown_penalty"] * dd_pct)
+    return cast(func.round(cast(score, Numeric), 4), Float)
+
+
+def rescore_leaderboard(version: int = SCORING_VERSION, chunk_size: int = RESCORE_CHUNK_SIZE, rebuild_cache: bool = True) -> int:
+    """
+    Recompute every stored score under a scoring config with set-based UPDATEs.
+
+    Rows are walked in primary-key ranges, one transaction per range, and only rows
+    scored under another version are touched, so an interrupted run can simply be
+    started again.
+    """
+    scoring_config(version)
+
+    started = time.monotonic()
+    with get_session() as session:
+        lo, hi = session.exec(select(func.min(LeaderboardEntry.id), func.max(LeaderboardEntry.id))).one()
+        if lo is None:
+            return 0
+
+        score = _score_expression(version)
+        updated = 0
+        for start in range(lo, hi + 1, chunk_size):
+            result = session.exec(
+                update(LeaderboardEntry)
+                .where(
+                    LeaderboardEntry.id >= start,
+                    LeaderboardEntry.id < start + chunk_size,
+                    or_(LeaderboardEntry.score_version.is_(None), LeaderboardEntry.score_version != version)
+                )
+                .values(score=score, score_version=version)
+                .execution_options(synchronize_session=False)
+            )
+            session.commit()
+            updated += result.rowcount
+            logger.info(f"Rescored ids {start}-{min(start + chunk_size - 1, hi)}: {updated} rows so far")
+
+    logger.info(f"Rescored {updated} leaderboard entries to version {version} in {time.monotonic() - started:.1f}s")
+    if rebuild_cache and updated:
+        leaderboard_cache.rebuild()
+    return updated
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    target = int(sys.argv[1]) if len(sys.argv) > 1 else SCORING_VERSION
+    print(f"Rescored {rescore_leaderboard(target)} entries to scoring version {target}")
@@ -1,18 +1,42 @@
-from datetime import datetime, timedelta
-from typing import Dict, Any
+from datetime import datetime
+from typing import Dict, Any, Optional
+from sqlalchemy import func, tuple_
 from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from app.db import get_session
 from app.models.leaderboard import LeaderboardEntry
-from app.services.backtest_service import run_backtest_results_only
+from app.services import leaderboard_cache
+from app.utility.pagination import keyset, page
+import logging
 import math
+import os
 
-WEIGHTS = {
-    "return_pct": 0.6,
-    "sharpe": 0.3,
-    "drawdown_penalty": 0.1  # subtract drawdown as penalty
+logger = logging.getLogger("leaderboard")
+
+# Every change to the weights gets a new version; old versions stay so stored scores can be traced
+SCORING_CONFIGS = {
+    1: {
+        "return_pct": 0.6,
+        "sharpe": 0.3,
+        "drawdown_penalty": 0.1  # subtract drawdown as penalty
+    },
 }
 
-def compute_score(metrics: Dict[str, Any]) -> float:
+def scoring_config(version: int) -> Dict[str, float]:
+    """Weights of a scoring version; ValueError names the known versions"""
+    try:
+        return SCORING_CONFIGS[version]
+    except KeyError:
+        raise ValueError(
+            f"Unknown scoring version {version!r}; known versions: {', '.join(map(str, sorted(SCORING_CONFIGS)))}"
+        ) from None
+
+SCORING_VERSION = int(os.getenv("LEADERBOARD_SCORING_VERSION", max(SCORING_CONFIGS)))
+# Checked at import, so a bad LEADERBOARD_SCORING_VERSION stops the process at startup
+WEIGHTS = scoring_config(SCORING_VERSION)
+
+def compute_score(metrics: Dict[str, Any], version: Optional[int] = None) -> float:
+    weights = scoring_config(SCORING_VERSION if version is None else version)
     ret = metrics.get("Total Return") or metrics.get("return_pct") or 0.0
     sharpe = metrics.get("Sharpe Ratio") or metrics.get("sharpe") or 0.0
     max_dd = metrics.get("Max Drawdown") or metrics.get("max_drawdown") or 0.0
@@ -28,12 +52,14 @@ def compute_score(metrics: Dict[str, Any]) -> float:
     except Exception:
         dd_pct = 0.0
 
-    score = (WEIGHTS["return_pct"] * ret_pct) + (WEIGHTS["sharpe"] * sharpe_val * 10) - (WEIGHTS["drawdown_penalty"] * dd_pct)
+    score = (weights["return_pct"] * ret_pct) + (weights["sharpe"] * sharpe_val * 10) - (weights["drawdown_penalty"] * dd_pct)
     if math.isnan(score) or math.isinf(score):
         return 0.0
     return round(score, 4)
 
 def submit_and_record(user, strategy_id: int, strategy_name: str, code: str, dataset: str = "default", ticker: str = "RELIANCE.NS"):
+    from app.services.backtest_service import run_backtest_results_only
+
     results = run_backtest_results_only(code, ticker)
     if "error" in results:
         return {"error": results["error"]}
@@ -42,7 +68,7 @@ def submit_and_record(user, strategy_id: int, strategy_name: str, code: str, dat
     score = compute_score(metrics)
     entry = LeaderboardEntry(
         user_id=getattr(user, "id", None) if user else None,
-        username=getattr(user, "email", None) if user else None,
+        username=user if isinstance(user, str) else getattr(user, "email", None),
         strategy_id=strategy_id,
         strategy_name=strategy_name,
         dataset=dataset,
@@ -50,47 +76,150 @@ def submit_and_record(user, strategy_id: int, strategy_name: str, code: str, dat
         return_pct=metrics.get("Total Return", metrics.get("return_pct", 0.0)),
         sharpe=metrics.get("Sharpe Ratio", metrics.get("sharpe")),
         max_drawdown=metrics.get("Max Drawdown", metrics.get("max_drawdown")),
-        score=score
+        score=score,
+        score_version=SCORING_VERSION
     )
     with get_session() as session:
         session.add(entry)
         session.commit()
         session.refresh(entry)
 
+    # SQL is the durable record; a Redis outage only delays the entry until the next rebuild
+    try:
+        leaderboard_cache.record_entry(entry)
+    except Exception as e:
+        logger.warning(f"Could not add leaderboard entry {entry.id} to Redis: {e}")
+
     return {"entry_id": entry.id, "metrics": metrics, "score": score}
 
+LEADERBOARD_COLUMNS = (
+    LeaderboardEntry.id, LeaderboardEntry.user_id, LeaderboardEntry.username,
+    LeaderboardEntry.strategy_id, LeaderboardEntry.strategy_name, LeaderboardEntry.dataset,
+    LeaderboardEntry.run_at, LeaderboardEntry.return_pct, LeaderboardEntry.sharpe,
+    LeaderboardEntry.max_drawdown, LeaderboardEntry.score
+)
+
+def query_leaderboard_page(
+    period: str = "daily",
+    dataset: str = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    strategy_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """One page of the leaderboard by (score, id) descending; raises ValueError on a bad cursor"""
+    q = _page_query(period, dataset, limit, cursor, strategy_id, start, end)
+    with get_session() as session:
+        rows = session.exec(q).all()
+    return _to_page(rows, limit)
+
+async def query_leaderboard_page_async(
+    db: AsyncSession,
+    period: str = "daily",
+    dataset: str = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    strategy_id: Optional[int] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """query_leaderboard_page on an async session"""
+    q = _page_query(period, dataset, limit, cursor, strategy_id, start, end)
+    rows = (await db.exec(q)).all()
+    return _to_page(rows, limit)
+
+def _period_query(period, dataset, *columns, start=None, end=None):
+    """Entries of the current period bucket, the window the Redis sorted sets cover"""
+    start = start or leaderboard_cache.period_start(period)
+    q = select(*columns)
+    if start:
+        q = q.where(LeaderboardEntry.run_at >= start)
+    if end:
+        q = q.where(LeaderboardEntry.run_at < end)
+    if dataset:
+        q = q.where(LeaderboardEntry.dataset == dataset)
+    return q
+
+def _page_query(period, dataset, limit, cursor, strategy_id, start, end):
+    q = _period_query(period, dataset, *LEADERBOARD_COLUMNS, start=start, end=end)
+    if strategy_id is not None:
+        q = q.where(LeaderboardEntry.strategy_id == strategy_id)
+
+    q = keyset(q, [LeaderboardEntry.score, LeaderboardEntry.id], cursor)
+    return q.limit(limit + 1)
+
+def _to_page(rows, limit: int) -> Dict[str, Any]:
+    result = page(rows, limit, key=lambda r: (r.score, r.id))
+    result["items"] = [leaderboard_cache.entry_to_dict(r) for r in result["items"]]
+    return result
+
 def query_leaderboard(period: str = "daily", dataset: str = None, limit: int = 50):
-    now = datetime.utcnow()
+    return query_leaderboard_page(period=period, dataset=dataset, limit=limit)["items"]
+
+def query_user_rank(user_key: str, period: str = "daily", dataset: str = None) -> Optional[Dict[str, Any]]:
+    """
+    SQL counterpart of leaderboard_cache.user_rank: the user's best entry and its rank.
+
+    Among equal scores Redis keeps the entry recorded first as the user's best, so the
+    lowest id wins here too.
+    """
+    with get_session() as session:
+        best = session.exec(
+            _period_query(period, dataset, *LEADERBOARD_COLUMNS)
+            .where(LeaderboardEntry.username == user_key)
+            .order_by(LeaderboardEntry.score.desc(), LeaderboardEntry.id)
+            .limit(1)
+        ).first()
+        if best is None:
+            return None
+        ahead = session.exec(
+            _period_query(period, dataset, func.count())
+            .where(tuple_(LeaderboardEntry.score, LeaderboardEntry.id) > tuple_(best.score, best.id))
+        ).one()
+    return {**leaderboard_cache.entry_to_dict(best), "rank": ahead + 1}
+
+def query_around(rank: int, radius: int = 5, period: str = "daily", dataset: str = None):
+    """SQL counterpart of leaderboard_cache.around"""
+    offset = max(rank - 1 - radius, 0)
+    q = _period_query(period, dataset, *LEADERBOARD_COLUMNS).order_by(
+        LeaderboardEntry.score.desc(), LeaderboardEntry.id.desc()
+    )
     with get_session() as session:
-        if period == "daily":
-            start = now - timedelta(days=1)
-        elif period == "weekly":
-            start = now - timedelta(days=7)
-        else:
-            start = None
-
-        q = select(LeaderboardEntry)
-        if start:
-            q = q.where(LeaderboardEntry.run_at >= start)
-        if dataset:
-            q = q.where(LeaderboardEntry.dataset == dataset)
-
-        q = q.order_by(LeaderboardEntry.score.desc())
-        rows = session.exec(q.limit(limit)).all()
-
-        result = []
-        for r in rows:
-            result.append({
-                "id": r.id,
-                "user_id": r.user_id,
-                "username": r.username,
-                "strategy_id": r.strategy_id,
-                "strategy_name": r.strategy_name,
-                "dataset": r.dataset,
-                "run_at": r.run_at.isoformat(),
-                "return_pct": r.return_pct,
-                "sharpe": r.sharpe,
-                "max_drawdown": r.max_drawdown,
-                "score": r.score
-            })
-        return result
+        rows = session.exec(q.offset(offset).limit(rank + radius - offset)).all()
+    return [{**leaderboard_cache.entry_to_dict(r), "rank": offset + i} for i, r in enumerate(rows, start=1)]
+
+def query_user_rank_cached(user_key: str, period: str = "daily", dataset: str = None):
+    """user_rank from Redis, falling back to SQL when Redis is unavailable or lacks the bucket"""
+    try:
+        entry = leaderboard_cache.user_rank(user_key, period=period, dataset=dataset)
+        if entry is not None or leaderboard_cache.has_bucket(period, dataset):
+            return entry
+        logger.info(f"No {period} leaderboard bucket in Redis, querying SQL")
+    except Exception as e:
+        logger.warning(f"Leaderboard cache unavailable, querying SQL: {e}")
+    return query_user_rank(user_key, period=period, dataset=dataset)
+
+def query_around_cached(rank: int, radius: int = 5, period: str = "daily", dataset: str = None):
+    """around from Redis, falling back to SQL when Redis is unavailable or lacks the bucket"""
+    try:
+        rows = leaderboard_cache.around(rank, radius, period=period, dataset=dataset)
+    except Exception as e:
+        logger.warning(f"Leaderboard cache unavailable, querying SQL: {e}")
+        return query_around(rank, radius, period=period, dataset=dataset)
+    if rows is None:
+        logger.info(f"No {period} leaderboard bucket in Redis, querying SQL")
+        return query_around(rank, radius, period=period, dataset=dataset)
+    return rows
+
+def query_leaderboard_cached(period: str = "daily", dataset: str = None, limit: int = 50):
+    """Top-N from the Redis sorted sets, falling back to SQL when Redis is unavailable or lacks the bucket"""
+    try:
+        rows = leaderboard_cache.top(period=period, dataset=dataset, limit=limit)
+    except Exception as e:
+        logger.warning(f"Leaderboard cache unavailable, querying SQL: {e}")
+        return query_leaderboard(period=period, dataset=dataset, limit=limit)
+    if rows is None:
+        logger.info(f"No {period} leaderboard bucket in Redis, querying SQL")
+        return query_leaderboard(period=period, dataset=dataset, limit=limit)
+    return rows
@@ -0,0 +1,209 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+
+from app.db import get_session
+from app.models.leaderboard import LeaderboardEntry, LeaderboardSnapshot
+from app.services.leaderboard_cache import ALL_DATASETS, entry_to_dict, period_start
+from app.utility.redis_client import redis_client
+
+logger = logging.getLogger("leaderboard_snapshot")
+
+SNAPSHOT_SIZE = int(os.getenv("LEADERBOARD_SNAPSHOT_SIZE", 100))
+SNAPSHOT_PERIODS = ("daily", "weekly")
+# Seconds a process trusts its idea of which snapshot is the latest one
+LATEST_TTL = 60
+REDIS_TTL = 7 * 24 * 3600
+
+DATED_CACHE_SIZE = 512
+
+_latest: dict = {}
+# Dated snapshots are written once and never replaced, so each process keeps their bytes once read
+_dated: "OrderedDict[tuple, Tuple[bytes, str]]" = OrderedDict()
+_dated_lock = threading.Lock()
+
+
+def _redis_key(period: str, dataset: str, as_of: date) -> str:
+    return f"lbsnapshot:{period}:{dataset}:{as_of.isoformat()}"
+
+
+def build_snapshot(period: str, as_of: date, dataset: str = ALL_DATASETS, limit: int = SNAPSHOT_SIZE) -> Tuple[bytes, str, int]:
+    """
+    Render the leaderboard as it stood at the end of `as_of` into compact JSON bytes.
+
+    The window is the live board's: the UTC day, or the ISO week from its Monday up
+    to and including `as_of`.
+    """
+    end = datetime.combine(as_of + timedelta(days=1), datetime.min.time())
+    start = period_start(period, datetime.combine(as_of, datetime.min.time()))
+    with get_session() as session:
+        q = select(LeaderboardEntry).where(LeaderboardEntry.run_at >= start, LeaderboardEntry.run_at < end)
+        if dataset != ALL_DATASETS:
+            q = q.where(LeaderboardEntry.dataset == dataset)
+        rows = session.exec(q.order_by(LeaderboardEntry.score.desc(), LeaderboardEntry.id.desc()).limit(limit)).all()
+        top = [dict(entry_to_dict(r), rank=i) for i, r in enumerate(rows, start=1)]
+
+    doc = {"period": period, "dataset": dataset, "as_of": as_of.isoformat(), "top": top}
+    payload = json.dumps(doc, separators=(",", ":"), sort_keys=True).encode()
+    return payload, hashlib.sha256(payload).hexdigest(), len(top)
+
+
+def _stored(session, period: str, dataset: str, as_of: date) -> Optional[LeaderboardSnapshot]:
+    return session.exec(
+        select(LeaderboardSnapshot).where(
+            LeaderboardSnapshot.period == period,
+            LeaderboardSnapshot.dataset == dataset,
+            LeaderboardSnapshot.as_of == as_of
+        )
+    ).first()
+
+
+def freeze_snapshot(period: str, as_of: date, dataset: str = ALL_DATASETS) -> LeaderboardSnapshot:
+    """
+    Build a snapshot and store it, unless one exists for the key already.
+
+    Snapshots are write-once: clients cache dated ones as immutable, so a stored
+    one is returned as is rather than rebuilt from entries that may have changed.
+    """
+    with get_session() as session:
+        existing = _stored(session, period, dataset, as_of)
+    if existing:
+        return existing
+
+    payload, content_hash, count = build_snapshot(period, as_of, dataset)
+    with get_session() as session:
+        snapshot = LeaderboardSnapshot(
+            period=period, dataset=dataset, as_of=as_of, content_hash=content_hash, payload=payload, entry_count=count
+        )
+        session.add(snapshot)
+        try:
+            session.commit()
+        except IntegrityError:
+            #Another worker froze it first; theirs is the snapshot
+            session.rollback()
+            return _stored(session, period, dataset, as_of)
+        session.refresh(snapshot)
+
+    try:
+        redis_client.setex(_redis_key(period, dataset, as_of), REDIS_TTL, json.dumps({"hash": content_hash, "payload": payload.decode()}))
+        redis_client.delete(f"lbsnapshot:latest:{period}:{dataset}")
+    except Exception as e:
+        logger.warning(f"Could not cache snapshot {period}/{dataset}/{as_of} in Redis: {e}")
+    _latest.clear()
+    return snapshot
+
+
+def freeze_daily_snapshots(as_of: date = None) -> int:
+    """Scheduler entry point: freeze yesterday's daily and weekly boards for every dataset"""
+    as_of = as_of or (datetime.utcnow().date() - timedelta(days=1))
+    start = min(period_start(period, datetime.combine(as_of, datetime.min.time())) for period in SNAPSHOT_PERIODS)
+    with get_session() as session:
+        datasets = session.exec(
+            select(LeaderboardEntry.dataset).where(LeaderboardEntry.run_at >= start).distinct()
+        ).all()
+
+    frozen = 0
+    for period in SNAPSHOT_PERIODS:
+        for dataset in [ALL_DATASETS] + [d for d in datasets if d]:
+            freeze_snapshot(period, as_of, dataset)
+            frozen += 1
+    logger.info(f"Froze {frozen} leaderboard snapshots as of {as_of}")
+    return frozen
+
+
+def _remember(key: tuple, value: Tuple[bytes, str]) -> Tuple[bytes, str]:
+    with _dated_lock:
+        _dated[key] = value
+        if len(_dated) > DATED_CACHE_SIZE:
+            _dated.popitem(last=False)
+    return value
+
+
+def _load_dated(period: str, dataset: str, as_of: date) -> Optional[Tuple[bytes, str]]:
+    """Process memory, then Redis, then Postgres"""
+    key = (period, dataset, as_of)
+    with _dated_lock:
+        hit = _dated.get(key)
+        if hit is not None:
+            _dated.move_to_end(key)
+            return hit
+
+    try:
+        cached = redis_client.get(_redis_key(period, dataset, as_of))
+        if cached:
+            doc = json.loads(cached)
+            return _remember(key, (doc["payload"].encode(), doc["hash"]))
+    except Exception as e:
+        logger.warning(f"Snapshot cache read failed: {e}")
+
+    with get_session() as session:
+        snapshot = _stored(session, period, dataset, as_of)
+        if not snapshot:
+            return None
+        payload, content_hash = bytes(snapshot.payload), snapshot.content_hash
+
+    try:
+        redis_client.setex(_redis_key(period, dataset, as_of), REDIS_TTL, json.dumps({"hash": content_hash, "payload": payload.decode()}))
+    except Exception:
+        pass
+    return _remember(key, (payload, content_hash))
+
+
+def _latest_date(period: str, dataset: str) -> Optional[date]:
+    hit = _latest.get((period, dataset))
+    if hit and hit[1] > time.monotonic():
+        return hit[0]
+
+    as_of = None
+    redis_key = f"lbsnapshot:latest:{period}:{dataset}"
+    try:
+        raw = redis_client.get(redis_key)
+        as_of = date.fromisoformat(raw) if raw else None
+    except Exception:
+        pass
+    if as_of is None:
+        with get_session() as session:
+            as_of = session.exec(
+                select(LeaderboardSnapshot.as_of)
+                .where(LeaderboardSnapshot.period == period, LeaderboardSnapshot.dataset == dataset)
+                .order_by(LeaderboardSnapshot.as_of.desc())
+            ).first()
+        if as_of:
+            try:
+                redis_client.setex(redis_key, LATEST_TTL, as_of.isoformat())
+            except Exception:
+                pass
+    if as_of:
+        _latest[(period, dataset)] = (as_of, time.monotonic() + LATEST_TTL)
+    return as_of
+
+
+def get_snapshot(period: str, dataset: str = ALL_DATASETS, as_of: date = None) -> Optional[Tuple[bytes, str, date]]:
+    """Return (payload, content hash, as_of) for a dated snapshot, or the latest one"""
+    as_of = as_of or _latest_date(period, dataset)
+    if as_of is None:
+        return None
+    found = _load_dated(period, dataset, as_of)
+    return (found[0], found[1], as_of) if found else None
+
+
+def list_snapshots(period: str, dataset: str = ALL_DATASETS, start: date = None, end: date = None, limit: int = 100) -> List[dict]:
+    with get_session() as session:
+        q = select(
+            LeaderboardSnapshot.as_of, LeaderboardSnapshot.content_hash, LeaderboardSnapshot.entry_count
+        ).where(LeaderboardSnapshot.period == period, LeaderboardSnapshot.dataset == dataset)
+        if start:
+            q = q.where(LeaderboardSnapshot.as_of >= start)
+        if end:
+            q = q.where(LeaderboardSnapshot.as_of <= end)
+        rows = session.exec(q.order_by(LeaderboardSnapshot.as_of.desc()).limit(limit)).all()
+    return [{"as_of": d.isoformat(), "content_hash": h, "entry_count": n} for d, h, n in rows]
@@ -0,0 +1,299 @@
+import logging
+import os
+import queue
+import threading
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+
+import backtrader as bt
+import pandas as pd
+from sqlmodel import select
+
+from app.db import get_session
+from app.models.paper_trading import PaperStrategyDeployment, OrderSide, OrderType
+from app.models.strategy import Strategy
+from app.services.backtest_service import load_strategy_class
+from app.utility.validators import validate_strategy_code
+from app.services.market_data_service import MarketDataService
+from app.services.paper_trading_service import PaperTradingService
+
+logger = logging.getLogger("live_strategy_runner")
+
+#Each runner holds an OS thread and a Cerebro for its deployment; deployments past the
+#cap wait, and more workers spread them over their account partitions
+MAX_RUNNERS = int(os.getenv("LIVE_RUNNER_MAX", 100))
+TICK_SECONDS = int(os.getenv("LIVE_RUNNER_TICK_SECONDS", 60))
+
+#History loaded once at deploy time so indicators are warm before the first live bar
+WARMUP_PERIODS = {"1m": "5d", "5m": "1mo", "15m": "1mo", "30m": "1mo", "1h": "3mo", "1d": "1y"}
+#Window fetched per tick; only bars newer than the runner's last one are pushed
+TICK_PERIODS = {"1m": "1d", "5m": "1d", "15m": "5d", "30m": "5d", "1h": "5d", "1d": "5d"}
+
+_ORDER_TYPES = {
+    bt.Order.Market: OrderType.MARKET,
+    bt.Order.Close: OrderType.MARKET,
+    bt.Order.Limit: OrderType.LIMIT,
+    bt.Order.Stop: OrderType.STOP,
+    bt.Order.StopLimit: OrderType.STOP_LIMIT,
+}
+
+
+class QueueFeed(bt.feed.DataBase):
+    """Data feed that blocks until the next bar is pushed onto its queue; None ends it"""
+
+    def __init__(self):
+        super().__init__()
+        self.bars = queue.Queue()
+        self.warming = True
+
+    def _load(self):
+        bar = self.bars.get()
+        if bar is None:
+            return False
+        ts, o, h, l, c, v, warming = bar
+        self.warming = warming
+        self.lines.datetime[0] = bt.date2num(ts)
+        self.lines.open[0] = o
+        self.lines.high[0] = h
+        self.lines.low[0] = l
+        self.lines.close[0] = c
+        self.lines.volume[0] = v
+        self.lines.openinterest[0] = 0.0
+        return True
+
+
+class ForwardingBroker(bt.brokers.BackBroker):
+    """Backtrader's simulated broker that also places every live order on the paper account"""
+    runner = None
+
+    def submit(self, order, check=True):
+        if self.runner is not None and not self.runner.feed.warming:
+            self.runner.forward(order)
+        return super().submit(order, check)
+
+
+class StrategyRunner:
+    """
+    One long-lived backtrader strategy for a deployment.
+
+    Cerebro runs on its own thread with preload and runonce off, so each pushed bar
+    runs exactly one `next()` over indicators that update incrementally, and
+    exactbars keeps only the lookback the indicators need in memory.
+    """
+
+    def __init__(self, deployment: PaperStrategyDeployment, strategy_class):
+        self.deployment_id = deployment.id
+        self.account_id = deployment.account_id
+        self.strategy_id = deployment.strategy_id
+        self.symbol = deployment.symbol
+        self.interval = deployment.interval
+        self.last_bar_at: Optional[datetime] = None
+        self.error: Optional[str] = None
+
+        self.feed = QueueFeed()
+        broker = ForwardingBroker()
+        broker.runner = self
+        self.cerebro = bt.Cerebro(stdstats=False)
+        self.cerebro.setbroker(broker)
+        self.cerebro.adddata(self.feed)
+        self.cerebro.addstrategy(strategy_class)
+        self.thread = threading.Thread(target=self._run, name=f"strategy-runner-{deployment.id}", daemon=True)
+
+    @property
+    def alive(self) -> bool:
+        return self.thread.is_alive()
+
+    def start(self, warmup: Optional[pd.DataFrame] = None):
+        #Everything up to now is warmup, so a restart never re-places orders for old bars
+        if warmup is not None:
+            self.push(warmup, warming=True)
+        self.thread.start()
+
+    def _run(self):
+        try:
+            self.cerebro.run(preload=False, runonce=False, exactbars=1)
+        except Exception as e:
+            self.error = str(e)
+            logger.error(f"Strategy runner {self.deployment_id} crashed: {e}")
+
+    def push(self, bars: pd.DataFrame, warming: bool = False) -> int:
+        """Queue the bars newer than the last one this runner has seen"""
+        if self.last_bar_at is not None:
+            bars = bars[bars.index > self.last_bar_at]
+        for ts, row in zip(bars.index, bars.itertuples(index=False)):
+            self.feed.bars.put((ts.to_pydatetime(), row.open, row.high, row.low, row.close, row.volume, warming))
+        if len(bars):
+            self.last_bar_at = bars.index[-1].to_pydatetime()
+        return len(bars)
+
+    def forward(self, order: bt.Order):
+        """Turn a backtrader buy/sell into a paper order"""
+        order_type = _ORDER_TYPES.get(order.exectype)
+        if order_type is None:
+            logger.warning(f"Runner {self.deployment_id}: unsupported order type {order.getordername()}")
+            return
+
+        price = stop_price = None
+        if order_type == OrderType.LIMIT:
+            price = order.created.price
+        elif order_type == OrderType.STOP:
+            stop_price = order.created.price
+        elif order_type == OrderType.STOP_LIMIT:
+            stop_price, price = order.created.price, order.created.pricelimit
+
+        try:
+            with get_session() as session:
+                PaperTradingService.create_order(
+                    account_id=self.account_id,
+                    symbol=self.symbol,
+                    side=OrderSide.BUY if order.isbuy() else OrderSide.SELL,
+                    order_type=order_type,
+                    quantity=abs(order.created.size),
+                    price=price,
+                    stop_price=stop_price,
+                    strategy_id=self.strategy_id,
+                    session=session
+                )
+        except ValueError as e:
+            logger.info(f"Runner {self.deployment_id}: order rejected: {e}")
+
+    def stop(self, timeout: float = 5.0):
+        self.feed.bars.put(None)
+        self.thread.join(timeout)
+
+
+class LiveStrategyManager:
+    """Keeps a runner per active deployment and fans each newest bar out to them"""
+
+    def __init__(self):
+        self.runners: Dict[int, StrategyRunner] = {}
+        self._lock = threading.Lock()
+        #Deployments whose runner is built but still waiting on warmup history
+        self._starting: Set[int] = set()
+        #None = every account; otherwise only accounts whose id % partition_count is listed
+        self.partitions: Optional[Set[int]] = None
+        self.partition_count = 1
+
+    def assign(self, partitions: Optional[Set[int]], partition_count: int = 1):
+        """Restrict the manager to a set of account partitions; the next sync applies it"""
+        self.partitions = set(partitions) if partitions is not None else None
+        self.partition_count = partition_count
+
+    def _build_runner(self, deployment: PaperStrategyDeployment, session):
+        """Load and check the deployment's strategy; returns (runner, None) or (None, error)"""
+        strategy = session.get(Strategy, deployment.strategy_id)
+        if not strategy:
+            return None, "Strategy not found"
+        validation = validate_strategy_code(strategy.code)
+        if not validation["valid"]:
+            return None, f"Strategy code is not allowed: {validation['reason']}"
+        try:
+            strategy_class = load_strategy_class(strategy.code)
+        except Exception as e:
+            return None, f"Strategy code failed to load: {e}"
+        if strategy_class is None:
+            return None, "No valid backtrader Strategy found in code"
+        return StrategyRunner(deployment, strategy_class), None
+
+    def sync(self):
+        """Start runners for new deployments and stop the ones that were deactivated"""
+        with self._lock, get_session() as session:
+            query = select(PaperStrategyDeployment).where(PaperStrategyDeployment.is_active == True)
+            if self.partitions is not None:
+                query = query.where(
+                    (PaperStrategyDeployment.account_id % self.partition_count).in_(sorted(self.partitions))
+                )
+            deployments = session.exec(query).all()
+            active = {d.id: d for d in deployments}
+
+            for deployment_id in [i for i in self.runners if i not in active]:
+                self.runners.pop(deployment_id).stop()
+
+            pending: List[StrategyRunner] = []
+            for deployment in deployments:
+                if deployment.id in self.runners or deployment.id in self._starting:
+                    continue
+                if len(self.runners) + len(self._starting) >= MAX_RUNNERS:
+                    logger.warning(f"Runner limit of {MAX_RUNNERS} reached, deployment {deployment.id} waits")
+                    break
+                runner, error = self._build_runner(deployment, session)
+                if error:
+                    deployment.error = error
+                    deployment.is_active = False
+                    session.add(deployment)
+                    logger.warning(f"Deployment {deployment.id} not started: {error}")
+                    continue
+                pending.append(runner)
+                self._starting.add(runner.deployment_id)
+            session.commit()
+
+        #Warmup history is downloaded without the lock, so ticks and progress writes
+        #for running strategies never wait on it
+        warmups = {}
+        for runner in pending:
+            key = (runner.symbol, runner.interval)
+            if key not in warmups:
+                warmups[key] = MarketDataService.get_recent_bars(
+                    runner.symbol, runner.interval, WARMUP_PERIODS.get(runner.interval, "5d")
+                )
+        with self._lock:
+            for runner in pending:
+                self._starting.discard(runner.deployment_id)
+                warmup = warmups[(runner.symbol, runner.interval)]
+                #The last row is the bar still forming
+                runner.start(warmup.iloc[:-1] if warmup is not None else None)
+                self.runners[runner.deployment_id] = runner
+
+    def tick(self):
+        """Fetch the newest bars once per (symbol, interval) and push them to every runner on it"""
+        try:
+            self.sync()
+            groups: Dict[tuple, List[StrategyRunner]] = defaultdict(list)
+            for runner in list(self.runners.values()):
+                groups[(runner.symbol, runner.interval)].append(runner)
+
+            pushed = 0
+            for (symbol, interval), runners in groups.items():
+                bars = MarketDataService.get_recent_bars(symbol, interval, TICK_PERIODS.get(interval, "1d"))
+                if bars is None or len(bars) < 2:
+                    continue
+                closed = bars.iloc[:-1]
+                for runner in runners:
+                    pushed += runner.push(closed)
+
+            self._record_progress()
+            logger.info(f"Pushed {pushed} bars to {len(self.runners)} strategy runners over {len(groups)} feeds")
+        except Exception as e:
+            logger.error(f"Error in live strategy tick: {e}")
+
+    def _record_progress(self):
+        """Store each runner's last bar and retire runners whose strategy crashed"""
+        with self._lock, get_session() as session:
+            deployments = session.exec(
+                select(PaperStrategyDeployment).where(PaperStrategyDeployment.id.in_(list(self.runners)))
+            ).all()
+            for deployment in deployments:
+                runner = self.runners[deployment.id]
+                deployment.last_bar_at = runner.last_bar_at
+                if runner.error or not runner.alive:
+                    deployment.error = runner.error or "Runner stopped"
+                    deployment.is_active = False
+                    self.runners.pop(deployment.id)
+                session.add(deployment)
+            session.commit()
+
+    def stop_all(self):
+        with self._lock:
+            for runner in self.runners.values():
+                runner.stop()
+            self.runners.clear()
+
+
+_manager = None
+
+def get_live_strategy_manager() -> LiveStrategyManager:
+    global _manager
+    if _manager is None:
+        _manager = LiveStrategyManager()
+    return _manager
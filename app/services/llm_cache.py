@@ -0,0 +1,129 @@
+import hashlib
+import logging
+import os
+import re
+import time
+from typing import Dict, Optional
+
+from app.utility.redis_client import async_redis_client, redis_client
+
+logger = logging.getLogger("llm_cache")
+
+CACHE_TTL = int(os.getenv("LLM_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 10000))
+CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") != "0"
+
+PREFIX = "llmcache"
+LRU_KEY = f"{PREFIX}:lru"
+STATS_KEY = f"{PREFIX}:stats"
+#Bumped when normalize_prompt changes, so entries keyed the old way are never matched
+NORMALIZE_VERSION = 2
+
+
+def normalize_prompt(text: str) -> str:
+    """
+    Prompts that differ only in spacing get the same answer; case is kept, since
+    tickers and indicator names can change meaning with it.
+    """
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def make_key(kind: str, model: str, template_version: int, normalized: str) -> str:
+    digest = hashlib.sha256(f"{model}\0{template_version}\0{NORMALIZE_VERSION}\0{normalized}".encode()).hexdigest()
+    return f"{PREFIX}:{kind}:{digest}"
+
+
+def _count_read(pipe, key: str, value: Optional[str]):
+    """Queue the bookkeeping of a read: sliding TTL and recency on a hit, the hit or miss count"""
+    if value is not None:
+        #Sliding TTL: a key expires CACHE_TTL after its LRU score, so pruning by score is exact
+        pipe.expire(key, CACHE_TTL)
+        pipe.zadd(LRU_KEY, {key: time.time()})
+    pipe.hincrby(STATS_KEY, f"{key.split(':')[1]}:{'hits' if value is not None else 'misses'}", 1)
+
+
+def _queue_write(pipe, key: str, value: str):
+    now = time.time()
+    pipe.setex(key, CACHE_TTL, value)
+    pipe.zadd(LRU_KEY, {key: now})
+    #Expired entries would otherwise count against the cap and push live ones out
+    pipe.zremrangebyscore(LRU_KEY, "-inf", now - CACHE_TTL)
+    pipe.zcard(LRU_KEY)
+
+
+def get(key: str) -> Optional[str]:
+    """Cached response, counting the hit or miss for its kind"""
+    if not CACHE_ENABLED:
+        return None
+    try:
+        value = redis_client.get(key)
+        pipe = redis_client.pipeline(transaction=False)
+        _count_read(pipe, key, value)
+        pipe.execute()
+        return value
+    except Exception as e:
+        logger.warning(f"LLM cache read failed: {e}")
+        return None
+
+
+def put(key: str, value: str):
+    """
+    Store a response, drop LRU members whose keys have expired, then evict the
+    least recently used entries beyond the size cap.
+    """
+    if not CACHE_ENABLED:
+        return
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        _queue_write(pipe, key, value)
+        size = pipe.execute()[-1]
+        if size > CACHE_MAX_ENTRIES:
+            evicted = [k for k, _ in redis_client.zpopmin(LRU_KEY, size - CACHE_MAX_ENTRIES)]
+            if evicted:
+                redis_client.delete(*evicted)
+    except Exception as e:
+        logger.warning(f"LLM cache write failed: {e}")
+
+
+async def get_async(key: str) -> Optional[str]:
+    """get() through the asyncio client, for callers on the event loop"""
+    if not CACHE_ENABLED:
+        return None
+    try:
+        value = await async_redis_client.get(key)
+        async with async_redis_client.pipeline(transaction=False) as pipe:
+            _count_read(pipe, key, value)
+            await pipe.execute()
+        return value
+    except Exception as e:
+        logger.warning(f"LLM cache read failed: {e}")
+        return None
+
+
+async def put_async(key: str, value: str):
+    """put() through the asyncio client, for callers on the event loop"""
+    if not CACHE_ENABLED:
+        return
+    try:
+        async with async_redis_client.pipeline(transaction=False) as pipe:
+            _queue_write(pipe, key, value)
+            size = (await pipe.execute())[-1]
+        if size > CACHE_MAX_ENTRIES:
+            evicted = [k for k, _ in await async_redis_client.zpopmin(LRU_KEY, size - CACHE_MAX_ENTRIES)]
+            if evicted:
+                await async_redis_client.delete(*evicted)
+    except Exception as e:
+        logger.warning(f"LLM cache write failed: {e}")
+
+
+def stats() -> Dict[str, Dict[str, float]]:
+    """Hits, misses and hit rate per kind since the counters were created"""
+    raw = redis_client.hgetall(STATS_KEY)
+    kinds: Dict[str, Dict[str, float]] = {}
+    for field, count in raw.items():
+        kind, outcome = field.rsplit(":", 1)
+        kinds.setdefault(kind, {"hits": 0, "misses": 0})[outcome] = int(count)
+    for counts in kinds.values():
+        total = counts["hits"] + counts["misses"]
+        counts["hit_rate"] = round(counts["hits"] / total, 4) if total else 0.0
+    return {"entries": redis_client.zcard(LRU_KEY), "max_entries": CACHE_MAX_ENTRIES, "kinds": kinds}
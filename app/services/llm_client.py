@@ -0,0 +1,198 @@
+import asyncio
+import hashlib
+import logging
+import os
+import random
+from typing import AsyncIterator, Optional
+
+from app.services import llm_cache
+
+logger = logging.getLogger("llm_client")
+
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini")
+MODEL_NAME = os.getenv("LLM_MODEL", "gemini-2.5-flash")
+#Generations in flight per process; callers past the limit wait instead of piling onto the provider
+MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+#Whole call for complete(), gap between two chunks for stream()
+TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", 60))
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", 0.5))
+
+
+class GeminiProvider:
+    def __init__(self, model_name: str = MODEL_NAME):
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+        self.model_name = model_name
+        self._model = genai.GenerativeModel(model_name)
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        response = await self._model.generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            text = getattr(chunk, "text", "")
+            if text:
+                yield text
+
+
+_STUB_STRATEGY = '''import backtrader as bt
+
+class StubStrategy(bt.Strategy):
+    params = (("fast", {fast}), ("slow", {slow}))
+
+    def __init__(self):
+        self.crossover = bt.indicators.CrossOver(
+            bt.indicators.SMA(self.data.close, period=self.p.fast),
+            bt.indicators.SMA(self.data.close, period=self.p.slow)
+        )
+
+    def next(self):
+        if not self.position and self.crossover > 0:
+            self.buy(size=10)
+        elif self.position and self.crossover < 0:
+            self.close()
+'''
+
+_STUB_EXPLANATION = (
+    "This strategy compares a fast and a slow simple moving average of the close. "
+    "It buys when the fast average crosses above the slow one and closes the position "
+    "when it crosses back below."
+)
+
+
+class StubProvider:
+    """
+    Offline provider for tests and local development (LLM_PROVIDER=stub).
+
+    Code prompts get a moving-average crossover whose periods depend on the prompt,
+    anything else a fixed explanation; both arrive in small chunks like a real stream.
+    """
+    model_name = "stub"
+
+    def __init__(self, chunk_size: int = 32, delay: float = 0.0):
+        self.chunk_size = chunk_size
+        self.delay = delay
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        if "backtrader code" in prompt:
+            seed = int(hashlib.sha256(prompt.encode()).hexdigest(), 16)
+            fast = 5 + seed % 10
+            text = _STUB_STRATEGY.format(fast=fast, slow=fast + 10 + (seed >> 8) % 30)
+        else:
+            text = _STUB_EXPLANATION
+        for i in range(0, len(text), self.chunk_size):
+            await asyncio.sleep(self.delay)
+            yield text[i:i + self.chunk_size]
+
+
+class LLMClient:
+    """
+    Async access to the configured provider with a per-process concurrency cap,
+    timeouts and retries with jittered exponential backoff.
+
+    A stream is only retried until its first chunk has been handed to the caller;
+    after that a failure is raised, since the caller has already seen partial output.
+    """
+
+    def __init__(self, provider, max_concurrency: int = MAX_CONCURRENCY, timeout: float = TIMEOUT_SECONDS,
+                 max_retries: int = MAX_RETRIES, retry_base: float = RETRY_BASE_SECONDS):
+        self.provider = provider
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    @property
+    def model_name(self) -> str:
+        return self.provider.model_name
+
+    async def _backoff(self, attempt: int, error: Exception):
+        delay = self.retry_base * (2 ** attempt) * random.uniform(0.5, 1.5)
+        logger.warning(f"LLM call failed ({error!r}), retry {attempt + 1}/{self.max_retries} in {delay:.2f}s")
+        await asyncio.sleep(delay)
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        async with self._semaphore:
+            attempt = 0
+            while True:
+                chunks = self.provider.stream(prompt)
+                started = False
+                try:
+                    while True:
+                        try:
+                            chunk = await asyncio.wait_for(chunks.__anext__(), self.timeout)
+                        except StopAsyncIteration:
+                            return
+                        started = True
+                        yield chunk
+                except Exception as e:
+                    if started or attempt >= self.max_retries:
+                        raise
+                    await self._backoff(attempt, e)
+                    attempt += 1
+                finally:
+                    await chunks.aclose()
+
+    async def complete(self, prompt: str) -> str:
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    return await asyncio.wait_for(self._collect(prompt), self.timeout)
+                except Exception as e:
+                    if attempt >= self.max_retries:
+                        raise
+                    await self._backoff(attempt, e)
+
+    async def _collect(self, prompt: str) -> str:
+        return "".join([chunk async for chunk in self.provider.stream(prompt)])
+
+
+_client: Optional[LLMClient] = None
+_sync_model = None
+
+def get_llm_client() -> LLMClient:
+    global _client
+    if _client is None:
+        provider = StubProvider() if LLM_PROVIDER == "stub" else GeminiProvider()
+        _client = LLMClient(provider)
+    return _client
+
+
+def get_sync_model():
+    """Gemini model for the blocking callers; the SDK is only imported on first use"""
+    global _sync_model
+    if _sync_model is None:
+        import google.generativeai as genai
+        genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+        _sync_model = genai.GenerativeModel(MODEL_NAME)
+    return _sync_model
+
+
+async def complete_cached(kind: str, template_version: int, normalized: str, prompt: str) -> str:
+    """Full response from the LLM cache, or from the provider and then cached"""
+    client = get_llm_client()
+    cache_key = llm_cache.make_key(kind, client.model_name, template_version, normalized)
+    cached = await llm_cache.get_async(cache_key)
+    if cached is not None:
+        return cached
+    text = (await client.complete(prompt)).strip()
+    await llm_cache.put_async(cache_key, text)
+    return text
+
+
+async def stream_cached(kind: str, template_version: int, normalized: str, prompt: str) -> AsyncIterator[str]:
+    """
+    Response chunks as they arrive; a cached response comes back as a single chunk.
+
+    The joined text is cached only once the stream completes.
+    """
+    client = get_llm_client()
+    cache_key = llm_cache.make_key(kind, client.model_name, template_version, normalized)
+    cached = await llm_cache.get_async(cache_key)
+    if cached is not None:
+        yield cached
+        return
+    parts = []
+    async for chunk in client.stream(prompt):
+        parts.append(chunk)
+        yield chunk
+    await llm_cache.put_async(cache_key, "".join(parts).strip())
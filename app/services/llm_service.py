@@ -1,24 +1,53 @@
+import logging
 import os
+from typing import AsyncIterator
 from dotenv import load_dotenv
-import google.generativeai as genai
+from app.services import llm_cache, llm_client
 
 load_dotenv()
-api_key = os.getenv("GOOGLE_API_KEY")
-print(api_key)
-genai.configure(api_key=api_key)
+
+logger = logging.getLogger("llm_service")
+
+MODEL_NAME = llm_client.MODEL_NAME
+#Bump when the prompt template changes so cached answers to the old template are not reused
+GENERATE_TEMPLATE_VERSION = 2
+
+def build_generate_prompt(user_prompt: str) -> str:
+    return (
+        "You are a quantitative trading assistant. "
+        "Generate Python backtrader code for the following strategy description. "
+        "Do not include explanations, comments, or markdown. Only output valid Python code. "
+        "Only import backtrader, math, numpy or pandas, and never use attributes that start with an underscore (self.order, not self._order).\n\n"
+        f"Strategy description:\n{user_prompt}"
+    )
 
 def generate_strategy_code(user_prompt: str) -> str:
+    cache_key = llm_cache.make_key("generate", MODEL_NAME, GENERATE_TEMPLATE_VERSION, llm_cache.normalize_prompt(user_prompt))
+    cached = llm_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
     try:
-        model = genai.GenerativeModel("gemini-2.5-flash")
-        prompt_text = (
-            "You are a quantitative trading assistant. "
-            "Generate Python backtrader code for the following strategy description. "
-            "Do not include explanations, comments, or markdown. Only output valid Python code.\n\n"
-            f"Strategy description:\n{user_prompt}"
-        )
-        response = model.generate_content(prompt_text)
+        response = llm_client.get_sync_model().generate_content(build_generate_prompt(user_prompt))
         print("Raw response:", response)
-        return response.text.strip()
+        code = response.text.strip()
+        llm_cache.put(cache_key, code)
+        return code
     except Exception as e:
         print("Gemini LLM error:", e)
         return f"Error generating code: {e}"
+
+async def generate_strategy_code_async(user_prompt: str) -> str:
+    """generate_strategy_code through the async client, without holding a worker thread"""
+    try:
+        return await llm_client.complete_cached(
+            "generate", GENERATE_TEMPLATE_VERSION, llm_cache.normalize_prompt(user_prompt), build_generate_prompt(user_prompt)
+        )
+    except Exception as e:
+        logger.warning(f"LLM error generating code: {e!r}")
+        return f"Error generating code: {e}"
+
+def stream_strategy_code(user_prompt: str) -> AsyncIterator[str]:
+    return llm_client.stream_cached(
+        "generate", GENERATE_TEMPLATE_VERSION, llm_cache.normalize_prompt(user_prompt), build_generate_prompt(user_prompt)
+    )
@@ -1,39 +1,133 @@
-import yfinance as yf
-from typing import Optional, Dict
+from typing import TYPE_CHECKING, Callable, Optional, Dict
 from datetime import datetime
-import pandas as pd
+from app.services.data_requirements import warmup_span
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 class MarketDataService:
     """Service for fetching real time and historical market data"""
+
+    #When set, quotes come from here instead of the network, e.g. recorded bars during a replay
+    price_provider: Optional[Callable[[str], Optional[float]]] = None
+
     @staticmethod
     def get_current_price(symbol:str) -> Optional[float]:
         """Get latest price for a symbol"""
+        if MarketDataService.price_provider is not None:
+            return MarketDataService.price_provider(symbol)
+        import yfinance as yf
+        from app.services import quote_tape
         try:
             ticker = yf.Ticker(symbol)
-            data = ticker.history(period="1d", interval="1m")
+            interval = "1m"
+            data = ticker.history(period="1d", interval=interval)
             if data.empty:
+                interval = "1d"
                 data = ticker.history(period="5d")
             if not data.empty:
-                return float(data['Close'].iloc[-1])
+                price = float(data['Close'].iloc[-1])
+                MarketDataService._record_history(symbol, interval, data)
+                quote_tape.record_quote(symbol, price)
+                return price
             return None
         except Exception as e:
-            print(f"Error checking market status: {e}")
-            return False
+            print(f"Error fetching current price for {symbol}: {e}")
+            return None
 
     @staticmethod
-    def get_intraday_data(symbol:str, interval: str="1m") -> Optional[pd.DataFrame]:
+    def _record_history(symbol: str, interval: str, data: "pd.DataFrame"):
+        """Write a raw yfinance history frame to the quote tape"""
+        from app.services import quote_tape
+        bars = data.rename(columns=str.lower)
+        if bars.index.tz is not None:
+            bars.index = bars.index.tz_convert("UTC").tz_localize(None)
+        quote_tape.record_bars(symbol, interval, bars)
+
+    @staticmethod
+    def get_intraday_data(symbol:str, interval: str="1m") -> Optional["pd.DataFrame"]:
         """Get intraday data for a symbol"""
+        import yfinance as yf
         try:
             ticker = yf.Ticker(symbol)
             data = ticker.history(period="1d", interval=interval)
-            return data if not data.empty else None
+            if data.empty:
+                return None
+            MarketDataService._record_history(symbol, interval, data)
+            return data
         except Exception as e:
             print(f"Error fetching intraday data for {symbol}: {e}")
             return None
 
+    @staticmethod
+    def _normalize_bars(data: "pd.DataFrame") -> "pd.DataFrame":
+        """Lowercase OHLCV columns and a naive UTC index"""
+        data.columns = [str(col).lower() for col in data.columns]
+        if data.index.tz is not None:
+            data.index = data.index.tz_convert("UTC").tz_localize(None)
+        return data[["open", "high", "low", "close", "volume"]]
+
+    @staticmethod
+    def _naive_utc(at: datetime) -> "pd.Timestamp":
+        """A timestamp as naive UTC; naive inputs are taken to be UTC already"""
+        import pandas as pd
+        at = pd.Timestamp(at)
+        if at.tz is not None:
+            at = at.tz_convert("UTC").tz_localize(None)
+        return at
+
+    @staticmethod
+    def get_recent_bars(symbol: str, interval: str = "1m", period: str = "1d") -> Optional["pd.DataFrame"]:
+        """Recent OHLCV bars with lowercase columns and a naive UTC index, oldest first"""
+        import yfinance as yf
+        from app.services import quote_tape
+        try:
+            data = yf.Ticker(symbol).history(period=period, interval=interval)
+            if data.empty:
+                return None
+            data = MarketDataService._normalize_bars(data)
+            quote_tape.record_bars(symbol, interval, data)
+            return data
+        except Exception as e:
+            print(f"Error fetching bars for {symbol}: {e}")
+            return None
+
+    @staticmethod
+    def get_history(
+        symbol: str,
+        start: datetime,
+        end: Optional[datetime] = None,
+        warmup: int = 0,
+        interval: str = "1d"
+    ) -> Optional["pd.DataFrame"]:
+        """
+        OHLCV bars for [start, end) plus the `warmup` bars just before start, in the
+        same shape as get_recent_bars. Only the calendar span that can hold those
+        bars is downloaded, rather than a fixed period.
+        """
+        import pandas as pd
+        import yfinance as yf
+        from app.services import quote_tape
+        try:
+            fetch_start = start - warmup_span(warmup, interval) if warmup else start
+            data = yf.Ticker(symbol).history(start=fetch_start, end=end, interval=interval)
+            if data.empty:
+                return None
+            data = MarketDataService._normalize_bars(data)
+            #The index is naive UTC; compare against start and end in the same terms
+            first = data.index.searchsorted(MarketDataService._naive_utc(start))
+            last = len(data) if end is None else data.index.searchsorted(MarketDataService._naive_utc(end))
+            data = data.iloc[max(first - warmup, 0):last]
+            quote_tape.record_bars(symbol, interval, data)
+            return data
+        except Exception as e:
+            print(f"Error fetching history for {symbol}: {e}")
+            return None
+
     @staticmethod
     def is_market_open(symbol:str) -> bool:
         """Check if the market if currently open for the symbol"""
+        import yfinance as yf
         try:
             ticker = yf.Ticker(symbol)
             info = ticker.info
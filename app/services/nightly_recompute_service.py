@@ -0,0 +1,237 @@
+import os
+import time
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+import pandas as pd
+import yfinance as yf
+from sqlmodel import select, func
+
+from app.db import get_session
+from app.models.strategy import Strategy
+from app.models.strategy_metrics import StrategyMetricsModel
+from app.models.leaderboard import LeaderboardEntry
+from app.models.paper_trading import PaperOrder
+from app.models.users import User
+from app.services.backtest_service import run_backtest_on_frame, normalize_ohlcv
+from app.services.data_requirements import analyze_code, warmup_span
+from app.services.leaderboard_service import compute_score, SCORING_VERSION
+from app.services import leaderboard_cache
+from app.utility.redis_client import redis_client
+from app.services.metrics import PerformanceMetrics
+from app.utility.validators import validate_strategy_code
+
+logger = logging.getLogger("nightly_recompute")
+
+DEFAULT_TICKERS = [t.strip() for t in os.getenv("NIGHTLY_DEFAULT_TICKERS", "RELIANCE.NS").split(",") if t.strip()]
+NIGHTLY_WORKERS = int(os.getenv("NIGHTLY_WORKERS", os.cpu_count() or 2))
+NIGHTLY_BATCH_SIZE = int(os.getenv("NIGHTLY_BATCH_SIZE", 50))
+NIGHTLY_DATA_PERIOD = "1y"
+PERIOD_DAYS = {"1mo": 31, "3mo": 92, "6mo": 183, "1y": 365, "2y": 730, "5y": 1826}
+NIGHTLY_DATASET = "nightly"
+#The shared feed is extended for the longest warmup up to this; strategies needing more are skipped
+NIGHTLY_MAX_WARMUP_BARS = int(os.getenv("NIGHTLY_MAX_WARMUP_BARS", 1000))
+
+
+def list_strategy_jobs(run_start: datetime) -> List[Tuple[Strategy, List[str]]]:
+    """
+    List saved strategies with their tracked tickers in priority order.
+
+    Strategies already recomputed since run_start are skipped, which is what lets a
+    crashed run resume: every finished strategy has a metrics row from this run.
+    Never computed strategies go first, then the ones with the stalest metrics.
+    Strategies whose code fails validate_strategy_code are logged and never run.
+    """
+    with get_session() as session:
+        last_calc = dict(session.exec(
+            select(StrategyMetricsModel.strategy_id, func.max(StrategyMetricsModel.calculation_date))
+            .group_by(StrategyMetricsModel.strategy_id)
+        ).all())
+
+        strategies = []
+        for s in session.exec(select(Strategy)).all():
+            if last_calc.get(s.id) is not None and last_calc[s.id] >= run_start:
+                continue
+            validation = validate_strategy_code(s.code or "")
+            if not validation["valid"]:
+                logger.warning("Skipping strategy %s: %s", s.id, validation["reason"])
+                continue
+            strategies.append(s)
+        if not strategies:
+            return []
+
+        tracked: Dict[int, List[str]] = {}
+        rows = session.exec(
+            select(PaperOrder.strategy_id, PaperOrder.symbol)
+            .where(PaperOrder.strategy_id.in_([s.id for s in strategies]))
+            .distinct()
+        ).all()
+        for strategy_id, symbol in rows:
+            tracked.setdefault(strategy_id, []).append(symbol)
+
+    strategies.sort(key=lambda s: (
+        last_calc.get(s.id) is not None,
+        last_calc.get(s.id) or datetime.min,
+        -(s.created_at.timestamp() if s.created_at else 0)
+    ))
+    return [(s, sorted(tracked.get(s.id, DEFAULT_TICKERS))) for s in strategies]
+
+
+def prefetch_bars(tickers: List[str], period: str = NIGHTLY_DATA_PERIOD, warmup: int = 0) -> Dict[str, pd.DataFrame]:
+    """
+    Download bars for every ticker in one bulk request.
+
+    With `warmup`, the shared feed starts that many daily bars before the period,
+    so the strategy with the longest lookback still gets the whole period settled.
+    """
+    if not tickers:
+        return {}
+    if warmup:
+        start = datetime.utcnow() - timedelta(days=PERIOD_DAYS[period]) - warmup_span(warmup, "1d")
+        raw = yf.download(tickers, start=start.date(), group_by="ticker", threads=True, progress=False)
+    else:
+        raw = yf.download(tickers, period=period, group_by="ticker", threads=True, progress=False)
+    bars = {}
+    for ticker in tickers:
+        try:
+            df = raw[ticker] if isinstance(raw.columns, pd.MultiIndex) else raw
+        except KeyError:
+            logger.warning("No bars returned for %s", ticker)
+            continue
+        df = normalize_ohlcv(df.dropna(how="all").copy())
+        if not df.empty:
+            bars[ticker] = df
+    return bars
+
+
+def _run_job(strategy_id: int, code: str, ticker: str, df: pd.DataFrame) -> dict:
+    """Process pool worker: backtest one strategy on one ticker"""
+    try:
+        result = run_backtest_on_frame(code, df)
+        if "error" in result:
+            return {"strategy_id": strategy_id, "ticker": ticker, "error": result["error"]}
+        return {
+            "strategy_id": strategy_id,
+            "ticker": ticker,
+            "performance": PerformanceMetrics.calculate_metrics(result["returns"]),
+            "metrics": result["metrics"]
+        }
+    except Exception as e:
+        return {"strategy_id": strategy_id, "ticker": ticker, "error": str(e)}
+
+
+def _flush(results: List[dict], strategies: Dict[int, Strategy], user_ids: Dict[str, int], run_at: datetime):
+    """Write metrics rows and leaderboard entries for finished strategies in one transaction"""
+    rows = []
+    for res in results:
+        strategy = strategies[res["strategy_id"]]
+        rows.append(StrategyMetricsModel(
+            strategy_id=strategy.id,
+            calculation_date=run_at,
+            **res["performance"]
+        ))
+        metrics = res["metrics"]
+        rows.append(LeaderboardEntry(
+            user_id=user_ids.get(strategy.user_id),
+            username=strategy.user_id,
+            strategy_id=strategy.id,
+            strategy_name=strategy.name,
+            dataset=NIGHTLY_DATASET,
+            run_at=run_at,
+            return_pct=metrics.get("Total Return") or 0.0,
+            sharpe=metrics.get("Sharpe Ratio"),
+            max_drawdown=metrics.get("Max Drawdown"),
+            score=compute_score(metrics),
+            score_version=SCORING_VERSION,
+            notes=res["ticker"]
+        ))
+    with get_session() as session:
+        session.add_all(rows)
+        session.flush()
+        # Queue the Redis writes while ids are loaded, send them only once SQL has committed
+        pipe = redis_client.pipeline(transaction=False)
+        for row in rows:
+            if isinstance(row, LeaderboardEntry):
+                leaderboard_cache.record_entry(row, pipe)
+        session.commit()
+    try:
+        pipe.execute()
+    except Exception as e:
+        logger.warning("Could not add nightly leaderboard entries to Redis: %s", e)
+
+
+def run_nightly_recompute(max_workers: int = NIGHTLY_WORKERS, batch_size: int = NIGHTLY_BATCH_SIZE) -> dict:
+    """Recompute metrics and leaderboard scores for every saved strategy"""
+    started = time.monotonic()
+    run_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    jobs = list_strategy_jobs(run_start)
+    #One outlier lookback would stretch every ticker's download, so those are left out
+    warmups = {s.id: analyze_code(s.code).warmup_bars for s, _ in jobs}
+    skipped = [s for s, _ in jobs if warmups[s.id] > NIGHTLY_MAX_WARMUP_BARS]
+    for s in skipped:
+        logger.warning("Skipping strategy %s: needs %s warmup bars, over the %s limit",
+                       s.id, warmups[s.id], NIGHTLY_MAX_WARMUP_BARS)
+    jobs = [(s, ts) for s, ts in jobs if warmups[s.id] <= NIGHTLY_MAX_WARMUP_BARS]
+    if not jobs:
+        logger.info("Nightly recompute: nothing to do")
+        return {"strategies": 0, "failed": 0, "skipped": len(skipped), "strategies_per_minute": 0.0}
+
+    tickers = sorted({t for _, ts in jobs for t in ts})
+    warmup = max(warmups[s.id] for s, _ in jobs)
+    bars = prefetch_bars(tickers, warmup=warmup)
+    logger.info("Nightly recompute: %s strategies, %s tickers prefetched with %s warmup bars", len(jobs), len(bars), warmup)
+
+    strategies = {s.id: s for s, _ in jobs}
+    remaining = {s.id: len([t for t in ts if t in bars]) for s, ts in jobs}
+    with get_session() as session:
+        emails = [s.user_id for s in strategies.values() if s.user_id]
+        user_ids = dict(session.exec(select(User.email, User.id).where(User.email.in_(emails))).all()) if emails else {}
+
+    done, failed = 0, 0
+    pending: Dict[int, List[dict]] = {}
+    ready: List[dict] = []
+    run_at = datetime.utcnow()
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        # Submission order is the priority order; the pool hands work out FIFO
+        futures = [
+            pool.submit(_run_job, s.id, s.code, t, bars[t])
+            for s, ts in jobs for t in ts if t in bars
+        ]
+        for future in as_completed(futures):
+            res = future.result()
+            sid = res["strategy_id"]
+            if "error" in res:
+                logger.warning("Nightly backtest failed for strategy %s on %s: %s", sid, res["ticker"], res["error"])
+            else:
+                pending.setdefault(sid, []).append(res)
+
+            remaining[sid] -= 1
+            if remaining[sid] > 0:
+                continue
+
+            # All tickers of this strategy finished: it is written out as a unit
+            finished = pending.pop(sid, [])
+            if finished:
+                ready.extend(finished)
+                done += 1
+            else:
+                failed += 1
+
+            if len(ready) >= batch_size:
+                _flush(ready, strategies, user_ids, run_at)
+                ready = []
+                minutes = (time.monotonic() - started) / 60
+                logger.info("Nightly recompute: %s/%s strategies, %.1f strategies/min",
+                            done + failed, len(jobs), done / minutes if minutes else 0.0)
+
+    if ready:
+        _flush(ready, strategies, user_ids, run_at)
+
+    minutes = (time.monotonic() - started) / 60
+    rate = done / minutes if minutes else 0.0
+    logger.info("Nightly recompute finished: %s done, %s failed, %.1f strategies/min", done, failed, rate)
+    return {"strategies": done, "failed": failed, "skipped": len(skipped), "strategies_per_minute": round(rate, 2)}
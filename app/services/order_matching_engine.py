@@ -0,0 +1,210 @@
+from bisect import bisect_left, bisect_right, insort
+from datetime import datetime, timedelta
+from threading import RLock
+from typing import Dict, List, Optional, Set, Tuple
+from sqlmodel import Session, select
+from app.models.paper_trading import PaperOrder, OrderSide, OrderType, OrderStatus
+from app.utility import clock
+import logging
+import os
+
+logger = logging.getLogger("order_matching_engine")
+
+#Ids and created_at are assigned before commit, so a slow transaction can make an order
+#visible after ones created later; each sync re-reads this much of the past to catch it
+SYNC_OVERLAP_SECONDS = int(os.getenv("MATCHING_SYNC_OVERLAP_SECONDS", 120))
+
+INF = float("inf")
+
+# Which side of a sorted book a price update triggers:
+# "up" = every key >= price, "down" = every key <= price, "all" = the whole book
+_TRIGGERS = {
+    (OrderType.LIMIT, OrderSide.BUY): "up",         # fills once price <= limit
+    (OrderType.LIMIT, OrderSide.SELL): "down",      # fills once price >= limit
+    (OrderType.STOP, OrderSide.BUY): "down",        # fills once price >= stop
+    (OrderType.STOP, OrderSide.SELL): "up",         # fills once price <= stop
+    (OrderType.STOP_LIMIT, OrderSide.BUY): "down",
+    (OrderType.STOP_LIMIT, OrderSide.SELL): "up",
+    (OrderType.MARKET, OrderSide.BUY): "all",
+    (OrderType.MARKET, OrderSide.SELL): "all",
+}
+
+
+def fill_price_for(order: PaperOrder, current_price: float) -> Optional[float]:
+    """Price an order fills at given the current price, or None if it does not trigger"""
+    if order.order_type == OrderType.MARKET:
+        return current_price
+    if order.order_type == OrderType.LIMIT:
+        if order.side == OrderSide.BUY and current_price <= order.price:
+            return order.price
+        if order.side == OrderSide.SELL and current_price >= order.price:
+            return order.price
+    elif order.order_type == OrderType.STOP:
+        if order.side == OrderSide.BUY and current_price >= order.stop_price:
+            return current_price
+        if order.side == OrderSide.SELL and current_price <= order.stop_price:
+            return current_price
+    elif order.order_type == OrderType.STOP_LIMIT:
+        if order.side == OrderSide.BUY and order.stop_price <= current_price <= order.price:
+            return order.price
+        if order.side == OrderSide.SELL and order.price <= current_price <= order.stop_price:
+            return order.price
+    return None
+
+
+class _RestingOrder:
+    __slots__ = ("order_id", "symbol", "side", "order_type", "price", "stop_price", "key")
+
+    def __init__(self, order: PaperOrder):
+        self.order_id = order.id
+        self.symbol = order.symbol
+        self.side = order.side
+        self.order_type = order.order_type
+        self.price = order.price
+        self.stop_price = order.stop_price
+        trigger = order.stop_price if order.order_type in (OrderType.STOP, OrderType.STOP_LIMIT) else order.price
+        self.key = (trigger if order.order_type != OrderType.MARKET else 0.0, order.id)
+
+
+class OrderMatchingEngine:
+    """
+    Pending orders indexed by symbol in books sorted by trigger price.
+
+    A price update bisects each book of the symbol and only pops the orders whose
+    trigger was crossed, so the cost of a tick follows the number of fills rather
+    than the number of resting orders.
+    """
+
+    def __init__(self):
+        self._books: Dict[str, Dict[Tuple[OrderType, OrderSide], list]] = {}
+        self._orders: Dict[int, _RestingOrder] = {}
+        self._lock = RLock()
+        #Start of the last load; None until the first rebuild or sync
+        self.synced_at: Optional[datetime] = None
+        #None = every account; otherwise only accounts whose id % partition_count is listed
+        self.partitions: Optional[Set[int]] = None
+        self.partition_count = 1
+
+    def __len__(self):
+        return len(self._orders)
+
+    def __contains__(self, order_id: int):
+        return order_id in self._orders
+
+    def assign(self, partitions: Optional[Set[int]], partition_count: int = 1):
+        """Restrict the engine to a set of account partitions; call rebuild afterwards"""
+        with self._lock:
+            self.partitions = set(partitions) if partitions is not None else None
+            self.partition_count = partition_count
+
+    def _partition_filter(self):
+        if self.partitions is None:
+            return None
+        return (PaperOrder.account_id % self.partition_count).in_(sorted(self.partitions))
+
+    def add(self, order: PaperOrder) -> bool:
+        """Index a pending order; anything not pending, missing its prices or in another partition is ignored"""
+        if order.id is None or order.status != OrderStatus.PENDING:
+            return False
+        if self.partitions is not None and order.account_id % self.partition_count not in self.partitions:
+            return False
+        if order.order_type in (OrderType.LIMIT, OrderType.STOP_LIMIT) and order.price is None:
+            return False
+        if order.order_type in (OrderType.STOP, OrderType.STOP_LIMIT) and order.stop_price is None:
+            return False
+
+        resting = _RestingOrder(order)
+        with self._lock:
+            if order.id in self._orders:
+                return False
+            book = self._books.setdefault(order.symbol, {}).setdefault((order.order_type, order.side), [])
+            insort(book, resting.key)
+            self._orders[order.id] = resting
+        return True
+
+    def remove(self, order_id: int) -> bool:
+        with self._lock:
+            resting = self._orders.pop(order_id, None)
+            if resting is None:
+                return False
+            book = self._books[resting.symbol][(resting.order_type, resting.side)]
+            i = bisect_left(book, resting.key)
+            if i < len(book) and book[i] == resting.key:
+                del book[i]
+            return True
+
+    def symbols(self) -> List[str]:
+        with self._lock:
+            return [s for s, books in self._books.items() if any(books.values())]
+
+    def on_price(self, symbol: str, price: float) -> List[Tuple[int, float]]:
+        """Pop every order the price triggers and return (order_id, fill_price) pairs"""
+        fills = []
+        with self._lock:
+            for book_key, book in self._books.get(symbol, {}).items():
+                if not book:
+                    continue
+                direction = _TRIGGERS[book_key]
+                if direction == "up":
+                    lo, hi = bisect_left(book, (price, -INF)), len(book)
+                elif direction == "down":
+                    lo, hi = 0, bisect_right(book, (price, INF))
+                else:
+                    lo, hi = 0, len(book)
+
+                keep = []
+                for key in book[lo:hi]:
+                    resting = self._orders[key[1]]
+                    fill = fill_price_for(resting, price)
+                    if fill is None:
+                        # Stop-limit whose stop was crossed but whose limit is not met yet
+                        keep.append(key)
+                        continue
+                    fills.append((resting.order_id, fill))
+                    del self._orders[resting.order_id]
+                book[lo:hi] = keep
+        return fills
+
+    def rebuild(self, session: Session, order_filter=None):
+        """Reload every pending order of the assigned partitions from the database"""
+        started = clock.utcnow()
+        query = select(PaperOrder).where(PaperOrder.status == OrderStatus.PENDING)
+        for condition in (order_filter, self._partition_filter()):
+            if condition is not None:
+                query = query.where(condition)
+        orders = session.exec(query).all()
+        with self._lock:
+            self._books.clear()
+            self._orders.clear()
+            self.synced_at = started
+            for order in orders:
+                self.add(order)
+        logger.info(f"Matching engine rebuilt with {len(self._orders)} pending orders")
+
+    def sync(self, session: Session, order_filter=None) -> int:
+        """
+        Pick up pending orders committed since the last load, e.g. by the API processes.
+
+        Reads from SYNC_OVERLAP_SECONDS before the previous load started rather than
+        above the highest id seen, so an order committed out of id order is not skipped;
+        orders already in the books are ignored by add.
+        """
+        started = clock.utcnow()
+        query = select(PaperOrder).where(PaperOrder.status == OrderStatus.PENDING)
+        if self.synced_at is not None:
+            query = query.where(PaperOrder.created_at >= self.synced_at - timedelta(seconds=SYNC_OVERLAP_SECONDS))
+        for condition in (order_filter, self._partition_filter()):
+            if condition is not None:
+                query = query.where(condition)
+        added = sum(self.add(order) for order in session.exec(query).all())
+        self.synced_at = started
+        return added
+
+
+_engine = None
+
+def get_matching_engine() -> OrderMatchingEngine:
+    global _engine
+    if _engine is None:
+        _engine = OrderMatchingEngine()
+    return _engine
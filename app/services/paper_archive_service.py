@@ -0,0 +1,242 @@
+import logging
+import os
+import sys
+from datetime import date, datetime
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import DateTime, Float, Integer, delete, exists, func
+from sqlmodel import Session, select
+
+from app.db import get_session
+from app.models.paper_trading import PaperArchivePartition, PaperOrder, PaperTrade, OrderStatus
+from app.utility.pagination import decode_cursor
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+logger = logging.getLogger("paper_archive")
+
+#Every API worker reads partitions back, so this must be storage they all see: a shared
+#mount or an object store URI pyarrow can open (s3://bucket/paper-archive). Archiving
+#refuses to run without it rather than leave months on one machine's disk
+ARCHIVE_URI = os.getenv("PAPER_ARCHIVE_URI")
+RETENTION_MONTHS = int(os.getenv("PAPER_ARCHIVE_RETENTION_MONTHS", 3))
+CHUNK_SIZE = 50000
+
+#Archived table -> (model, time column the months are cut on)
+ARCHIVED = {
+    PaperTrade.__tablename__: (PaperTrade, PaperTrade.timestamp),
+    PaperOrder.__tablename__: (PaperOrder, PaperOrder.created_at),
+}
+TERMINAL_STATUSES = [OrderStatus.FILLED, OrderStatus.CANCELLED, OrderStatus.REJECTED]
+
+
+def _month_start(at: datetime) -> date:
+    return date(at.year, at.month, 1)
+
+
+def _next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _as_datetime(day: date) -> datetime:
+    return datetime.combine(day, datetime.min.time())
+
+
+def _archive_root() -> str:
+    if not ARCHIVE_URI:
+        raise RuntimeError("PAPER_ARCHIVE_URI is not set; point it at storage every worker can read")
+    root = ARCHIVE_URI if "://" in ARCHIVE_URI else os.path.abspath(ARCHIVE_URI)
+    return root.rstrip("/")
+
+
+def _filesystem(location: str):
+    """pyarrow filesystem and path within it for a partition location, local or remote"""
+    from pyarrow import fs
+    return fs.FileSystem.from_uri(location)
+
+
+def _schema(model) -> "pa.Schema":
+    """Parquet schema from the table columns, so all-null chunks keep their types"""
+    import pyarrow as pa
+
+    def arrow_type(column):
+        if isinstance(column.type, DateTime):
+            return pa.timestamp("us")
+        if isinstance(column.type, Integer):
+            return pa.int64()
+        if isinstance(column.type, Float):
+            return pa.float64()
+        return pa.string()
+    return pa.schema([(c.name, arrow_type(c)) for c in model.__table__.columns])
+
+
+def _to_record(row) -> Dict[str, Any]:
+    return {k: (v.value if hasattr(v, "value") else v) for k, v in row.model_dump().items()}
+
+
+def _archivable(model, time_column, month: date):
+    query = select(model).where(
+        time_column >= _as_datetime(month), time_column < _as_datetime(_next_month(month))
+    )
+    if model is PaperOrder:
+        #Open orders stay hot, and so do orders whose trades are still hot (they reference them)
+        query = query.where(
+            PaperOrder.status.in_(TERMINAL_STATUSES),
+            ~exists().where(PaperTrade.order_id == PaperOrder.id)
+        )
+    return query
+
+
+def archive_month(table_name: str, month: date) -> int:
+    """
+    Move one month of a table into a Parquet file and drop it from the hot table.
+
+    Rows are streamed in id order into zstd row groups; the file is renamed into place
+    before the manifest row and the deletes commit together, so a crash leaves at
+    worst an unreferenced file and the rows still hot.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    model, time_column = ARCHIVED[table_name]
+    root = _archive_root()
+    with get_session() as session:
+        part = session.exec(
+            select(func.count()).select_from(PaperArchivePartition).where(
+                PaperArchivePartition.table_name == table_name, PaperArchivePartition.month == month
+            )
+        ).one()
+        location = f"{root}/{table_name}/{month:%Y-%m}-part{part}.parquet"
+        filesystem, path = _filesystem(location)
+        filesystem.create_dir(path.rsplit("/", 1)[0], recursive=True)
+
+        ids: List[int] = []
+        writer = None
+        last_id = 0
+        try:
+            while True:
+                rows = session.exec(
+                    _archivable(model, time_column, month).where(model.id > last_id).order_by(model.id).limit(CHUNK_SIZE)
+                ).all()
+                if not rows:
+                    break
+                if writer is None:
+                    writer = pq.ParquetWriter(f"{path}.tmp", _schema(model), compression="zstd", filesystem=filesystem)
+                writer.write_table(pa.Table.from_pylist([_to_record(r) for r in rows], schema=writer.schema))
+                ids.extend(r.id for r in rows)
+                last_id = rows[-1].id
+                session.expunge_all()
+        finally:
+            if writer is not None:
+                writer.close()
+
+        if not ids:
+            return 0
+        filesystem.move(f"{path}.tmp", path)
+
+        session.add(PaperArchivePartition(
+            table_name=table_name, month=month, path=location, row_count=len(ids)
+        ))
+        for i in range(0, len(ids), CHUNK_SIZE):
+            session.exec(delete(model).where(model.id.in_(ids[i:i + CHUNK_SIZE])))
+        session.commit()
+
+    logger.info(f"Archived {len(ids)} {table_name} rows from {month:%Y-%m} to {location}")
+    return len(ids)
+
+
+def archive_old_partitions(now: datetime = None, retention_months: int = RETENTION_MONTHS) -> Dict[str, int]:
+    """Scheduler entry point: archive every month that fell out of the retention window"""
+    _archive_root()
+    cutoff = _month_start(now or datetime.utcnow())
+    for _ in range(retention_months):
+        cutoff = date(cutoff.year - (cutoff.month == 1), (cutoff.month - 2) % 12 + 1, 1)
+
+    archived = {}
+    #Trades first, so the orders they referenced become archivable in the same run
+    for table_name in (PaperTrade.__tablename__, PaperOrder.__tablename__):
+        model, time_column = ARCHIVED[table_name]
+        with get_session() as session:
+            oldest = session.exec(select(func.min(time_column))).one()
+        archived[table_name] = 0
+        month = _month_start(oldest) if oldest else cutoff
+        while month < cutoff:
+            archived[table_name] += archive_month(table_name, month)
+            month = _next_month(month)
+    return archived
+
+
+def merge_cold(
+    session: Session,
+    model,
+    hot_rows: Sequence,
+    limit: int,
+    account_id: int,
+    cursor: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    **equals
+) -> List:
+    """
+    Merge archived rows into a newest-first keyset page read from the hot table.
+
+    `hot_rows` is the limit+1 fetch from the hot table. Only partitions that could hold
+    a row ranking inside that fetch are read, so pages that the hot table fills on its
+    own, the common case for recent data, never touch the archive. Partitions are
+    read newest month first and reading stops once the page is full with rows newer
+    than the next partition's month. A partition that cannot be read is skipped with a
+    warning, so the page falls back to the rows still in the database.
+    """
+    table_name = model.__tablename__
+    time_name = ARCHIVED[table_name][1].key
+    before = tuple(decode_cursor(cursor)) if cursor else None
+
+    query = select(PaperArchivePartition).where(PaperArchivePartition.table_name == table_name)
+    floor = getattr(hot_rows[limit], time_name) if len(hot_rows) > limit else start
+    if floor:
+        query = query.where(PaperArchivePartition.month >= _month_start(floor))
+    ceiling = min([t for t in (end, before[0] if before else None) if t is not None], default=None)
+    if ceiling:
+        query = query.where(PaperArchivePartition.month <= _month_start(ceiling))
+    partitions = session.exec(query.order_by(PaperArchivePartition.month.desc())).all()
+    if not partitions:
+        return list(hot_rows)
+
+    filters = [("account_id", "=", account_id)]
+    filters += [(name, "=", value.value if hasattr(value, "value") else value) for name, value in equals.items() if value is not None]
+    if start:
+        filters.append((time_name, ">=", start))
+    if end:
+        filters.append((time_name, "<", end))
+    if before:
+        filters.append((time_name, "<=", before[0]))
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    merged = list(hot_rows)
+    for partition in partitions:
+        #Every row of this and older partitions ranks below a full page that ends after the month
+        if len(merged) > limit and getattr(merged[limit], time_name) >= _as_datetime(_next_month(partition.month)):
+            break
+        try:
+            filesystem, path = _filesystem(partition.path)
+            records = pq.read_table(path, filters=filters, filesystem=filesystem).to_pylist()
+        except (OSError, pa.ArrowException) as e:
+            logger.warning(f"Skipping unreadable archive partition {partition.path}: {e}")
+            continue
+        cold = []
+        for record in records:
+            key = (record[time_name], record["id"])
+            if before and key >= before:
+                continue
+            cold.append(model(**record))
+        merged = sorted(merged + cold, key=lambda r: (getattr(r, time_name), r.id), reverse=True)[:limit + 1]
+    return merged
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    months = int(sys.argv[1]) if len(sys.argv) > 1 else RETENTION_MONTHS
+    print(f"Archived {archive_old_partitions(retention_months=months)}")
@@ -0,0 +1,268 @@
+import asyncio
+import json
+import logging
+import os
+from collections import OrderedDict, defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from starlette.websockets import WebSocket
+
+from app.utility.redis_client import async_redis_client, redis_client
+
+logger = logging.getLogger("paper_events")
+
+CHANNEL_PREFIX = "paper:events:"
+#Events a connection may have waiting after coalescing before it is dropped as too slow
+MAX_PENDING = int(os.getenv("PAPER_WS_MAX_PENDING", 256))
+#Seconds a new connection waits for Redis to confirm its account's subscription
+SUBSCRIBE_TIMEOUT = float(os.getenv("PAPER_WS_SUBSCRIBE_TIMEOUT", 5))
+
+_STAGED = "paper_events"
+#Switched off by offline tools such as the replay, which have no subscribers
+publishing_enabled = True
+#Publishes scheduled from commits on the event loop, held so they are not collected mid-flight
+_publishing: Set[asyncio.Task] = set()
+#Created on the loop at first use; asyncio locks wake waiters in order, so events keep commit order
+_publish_lock: Optional[asyncio.Lock] = None
+
+
+def channel(account_id: int) -> str:
+    return f"{CHANNEL_PREFIX}{account_id}"
+
+
+def stage(session: Session, account_id: int, event_type: str, data: Dict[str, Any]):
+    """Queue an event on the session; it is published only if the transaction commits"""
+    session.info.setdefault(_STAGED, []).append((account_id, {
+        "type": event_type,
+        "account_id": account_id,
+        "at": datetime.utcnow().isoformat(),
+        "data": data
+    }))
+
+
+def publish_many(events: List[Tuple[int, Dict[str, Any]]]):
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for account_id, payload in events:
+            pipe.publish(channel(account_id), json.dumps(payload))
+        pipe.execute()
+    except Exception as e:
+        logger.warning(f"Could not publish {len(events)} paper events: {e}")
+
+
+async def publish_many_async(events: List[Tuple[int, Dict[str, Any]]]):
+    global _publish_lock
+    if _publish_lock is None:
+        _publish_lock = asyncio.Lock()
+    async with _publish_lock:
+        try:
+            async with async_redis_client.pipeline(transaction=False) as pipe:
+                for account_id, payload in events:
+                    pipe.publish(channel(account_id), json.dumps(payload))
+                await pipe.execute()
+        except Exception as e:
+            logger.warning(f"Could not publish {len(events)} paper events: {e}")
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_staged(session):
+    events = session.info.pop(_STAGED, None)
+    if not events or not publishing_enabled:
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        #Executor and threadpool threads have no loop to block; publish right away
+        publish_many(events)
+        return
+    #Async sessions, and service code under run_sync, commit on the event loop thread:
+    #hand the publish to the async client instead of blocking the loop on the sync one
+    task = loop.create_task(publish_many_async(events))
+    _publishing.add(task)
+    task.add_done_callback(_publishing.discard)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_staged(session):
+    session.info.pop(_STAGED, None)
+
+
+def _coalesce_key(payload: Dict[str, Any]):
+    """Events that only carry the newest state replace older ones still waiting to be sent"""
+    if payload["type"] == "valuation":
+        return ("valuation",)
+    if payload["type"] == "order":
+        return ("order", payload["data"]["order_id"])
+    return None
+
+
+class Subscriber:
+    """Bounded, coalescing buffer between the hub and one WebSocket connection"""
+
+    def __init__(self, max_pending: int = MAX_PENDING):
+        self.max_pending = max_pending
+        self.pending: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self.ready = asyncio.Event()
+        self.overflowed = False
+        self._seq = 0
+
+    def offer(self, payload: Dict[str, Any]):
+        key = _coalesce_key(payload)
+        if key is None:
+            self._seq += 1
+            key = ("seq", self._seq)
+        else:
+            self.pending.pop(key, None)
+        self.pending[key] = payload
+        if len(self.pending) > self.max_pending:
+            self.overflowed = True
+        self.ready.set()
+
+    async def drain(self) -> List[Dict[str, Any]]:
+        await self.ready.wait()
+        self.ready.clear()
+        events = list(self.pending.values())
+        self.pending.clear()
+        return events
+
+
+class PaperEventHub:
+    """
+    One Redis connection per process, subscribed to the accounts served locally.
+
+    An account's channel is subscribed when its first connection arrives on this
+    process and dropped with its last, so a worker only receives and decodes the
+    traffic of the accounts it serves.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[int, Set[Subscriber]] = defaultdict(set)
+        self._pubsub = None
+        self._task = None
+        #Set once Redis has confirmed every SUBSCRIBE sent for the channel
+        self._live: Dict[str, asyncio.Event] = {}
+        self._unconfirmed: Dict[str, int] = defaultdict(int)
+
+    async def subscribe(self, account_id: int) -> Subscriber:
+        """
+        Register a connection and return once its channel is live, so every event
+        committed after this call reaches the subscriber.
+        """
+        subscriber = Subscriber()
+        self._subscribers[account_id].add(subscriber)
+        name = channel(account_id)
+        try:
+            if name not in self._live:
+                self._live[name] = asyncio.Event()
+                await self._send_subscribe(name)
+            await asyncio.wait_for(self._live[name].wait(), SUBSCRIBE_TIMEOUT)
+        except BaseException as e:
+            if isinstance(e, Exception):
+                logger.warning(f"Could not subscribe to {name}: {e!r}")
+            await self.unsubscribe(account_id, subscriber)
+            raise
+        return subscriber
+
+    async def unsubscribe(self, account_id: int, subscriber: Subscriber):
+        subscribers = self._subscribers.get(account_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscriber)
+        if subscribers:
+            return
+        del self._subscribers[account_id]
+        name = channel(account_id)
+        if self._live.pop(name, None) is None or self._pubsub is None:
+            return
+        try:
+            await self._pubsub.unsubscribe(name)
+        except Exception as e:
+            logger.warning(f"Could not unsubscribe from {name}: {e}")
+
+    def dispatch(self, channel_name: str, data: str):
+        subscribers = self._subscribers.get(int(channel_name[len(CHANNEL_PREFIX):]))
+        if not subscribers:
+            return
+        payload = json.loads(data)
+        for subscriber in subscribers:
+            subscriber.offer(payload)
+
+    async def _send_subscribe(self, name: str):
+        if self._pubsub is None:
+            self._pubsub = async_redis_client.pubsub()
+        self._unconfirmed[name] += 1
+        await self._pubsub.subscribe(name)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._listen())
+
+    def _confirmed(self, name: str):
+        #A quick unsubscribe and resubscribe leaves two confirmations in flight;
+        #only the last one means the new subscription is live
+        self._unconfirmed[name] -= 1
+        if self._unconfirmed[name] > 0:
+            return
+        self._unconfirmed.pop(name, None)
+        if name in self._live:
+            self._live[name].set()
+
+    def _reconnecting(self):
+        #The client resubscribes every channel it still holds when it reconnects
+        self._unconfirmed.clear()
+        for name, live in self._live.items():
+            live.clear()
+            self._unconfirmed[name] = 1
+
+    async def _listen(self):
+        while True:
+            try:
+                #Polled rather than iterated: listen() returns once nothing is subscribed
+                message = await self._pubsub.get_message(timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Paper event subscription lost, reconnecting: {e}")
+                self._reconnecting()
+                await asyncio.sleep(1)
+                continue
+            if message is None:
+                continue
+            if message["type"] == "message":
+                self.dispatch(message["channel"], message["data"])
+            elif message["type"] == "subscribe":
+                self._confirmed(message["channel"])
+
+
+async def pump(websocket: WebSocket, subscriber: Subscriber):
+    """Send buffered events until the client disconnects or falls too far behind"""
+    async def receive():
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    receiver = asyncio.create_task(receive())
+    try:
+        while True:
+            getter = asyncio.create_task(subscriber.drain())
+            done, _ = await asyncio.wait({getter, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if getter not in done:
+                getter.cancel()
+                return
+            if subscriber.overflowed:
+                #The client resyncs over REST and reconnects rather than reading a stale backlog
+                await websocket.close(code=1013, reason="Client too slow")
+                return
+            for payload in getter.result():
+                await websocket.send_json(payload)
+    finally:
+        receiver.cancel()
+
+
+_hub = None
+
+def get_event_hub() -> PaperEventHub:
+    global _hub
+    if _hub is None:
+        _hub = PaperEventHub()
+    return _hub
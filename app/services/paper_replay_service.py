@@ -0,0 +1,317 @@
+import argparse
+import json
+import logging
+import random
+import statistics
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import pandas as pd
+from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel, create_engine, func, select
+
+import app.db
+import app.models.users  #Registers the table the accounts' user_id points at, for create_all
+from app.db import get_session
+from app.models.paper_trading import (
+    PaperTradingAccount, PaperPosition, PaperTrade, OrderSide, OrderType
+)
+from app.services import paper_events, quote_tape
+from app.services.market_data_service import MarketDataService
+from app.services.paper_trading_executor import PaperTradingExecutor
+from app.services.paper_trading_service import PaperTradingService
+from app.utility import clock
+
+logger = logging.getLogger("paper_replay")
+
+#Order mix of the synthetic flow: (type, weight)
+ORDER_MIX = [
+    (OrderType.MARKET, 0.2),
+    (OrderType.LIMIT, 0.5),
+    (OrderType.STOP, 0.2),
+    (OrderType.STOP_LIMIT, 0.1),
+]
+
+
+class VirtualClock:
+    """
+    Market time that runs `speed` times faster than the wall clock.
+
+    speed <= 0 means no pacing at all: the clock jumps straight to each bar and the
+    replay runs as fast as the executor can settle.
+    """
+
+    def __init__(self, start: datetime, speed: float):
+        self.start = start
+        self.speed = speed
+        self._wall_start = time.monotonic()
+        self._now = start
+
+    def now(self) -> datetime:
+        return self._now
+
+    def reset(self):
+        """Start pacing from now, e.g. once setup before the first bar is done"""
+        self._wall_start = time.monotonic()
+
+    def advance_to(self, at: datetime):
+        if self.speed > 0:
+            wall_due = self._wall_start + (at - self.start).total_seconds() / self.speed
+            delay = wall_due - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        self._now = at
+
+
+class _AllPartitions:
+    """Stand-in for the Redis lease so a replay works every account in-process"""
+    partitions = 1
+    ttl_ms = 0
+    owner = "replay"
+
+    def refresh(self):
+        return {0}
+
+    def release_all(self):
+        pass
+
+
+def is_scratch_url(url: str) -> bool:
+    """SQLite, in memory or in a file, other than the application's own database"""
+    return url.partition("://")[0].split("+")[0] == "sqlite" and url != app.db.DATABASE_URL
+
+
+@contextmanager
+def replay_database(url: str = "sqlite://", force: bool = False):
+    """
+    Point every get_session() at a scratch database for the length of the replay.
+
+    The replay creates tables and writes synthetic accounts and orders, so anything
+    but a scratch SQLite database is refused unless `force` is set.
+    """
+    if not force and not is_scratch_url(url):
+        raise ValueError(f"Refusing to replay into {url.partition('://')[0]} database that may hold real data; pass force to allow it")
+    if url == "sqlite://":
+        #One shared connection, or every session would see its own empty in-memory database
+        engine = create_engine(url, connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    else:
+        engine = create_engine(url)
+    SQLModel.metadata.create_all(engine)
+    original, app.db.engine = app.db.engine, engine
+    try:
+        yield engine
+    finally:
+        app.db.engine = original
+        engine.dispose()
+
+
+def load_bars(symbols: List[str], day: Optional[str] = None, path: Optional[str] = None, tape: bool = False) -> pd.DataFrame:
+    """
+    Recorded bars as a long frame of (timestamp, symbol, close), oldest first.
+
+    Reads a CSV with timestamp,symbol,close columns when `path` is given, the 1m
+    bars on the quote tape for `day` when `tape` is set; otherwise pulls recent 1m
+    bars and keeps `day` (default: the latest day available).
+    """
+    if tape:
+        start = datetime.combine(pd.Timestamp(day).date() if day else datetime.utcnow().date(), datetime.min.time())
+        frames = []
+        for symbol in symbols:
+            df = quote_tape.read_frame(symbol, start, start + timedelta(days=1), interval="1m")
+            frames.append(pd.DataFrame({"timestamp": df.index, "symbol": symbol, "close": df["close"].values}))
+        bars = pd.concat(frames)
+        if bars.empty:
+            raise ValueError("No bars on the quote tape for that day")
+    elif path:
+        bars = pd.read_csv(path, parse_dates=["timestamp"])
+        bars = bars[bars["symbol"].isin(symbols)] if symbols else bars
+    else:
+        frames = []
+        for symbol in symbols:
+            df = MarketDataService.get_recent_bars(symbol, "1m", "5d")
+            if df is None:
+                logger.warning(f"No bars for {symbol}")
+                continue
+            frames.append(pd.DataFrame({"timestamp": df.index, "symbol": symbol, "close": df["close"].values}))
+        if not frames:
+            raise ValueError("No bars to replay")
+        bars = pd.concat(frames)
+        target = pd.Timestamp(day).date() if day else bars["timestamp"].dt.date.max()
+        bars = bars[bars["timestamp"].dt.date == target]
+    return bars[["timestamp", "symbol", "close"]].sort_values(["timestamp", "symbol"]).reset_index(drop=True)
+
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {"p50": None, "p95": None, "max": None}
+    ordered = sorted(values)
+    return {
+        "p50": round(statistics.median(ordered), 4),
+        "p95": round(ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)], 4),
+        "max": round(ordered[-1], 4)
+    }
+
+
+def _synthetic_order(rng: random.Random, price: float) -> dict:
+    order_type = rng.choices([t for t, _ in ORDER_MIX], weights=[w for _, w in ORDER_MIX])[0]
+    side = rng.choice([OrderSide.BUY, OrderSide.SELL])
+    away = price * rng.uniform(0.0005, 0.01)
+    #Limits rest on the passive side, stops on the breakout side
+    sign = -1 if side == OrderSide.BUY else 1
+    limit = round(price + sign * away, 2)
+    stop = round(price - sign * away, 2)
+    return {
+        "side": side,
+        "order_type": order_type,
+        "quantity": float(rng.randint(1, 20)),
+        "price": limit if order_type == OrderType.LIMIT else (round(stop - sign * away / 2, 2) if order_type == OrderType.STOP_LIMIT else None),
+        "stop_price": stop if order_type in (OrderType.STOP, OrderType.STOP_LIMIT) else None
+    }
+
+
+def run_replay(
+    bars: pd.DataFrame,
+    speed: float = 1000.0,
+    accounts: int = 20,
+    orders_per_bar: int = 10,
+    mtm_every: int = 5,
+    seed: int = 7,
+    database_url: str = "sqlite://",
+    force: bool = False
+) -> Dict:
+    """
+    Drive the executor through recorded bars on a virtual clock with a synthetic order flow.
+
+    Every bar sets the quotes the executor sees, submits `orders_per_bar` orders from
+    random accounts and runs one executor tick. Latencies are in market seconds from
+    submission to fill; tick timings are wall-clock seconds spent in the executor.
+    Orders, fills and snapshots are stamped with the virtual clock, not the wall clock.
+    """
+    rng = random.Random(seed)
+    timeline = [(ts.to_pydatetime(), dict(zip(g["symbol"], g["close"]))) for ts, g in bars.groupby("timestamp")]
+    if not timeline:
+        raise ValueError("No bars to replay")
+
+    prices: Dict[str, float] = {}
+    original_provider = MarketDataService.price_provider
+    MarketDataService.price_provider = prices.get
+    original_clock = clock.provider
+    virtual_clock = VirtualClock(timeline[0][0], speed)
+    clock.provider = virtual_clock.now
+    publishing = paper_events.publishing_enabled
+    paper_events.publishing_enabled = False
+
+    submitted_at: Dict[int, datetime] = {}
+    latencies, tick_seconds = [], []
+    submitted = rejected = fills = 0
+    try:
+        with replay_database(database_url, force):
+            prices.update(timeline[0][1])
+            with get_session() as session:
+                account_ids = []
+                for user_id in range(1, accounts + 1):
+                    account = PaperTradingService.get_or_create_account(user_id=user_id, session=session)
+                    account_ids.append(account.id)
+                    #Seed inventory so sells have something to sell
+                    session.add_all([
+                        PaperPosition(account_id=account.id, symbol=symbol, quantity=1000, avg_entry_price=price, current_price=price)
+                        for symbol, price in prices.items()
+                    ])
+                session.commit()
+
+            executor = PaperTradingExecutor(leaser=_AllPartitions())
+            executor.refresh_leases()
+            virtual_clock.reset()
+            last_trade_id = 0
+            wall_start = time.monotonic()
+
+            for i, (at, quotes) in enumerate(timeline):
+                virtual_clock.advance_to(at)
+                prices.update(quotes)
+
+                with get_session() as session:
+                    for _ in range(orders_per_bar):
+                        symbol = rng.choice(list(quotes))
+                        try:
+                            order = PaperTradingService.create_order(
+                                account_id=rng.choice(account_ids), symbol=symbol,
+                                session=session, **_synthetic_order(rng, quotes[symbol])
+                            )
+                            submitted_at[order.id] = at
+                            submitted += 1
+                        except ValueError:
+                            rejected += 1
+
+                started = time.monotonic()
+                executor.process_pending_orders()
+                tick_seconds.append(time.monotonic() - started)
+                if mtm_every and i % mtm_every == 0:
+                    executor.mark_to_market()
+
+                with get_session() as session:
+                    new_fills = session.exec(
+                        select(PaperTrade.id, PaperTrade.order_id).where(PaperTrade.id > last_trade_id).order_by(PaperTrade.id)
+                    ).all()
+                for trade_id, order_id in new_fills:
+                    fills += 1
+                    last_trade_id = trade_id
+                    if order_id in submitted_at:
+                        latencies.append((at - submitted_at.pop(order_id)).total_seconds())
+
+            wall = time.monotonic() - wall_start
+            with get_session() as session:
+                total_equity = session.exec(select(func.sum(PaperTradingAccount.current_balance))).one()
+    finally:
+        MarketDataService.price_provider = original_provider
+        clock.provider = original_clock
+        paper_events.publishing_enabled = publishing
+
+    market_seconds = (timeline[-1][0] - timeline[0][0]).total_seconds()
+    return {
+        "bars": len(timeline),
+        "symbols": int(bars["symbol"].nunique()),
+        "market_start": timeline[0][0].isoformat(),
+        "market_end": timeline[-1][0].isoformat(),
+        "orders_submitted": submitted,
+        "orders_rejected": rejected,
+        "fills": fills,
+        "still_pending": len(submitted_at),
+        "fill_latency_market_seconds": _percentiles(latencies),
+        "executor_tick_wall_seconds": _percentiles(tick_seconds),
+        "wall_seconds": round(wall, 3),
+        "effective_speed": round(market_seconds / wall, 1) if wall else None,
+        "fills_per_wall_second": round(fills / wall, 1) if wall else None,
+        "orders_per_wall_second": round(submitted / wall, 1) if wall else None,
+        "total_equity": total_equity
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded bars through the paper trading executor")
+    parser.add_argument("symbols", nargs="*", default=["AAPL", "MSFT"])
+    parser.add_argument("--day", help="Trading day to replay, YYYY-MM-DD (default: latest available)")
+    parser.add_argument("--bars", help="CSV with timestamp,symbol,close columns instead of downloading")
+    parser.add_argument("--tape", action="store_true", help="Read the day's 1m bars from the quote tape")
+    parser.add_argument("--speed", type=float, default=1000.0, help="Market seconds per wall second; 0 = unpaced")
+    parser.add_argument("--accounts", type=int, default=20)
+    parser.add_argument("--orders-per-bar", type=int, default=10)
+    parser.add_argument("--mtm-every", type=int, default=5, help="Mark to market every N bars; 0 = never")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--database-url", default="sqlite://", help="Scratch database; in-memory SQLite by default")
+    parser.add_argument("--force", action="store_true", help="Allow a --database-url that is not a scratch SQLite database")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    report = run_replay(
+        load_bars(args.symbols, args.day, args.bars, args.tape),
+        speed=args.speed,
+        accounts=args.accounts,
+        orders_per_bar=args.orders_per_bar,
+        mtm_every=args.mtm_every,
+        seed=args.seed,
+        database_url=args.database_url,
+        force=args.force
+    )
+    print(json.dumps(report, indent=2))
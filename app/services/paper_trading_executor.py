@@ -1,24 +1,80 @@
-from appscheduler.schedulers.background import BackgroundScheduler
-from datetime import datetime
+from apscheduler.schedulers.background import BackgroundScheduler
+from datetime import timedelta
+from sqlalchemy import delete, exists
+from sqlalchemy.orm import aliased
 from sqlmodel import Session, select
-from app.models.paper_trading import PaperOrder, OrderStatus
+from app.models.paper_trading import (
+    PaperOrder, OrderStatus, PaperTradingAccount, PaperPosition, PaperEquityPoint, PaperPortfolioSnapshot
+)
 from app.services.paper_trading_service import PaperTradingService
 from app.services.market_data_service import MarketDataService
+from app.services.order_matching_engine import get_matching_engine
+from app.services.live_strategy_runner import get_live_strategy_manager, TICK_SECONDS as LIVE_RUNNER_TICK_SECONDS
+from app.services.executor_partitions import PartitionLeaser
 from app.db import get_session
+from app.utility import clock
+from typing import Optional, Set
 import logging
+import os
+import signal
+import threading
 
 logger = logging.getLogger("paper_trading_executor")
 
+MTM_INTERVAL_MINUTES = int(os.getenv("PAPER_MTM_INTERVAL_MINUTES", 5))
+#Only the newest snapshot is read; the equity curve lives in paper_equity_points
+SNAPSHOT_RETENTION_HOURS = int(os.getenv("PAPER_SNAPSHOT_RETENTION_HOURS", 24))
+
 class PaperTradingExecutor:
-    """Engine that executes paper trading orders during market hours"""
+    """
+    Engine that executes paper trading orders during market hours.
+
+    Accounts are hashed into partitions and each executor process only works the
+    partitions it holds a Redis lease on, so running more processes splits the
+    order flow between them instead of repeating it.
+    """
 
-    def __init__(self):
+    #Full reload every N ticks clears out orders cancelled since they were indexed
+    REBUILD_EVERY = 60
+
+    def __init__(self, leaser: PartitionLeaser = None):
         self.scheduler = None
+        self.engine = get_matching_engine()
+        self.strategies = get_live_strategy_manager()
+        self.leaser = leaser or PartitionLeaser()
+        self.partitions: Optional[Set[int]] = None
+        self._ticks = 0
+
+    def refresh_leases(self):
+        """Renew partition leases and reload the books when the partition set changes"""
+        held = self.leaser.refresh()
+        if held == self.partitions:
+            return
+        logger.info(f"Executor {self.leaser.owner} now holds partitions {sorted(held)}")
+        self.partitions = held
+        self.engine.assign(held, self.leaser.partitions)
+        self.strategies.assign(held, self.leaser.partitions)
+        with get_session() as session:
+            self.engine.rebuild(session)
+
+    def _owned(self, column):
+        """SQL condition restricting an account id column to the held partitions"""
+        return (column % self.leaser.partitions).in_(sorted(self.partitions or ()))
 
     def start(self):
         """Start the execution engine"""
+        self.refresh_leases()
+
         self.scheduler = BackgroundScheduler()
-    
+
+        #Renew well inside the lease TTL so a healthy process never loses its partitions
+        self.scheduler.add_job(
+            self.refresh_leases,
+            "interval",
+            seconds=max(self.leaser.ttl_ms // 3000, 1),
+            id="refresh_paper_leases",
+            replace_existing=True
+        )
         #Run every minute during market hours
         #For production, you'd want more sophisticated market hours detection
         self.scheduler.add_job(
@@ -28,6 +84,27 @@ class PaperTradingExecutor:
             id="process_paper_orders",
             replace_existing=True
         )
+        self.scheduler.add_job(
+            self.mark_to_market,
+            "interval",
+            minutes=MTM_INTERVAL_MINUTES,
+            id="mark_paper_accounts",
+            replace_existing=True
+        )
+        self.scheduler.add_job(
+            self.prune_snapshots,
+            "interval",
+            hours=1,
+            id="prune_paper_snapshots",
+            replace_existing=True
+        )
+        self.scheduler.add_job(
+            self.strategies.tick,
+            "interval",
+            seconds=LIVE_RUNNER_TICK_SECONDS,
+            id="run_live_strategies",
+            replace_existing=True
+        )
         self.scheduler.start()
         logger.info("Paper trading executor started")
 
@@ -35,43 +112,146 @@ class PaperTradingExecutor:
         """Stop the execution enginer"""
         if self.scheduler:
             self.scheduler.shutdown()
+            self.strategies.stop_all()
+            self.leaser.release_all()
             logger.info("Paper trading Executor stopped")
     
     def process_pending_orders(self):
-        """Process all pending orders"""
+        """Fetch one quote per symbol with resting orders and fill whatever it triggers"""
+        if not self.partitions:
+            return
         try:
             with get_session() as session:
-                #Get all pending orders
-                pending_orders = session.exec(
+                self._ticks += 1
+                if self._ticks % self.REBUILD_EVERY == 0:
+                    self.engine.rebuild(session)
+                else:
+                    self.engine.sync(session)
+
+                symbols = self.engine.symbols()
+                logger.info(f"Processing {len(self.engine)} pending orders across {len(symbols)} symbols")
+
+                prices, triggered = {}, []
+                for symbol in symbols:
+                    current_price = MarketDataService.get_current_price(symbol)
+                    if current_price is None:
+                        logger.warning(f"Could not get price for {symbol}, its orders remain pending")
+                        continue
+                    prices[symbol] = current_price
+                    triggered.extend(self.engine.on_price(symbol, current_price))
+
+                if not triggered:
+                    return
+
+                #One query for every triggered order; ones cancelled or filled elsewhere drop out here
+                fill_prices = dict(triggered)
+                orders = session.exec(
                     select(PaperOrder).where(
+                        PaperOrder.id.in_(list(fill_prices)),
                         PaperOrder.status == OrderStatus.PENDING
                     )
                 ).all()
-                logger.info(f"Processing {len(pending_orders)} pending orders")
-                
-                for order in pending_orders:
-                    try:
-                        #Try to execute the orders
-                        PaperTradingService.execute_order(order.id, session)
-                    except Exception as e:
-                        logger.error(f"Error executing order {order.id}: {e}")
+
+                trades, failed = PaperTradingService.settle_fills(
+                    [(order, fill_prices[order.id]) for order in orders], session, prices
+                )
+                for order in failed:
+                    self.engine.add(order)
+                logger.info(f"Settled {len(trades)} fills, {len(failed)} failed")
         
         except Exception as e:
             logger.error(f"Error in process_pending_orders: {e}")
     
-    def update_positions(self):
-        """Update position prices and account balances"""
+    def mark_to_market(self):
+        """
+        Value every owned account at one quote per held symbol.
+
+        Quotes are fetched before any row is locked. The owned accounts are then locked
+        in id order and their positions read under the lock, so a settlement (which
+        locks one account) either commits first and is seen, or waits for the mark.
+        Only accounts whose equity moved get a snapshot, an equity point and an event.
+        """
+        if not self.partitions:
+            return
         try:
-            with get_session as session:
-                from app.models.paper_trading import PaperTradingAccount, PaperPosition
-                accounts = session.exec(select(PaperTradingAccount)).all()
+            with get_session() as session:
+                symbols = session.exec(
+                    select(PaperPosition.symbol).where(self._owned(PaperPosition.account_id)).distinct()
+                ).all()
+
+            prices = {}
+            for symbol in symbols:
+                current_price = MarketDataService.get_current_price(symbol)
+                if current_price is None:
+                    logger.warning(f"Could not get price for {symbol}, keeping its last mark")
+                    continue
+                prices[symbol] = current_price
+
+            now = clock.utcnow()
+            with get_session() as session:
+                accounts = session.exec(
+                    select(PaperTradingAccount)
+                    .where(self._owned(PaperTradingAccount.id))
+                    .order_by(PaperTradingAccount.id)
+                    .with_for_update()
+                ).all()
+                by_account = {}
+                for position in session.exec(
+                    select(PaperPosition).where(self._owned(PaperPosition.account_id))
+                ).all():
+                    by_account.setdefault(position.account_id, []).append(position)
 
+                moved = 0
                 for account in accounts:
-                    PaperTradingService._update_account_balance(account, session)
-                    session.commit()
-        
+                    held = by_account.get(account.id, [])
+                    previous_equity = account.current_balance
+                    PaperTradingService._update_account_balance(
+                        account, session, prices=prices, positions=held, live_quotes=False
+                    )
+                    if account.current_balance == previous_equity:
+                        #Nothing moved; leave its rows untouched and record nothing
+                        for row in [account, *held]:
+                            session.expunge(row)
+                        continue
+                    moved += 1
+                    PaperTradingService.stage_valuation_event(
+                        account, held, session, equity_change=account.current_balance - previous_equity
+                    )
+                    session.add(PaperTradingService.build_snapshot(account, held, now))
+                    session.add(PaperEquityPoint(account_id=account.id, timestamp=now, equity=account.current_balance))
+                session.commit()
+                logger.info(f"Marked {len(accounts)} accounts to market across {len(prices)} symbols, {moved} moved")
+
+        except Exception as e:
+            logger.error(f"Error marking accounts to market: {e}")
+
+    def prune_snapshots(self):
+        """
+        Delete owned accounts' snapshots older than SNAPSHOT_RETENTION_HOURS, except each
+        account's newest: snapshots are only written when equity moves, so an idle
+        account's latest valuation can be older than the window.
+        """
+        if not self.partitions:
+            return
+        try:
+            cutoff = clock.utcnow() - timedelta(hours=SNAPSHOT_RETENTION_HOURS)
+            newer = aliased(PaperPortfolioSnapshot)
+            with get_session() as session:
+                result = session.exec(
+                    delete(PaperPortfolioSnapshot).where(
+                        PaperPortfolioSnapshot.timestamp < cutoff,
+                        self._owned(PaperPortfolioSnapshot.account_id),
+                        exists().where(
+                            newer.account_id == PaperPortfolioSnapshot.account_id,
+                            newer.timestamp > PaperPortfolioSnapshot.timestamp
+                        )
+                    )
+                )
+                session.commit()
+                logger.info(f"Pruned {result.rowcount} portfolio snapshots older than {cutoff}")
+
         except Exception as e:
-            logger.error(f"Error updating positions: {e}")
+            logger.error(f"Error pruning portfolio snapshots: {e}")
 
 
 #GLobal executor instance
@@ -81,4 +261,17 @@ def get_executor() -> PaperTradingExecutor:
     global _executor
     if _executor is None:
         _executor = PaperTradingExecutor()
-    return _executor
\ No newline at end of file
+    return _executor
+
+
+if __name__ == "__main__":
+    #Standalone executor process; start as many as needed, they share the partitions
+    logging.basicConfig(level=logging.INFO)
+    executor = get_executor()
+    executor.start()
+
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stopping.set())
+    signal.signal(signal.SIGINT, lambda *_: stopping.set())
+    stopping.wait()
+    executor.stop()
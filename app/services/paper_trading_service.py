@@ -1,12 +1,22 @@
 from sqlmodel import Session, select
-from typing import List, Optional, Dict, Any
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import update
+from typing import List, Optional, Dict, Any, Tuple
+from collections import defaultdict
+import calendar
 from datetime import datetime
 from app.models.paper_trading import (
-    PaperTradingAccount, PaperOrder, PaperTrade, PaperPosition,
-    OrderSide, OrderType, OrderStatus
+    PaperTradingAccount, PaperOrder, PaperTrade, PaperPosition, PaperPortfolioSnapshot, PaperEquityPoint,
+    PaperStrategyDeployment, OrderSide, OrderType, OrderStatus
 )
 from app.services.market_data_service import MarketDataService
+from app.services.order_matching_engine import fill_price_for
 from app.models.strategy import Strategy
+from app.utility.pagination import keyset, page
+from app.utility.downsampling import downsample
+from app.services import paper_events
+from app.utility import clock
+from app.services.paper_archive_service import merge_cold
 import logging
 
 logger = logging.getLogger("paper_trading")
@@ -17,28 +27,48 @@ class PaperTradingService:
         """Get existing accountn or create new one for user"""
         if session is None:
             from app.db import get_session
-            session = next(get_session())
+            with get_session() as session:
+                return PaperTradingService.get_or_create_account(user_id, initial_capital, session)
 
-        account = session.exec(
-            select(PaperTradingAccount).where(
-                PaperTradingAccount.user_id == user_id,
-                PaperTradingAccount.is_active == True
-            )
-        ).first()
+        account = session.exec(PaperTradingService._active_account(user_id)).first()
 
         if not account:
-            account = PaperTradingAccount(
-                user_id = user_id,
-                initial_capital = initial_capital,
-                current_balance = current_balance,
-                available_cash = initial_capital
-            )
+            account = PaperTradingService._new_account(user_id, initial_capital)
             session.add(account)
             session.commit()
             session.refresh(account)
 
         return account
 
+    @staticmethod
+    async def get_or_create_account_async(user_id: int, db: AsyncSession, initial_capital: float = 100000.0) -> PaperTradingAccount:
+        """get_or_create_account on an async session"""
+        account = (await db.exec(PaperTradingService._active_account(user_id))).first()
+
+        if not account:
+            account = PaperTradingService._new_account(user_id, initial_capital)
+            db.add(account)
+            await db.commit()
+            await db.refresh(account)
+
+        return account
+
+    @staticmethod
+    def _active_account(user_id: int):
+        return select(PaperTradingAccount).where(
+            PaperTradingAccount.user_id == user_id,
+            PaperTradingAccount.is_active == True
+        )
+
+    @staticmethod
+    def _new_account(user_id: int, initial_capital: float) -> PaperTradingAccount:
+        return PaperTradingAccount(
+            user_id = user_id,
+            initial_capital = initial_capital,
+            current_balance = initial_capital,
+            available_cash = initial_capital
+        )
+
 
     @staticmethod
     def create_order(
@@ -55,7 +85,10 @@ class PaperTradingService:
         """Create a new paper trading order"""
         if session is None:
             from app.db import get_session
-            session = next(get_session())
+            with get_session() as session:
+                return PaperTradingService.create_order(
+                    account_id, symbol, side, order_type, quantity, price, stop_price, strategy_id, session
+                )
 
         #Validate Order
         if quantity <= 0:
@@ -107,9 +140,12 @@ class PaperTradingService:
             quantity = quantity,
             price = price,
             stop_price = stop_price,
-            status = OrderStatus.PENDING
+            status = OrderStatus.PENDING,
+            created_at = clock.utcnow()
         )
         session.add(order)
+        session.flush()
+        PaperTradingService._stage_order_event(order, session)
         session.commit()
         session.refresh(order)
 
@@ -117,6 +153,7 @@ class PaperTradingService:
         if order_type == OrderType.MARKET:
             PaperTradingService.execute_order(order.id, session)
 
+        #Anything still pending is picked up by the executor owning the account on its next sync
         return order
 
     @staticmethod
@@ -124,9 +161,10 @@ class PaperTradingService:
         """Execute a pending order if conditions are met"""
         if session is None:
             from app.db import get_session
-            session = next(get_session())
+            with get_session() as session:
+                return PaperTradingService.execute_order(order_id, session)
 
-        order = session.get(PaperTrade, order_id)
+        order = session.get(PaperOrder, order_id)
         if not order or order.status != OrderStatus.PENDING:
             return None
 
@@ -136,28 +174,7 @@ class PaperTradingService:
             return None
         
         #Lets check if order can be executed based on type
-        fill_price = None
-        if order.order_type == OrderType.MARKET:
-            fill_price = current_price
-        elif order.order_type == OrderType.LIMIT:
-            if order.side == OrderSide.BUY and current_price <= order.price:
-                fill_price = order.price
-            elif order.side == OrderSide.SELL and current_price >= order.price:
-                fill_price = order.price
-
-        elif order.order_type == OrderType.STOP:
-            if order.side == OrderSide.BUY and current_price >= order.stop_price:
-                fill_price = current_price
-            elif order.side == OrderSide.SELL and current_price <= order.stop_price:
-                fille_price = current_price
-        
-        elif order.order_type == OrderType.STOP_LIMIT:
-            if order.side == OrderSide.BUY:
-                if current_price >= order.stop_price and current_price <= order.price:
-                    fill_price = order.price
-            elif order.side == OrderSide.SELL:
-                if current_price <= order.stop_price and current_price >= order.price:
-                    fill_price = order.price
+        fill_price = fill_price_for(order, current_price)
 
         if fill_price is None:
             return None
@@ -168,73 +185,200 @@ class PaperTradingService:
     @staticmethod
     def _execute_trade(order: PaperOrder, fill_price: float, session: Session) -> PaperTrade:
         """Executing trade from an order"""
-        account = session.get(PaperTradingAccount, order.account_id)
+        trades = PaperTradingService._settle_account(
+            order.account_id, [(order, fill_price)], session, prices={order.symbol: fill_price}
+        )
+        session.commit()
+        return trades[0] if trades else None
+
+    @staticmethod
+    def settle_fills(
+        fills: List[Tuple[PaperOrder, float]],
+        session: Session,
+        prices: Optional[Dict[str, float]] = None
+    ) -> Tuple[List[PaperTrade], List[PaperOrder]]:
+        """
+        Settle a batch of fills, one transaction per account.
+
+        Returns the trades written and the orders whose account group failed, so the
+        caller can put them back in the book.
+        """
+        by_account: Dict[int, List[Tuple[PaperOrder, float]]] = defaultdict(list)
+        for order, fill_price in fills:
+            by_account[order.account_id].append((order, fill_price))
+
+        trades, failed = [], []
+        for account_id, group in by_account.items():
+            try:
+                trades.extend(PaperTradingService._settle_account(account_id, group, session, prices))
+                session.commit()
+            except Exception as e:
+                logger.error(f"Error settling {len(group)} fills for account {account_id}: {e}")
+                session.rollback()
+                failed.extend(order for order, _ in group)
+        return trades, failed
+
+    @staticmethod
+    def _settle_account(
+        account_id: int,
+        fills: List[Tuple[PaperOrder, float]],
+        session: Session,
+        prices: Optional[Dict[str, float]] = None
+    ) -> List[PaperTrade]:
+        """Apply fills for one account in memory and stage the writes; the caller commits"""
+        #Row lock serializes settlement of one account across executor and API processes
+        account = session.get(PaperTradingAccount, account_id, with_for_update=True)
         if not account:
             raise ValueError("Account Not Found")
 
-        #creating trade record
-        trade = PaperTrade(
-            account_id=order.account_id,
-            order_id=order.id,
-            strategy_id=order.strategy_id,
-            symbol=order.symbol,
-            side=order.side,
-            quantity=order.quantity,
-            price=fill_price,
-            timestamp=datetime.utcnow()
-        )
+        #Claim the orders still pending in one statement; any another process already filled drop out
+        claimed = set(session.exec(
+            update(PaperOrder)
+            .where(PaperOrder.id.in_([order.id for order, _ in fills]), PaperOrder.status == OrderStatus.PENDING)
+            .values(status=OrderStatus.FILLED)
+            .returning(PaperOrder.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all())
+
+        #Load all positions once; fills update them in place
+        positions = {
+            p.symbol: p for p in session.exec(
+                select(PaperPosition).where(PaperPosition.account_id == account_id)
+            ).all()
+        }
 
-        #Update Order
-        order.filled_quantity = order.quantity
-        order.average_fill_price = fill_price
-        order.status = OrderStatus.FILLED
-        order.filled_at = datetime.utcnow()
-
-        #updating cash
-        if order.side == OrderSide.BUY:
-            cost = order.quantity * fill_price
-            account.available_cash -= cost
-        else: #SELL
-            proceeds = order.quantity * fill_price 
-            account.available_cash += proceeds
-
-        #Update Postion
-        PaperTradingService._update_position(
-            account.id,
-            order.symbol,
-            order.quantity if order.side == OrderSide.BUY else -order.quantity,
-            fill_price, 
-            session
-        )          
-
-        #update account balance
-        PaperTradingService._update_account_balance(account, session)
-        session.add(trade)
-        session.add(order)
+        now = clock.utcnow()
+        trades = []
+        for order, fill_price in fills:
+            if order.id not in claimed:
+                continue
+
+            #creating trade record
+            trades.append(PaperTrade(
+                account_id=order.account_id,
+                order_id=order.id,
+                strategy_id=order.strategy_id,
+                symbol=order.symbol,
+                side=order.side,
+                quantity=order.quantity,
+                price=fill_price,
+                timestamp=now
+            ))
+
+            #Update Order
+            order.filled_quantity = order.quantity
+            order.average_fill_price = fill_price
+            order.status = OrderStatus.FILLED
+            order.filled_at = now
+
+            #updating cash
+            if order.side == OrderSide.BUY:
+                cost = order.quantity * fill_price
+                account.available_cash -= cost
+            else: #SELL
+                proceeds = order.quantity * fill_price 
+                account.available_cash += proceeds
+
+            #Update Postion
+            PaperTradingService._update_position(
+                account.id,
+                order.symbol,
+                order.quantity if order.side == OrderSide.BUY else -order.quantity,
+                fill_price, 
+                session,
+                positions
+            )
+            logger.info(f"Executed trade: {order.side} {order.quantity} {order.symbol} @ ${fill_price:.2f}")
+
+        #One valuation per account, marked with this tick's prices
+        PaperTradingService._update_account_balance(
+            account, session, prices=prices, positions=list(positions.values()), live_quotes=False
+        )
+        #Snapshot in the same transaction, so get_valuation never serves one older than a fill
+        session.add(PaperTradingService.build_snapshot(account, list(positions.values()), now))
+        session.add_all(trades)
+        session.add_all([order for order, _ in fills if order.id in claimed])
         session.add(account)
-        session.commit()
-        session.refresh(trade)
-        logger.info(f"Executed trade: {order.side} {order.quantity} {order.symbol} @ ${fill_price:.2f}")
-        return trade
+
+        #Flush for trade ids; the events go out only once the caller commits
+        session.flush()
+        for order, _ in fills:
+            if order.id in claimed:
+                PaperTradingService._stage_order_event(order, session)
+        for trade in trades:
+            paper_events.stage(session, account_id, "fill", {
+                "trade_id": trade.id,
+                "order_id": trade.order_id,
+                "symbol": trade.symbol,
+                "side": trade.side,
+                "quantity": trade.quantity,
+                "price": trade.price,
+                "timestamp": trade.timestamp.isoformat()
+            })
+        PaperTradingService.stage_valuation_event(account, list(positions.values()), session)
+        return trades
+
+    @staticmethod
+    def _stage_order_event(order: PaperOrder, session: Session):
+        paper_events.stage(session, order.account_id, "order", {
+            "order_id": order.id,
+            "symbol": order.symbol,
+            "side": order.side,
+            "order_type": order.order_type,
+            "quantity": order.quantity,
+            "price": order.price,
+            "stop_price": order.stop_price,
+            "status": order.status,
+            "filled_quantity": order.filled_quantity,
+            "average_fill_price": order.average_fill_price
+        })
+
+    @staticmethod
+    def stage_valuation_event(
+        account: PaperTradingAccount,
+        positions: List[PaperPosition],
+        session: Session,
+        equity_change: Optional[float] = None
+    ):
+        """Queue the account's latest marks for WebSocket subscribers"""
+        paper_events.stage(session, account.id, "valuation", {
+            "cash": account.available_cash,
+            "equity": account.current_balance,
+            "equity_change": equity_change,
+            "unrealized_pnl": sum(p.unrealized_pnl for p in positions),
+            "positions": [
+                {
+                    "symbol": p.symbol,
+                    "quantity": p.quantity,
+                    "current_price": p.current_price,
+                    "unrealized_pnl": p.unrealized_pnl
+                }
+                for p in positions
+            ]
+        })
 
     
     @staticmethod 
-    def _update_positon(
+    def _update_position(
         account_id: int,
         symbol: str,
         quantity_change: float,
         price: float,
-        session: Session
+        session: Session,
+        positions: Optional[Dict[str, PaperPosition]] = None
     ):
-        """Update or create position"""
-        position = session.exec(
-            select(PaperPosition).where(
-                PaperPosition.account_id == account_id,
-                PaperPosition.symbol == symbol
-            )
-        ).first()
+        """Update or create position; `positions` is an already loaded symbol -> position map"""
+        if positions is not None:
+            position = positions.get(symbol)
+        else:
+            position = session.exec(
+                select(PaperPosition).where(
+                    PaperPosition.account_id == account_id,
+                    PaperPosition.symbol == symbol
+                )
+            ).first()
 
-        if postion:
+        if position:
             #update existing position
             total_cost = (position.quantity * position.avg_entry_price ) + (quantity_change*price)
             new_quantity = position.quantity + quantity_change
@@ -244,13 +388,15 @@ class PaperTradingService:
                 if position.quantity > 0 and quantity_change<0: #Long closing
                     position.realized_pnl += (price - position.avg_entry_price) * abs(quantity_change)
                 elif position.quantity < 0 and quantity_change > 0: #Short Covering
-                    position.realized_pnl += (postion.avg_entry_price - price) * abs(quantity_change)
+                    position.realized_pnl += (position.avg_entry_price - price) * abs(quantity_change)
                 
                 session.delete(position)
+                if positions is not None:
+                    del positions[symbol]
             else:
                 position.quantity = new_quantity
                 position.avg_entry_price = total_cost / new_quantity if new_quantity != 0 else price
-                position.updated_at = datetime.utcnow()
+                position.updated_at = clock.utcnow()
 
         else:
             #Creating new position
@@ -262,86 +408,159 @@ class PaperTradingService:
                 current_price = price
             )
             session.add(position)
+            if positions is not None:
+                positions[symbol] = position
     
     @staticmethod
-    def _update_account_balance(account: PaperTradingAccount, session: Session):
-        """Update account balance including unrealized PnL"""
+    def _update_account_balance(
+        account: PaperTradingAccount,
+        session: Session,
+        prices: Optional[Dict[str, float]] = None,
+        positions: Optional[List[PaperPosition]] = None,
+        live_quotes: bool = True
+    ):
+        """
+        Update account balance including unrealized PnL.
+
+        Prices come from `prices` first; symbols missing there get a live quote when
+        live_quotes is set, otherwise they keep their last marked price.
+        """
         #Get all Positions
-        positions = session.exec(
-            select(PaperPosition).where(PaperPosition.account_id == account.id)
-        ).all()
+        if positions is None:
+            positions = session.exec(
+                select(PaperPosition).where(PaperPosition.account_id == account.id)
+            ).all()
+        prices = prices or {}
 
         unrealized_pnl = 0.0
         for position in positions:
-            current_price = MarketDataService.get_current_price(position.symbol) or position.current_price
+            current_price = prices.get(position.symbol)
+            if current_price is None and live_quotes:
+                current_price = MarketDataService.get_current_price(position.symbol)
+            current_price = current_price or position.current_price
             position.current_price = current_price
 
             if position.quantity > 0: #Long position
-                position.unrealized_pnl = (current_price - position_avg_entry_price) * position.quantity
+                position.unrealized_pnl = (current_price - position.avg_entry_price) * position.quantity
             else: #Short positon
                 position.unrealized_pnl = (position.avg_entry_price - current_price) * abs(position.quantity)
             
             unrealized_pnl += position.unrealized_pnl
-            position.updated_at = datetime.utcnow()
+            position.updated_at = clock.utcnow()
         
         #Total balance = cash + market value of positions
         account.current_balance = account.available_cash + sum(
             (p.quantity * p.current_price) + p.realized_pnl
             for p in positions
         )
-        account.updated_at = datetime.utcnow()
+        account.updated_at = clock.utcnow()
     
     @staticmethod
-    def get_portfolio(account_id:int, session:Session = None) -> Dict[str, Any]:
+    def build_snapshot(
+        account: PaperTradingAccount,
+        positions: List[PaperPosition],
+        timestamp: Optional[datetime] = None
+    ) -> PaperPortfolioSnapshot:
+        """Freeze an already valued account and its positions into a snapshot row"""
+        return PaperPortfolioSnapshot(
+            account_id=account.id,
+            timestamp=timestamp or clock.utcnow(),
+            cash=account.available_cash,
+            equity=account.current_balance,
+            unrealized_pnl=sum(p.unrealized_pnl for p in positions),
+            realized_pnl=sum(p.realized_pnl for p in positions),
+            positions=[
+                {
+                    "symbol": p.symbol,
+                    "quantity": p.quantity,
+                    "avg_entry_price": p.avg_entry_price,
+                    "current_price": p.current_price,
+                    "unrealized_pnl": p.unrealized_pnl,
+                    "realized_pnl": p.realized_pnl,
+                    "market_value": p.quantity * p.current_price
+                }
+                for p in positions
+            ]
+        )
+
+    @staticmethod
+    def get_valuation(account_id: int, session: Session, refresh: bool = False) -> Dict[str, Any]:
+        """
+        Latest valuation of an account and its positions.
+
+        Reads the newest snapshot unless refresh is set or none exists yet; settlement
+        and mark-to-market both write one, so it reflects every fill. A live
+        revaluation quotes every position and stores a fresh snapshot.
+        """
+        snapshot = None
+        if not refresh:
+            snapshot = session.exec(
+                select(PaperPortfolioSnapshot)
+                .where(PaperPortfolioSnapshot.account_id == account_id)
+                .order_by(PaperPortfolioSnapshot.timestamp.desc())
+                .limit(1)
+            ).first()
+
+        source = "snapshot"
+        if snapshot is None:
+            account = session.get(PaperTradingAccount, account_id)
+            if not account:
+                raise ValueError("Account Not Found!")
+            positions = session.exec(
+                select(PaperPosition).where(PaperPosition.account_id == account_id)
+            ).all()
+            PaperTradingService._update_account_balance(account, session, positions=positions)
+            snapshot = PaperTradingService.build_snapshot(account, positions)
+            session.add(snapshot)
+            session.add(account)
+            session.add_all(positions)
+            session.commit()
+            session.refresh(snapshot)
+            source = "live"
+
+        return {
+            "source": source,
+            "as_of": snapshot.timestamp.isoformat(),
+            "age_seconds": round((clock.utcnow() - snapshot.timestamp).total_seconds(), 3),
+            "cash": snapshot.cash,
+            "equity": snapshot.equity,
+            "unrealized_pnl": snapshot.unrealized_pnl,
+            "positions": snapshot.positions
+        }
+
+    @staticmethod
+    def get_portfolio(account_id:int, session:Session = None, refresh: bool = False) -> Dict[str, Any]:
         """Get complete portfolio information"""
         if session is None:
             from app.db import get_session
-            session = next(get_session())
+            with get_session() as session:
+                return PaperTradingService.get_portfolio(account_id, session, refresh)
 
         account = session.get(PaperTradingAccount, account_id)
         if not account:
             raise ValueError("Account Not Found!")
         
-        #Update balance first 
-        PaperTradingService._update_account_balance(account, session)
+        valuation = PaperTradingService.get_valuation(account_id, session, refresh=refresh)
+        equity = valuation["equity"]
 
-        positions = session.exec(
-            select(PaperPosition).where(PaperPosition.account_id == account_id)
-        ).all()
-
-        orders = session.exec(
-            select(PaperOrder).where(
-                PaperOrder.account_id == account_id,
-            ).order_by(PaperOrder.created_at.desc())
-        ).limit(50).all()
-
-        trades = session.exec(
-            select(PaperTrade).where(
-                PaperTrade.account_id == account_id
-            ).order_by(PaperTrade.timestamp.desc())
-        ).limit(100).all()
+        orders = PaperTradingService.list_orders(account_id, session, limit=50)["items"]
+        trades = PaperTradingService.list_trades(account_id, session, limit=100)["items"]
 
         return {
             "account":{
                 "id":account.id,
                 "initial_capital": account.initial_capital,
-                "current_balance": account.current_balance,
-                "available_cash": account.available_cash,
-                "total_pnl" : account.current_balance - account.initial_capital,
-                "total_return_pct": ((account.current_balance - account.initial_capital) / account.initial_capital) * 100
+                "current_balance": equity,
+                "available_cash": valuation["cash"],
+                "total_pnl" : equity - account.initial_capital,
+                "total_return_pct": ((equity - account.initial_capital) / account.initial_capital) * 100
             },
-            "positions": [
-                {
-                    "symbol": p.symbol,
-                    "quantity": p.quantity,
-                    "avg_entry_price": p.avg_entry_price,
-                    "current_price": p.current_price,
-                    "unrealized_pnl": p.unrealized_pnl,
-                    "realized_pnl": p.realized_pnl,
-                    "market_value": p.quantity * p.current_price
-                }
-                for p in positions
-            ],
+            "valuation": {
+                "source": valuation["source"],
+                "as_of": valuation["as_of"],
+                "age_seconds": valuation["age_seconds"]
+            },
+            "positions": valuation["positions"],
             "recent_orders":[
                 {
                     "id":o.id,
@@ -367,21 +586,169 @@ class PaperTradingService:
             ]
         }
 
+    @staticmethod
+    def list_orders(
+        account_id: int,
+        session: Session,
+        status: Optional[OrderStatus] = None,
+        symbol: Optional[str] = None,
+        strategy_id: Optional[int] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: int = 50,
+        cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Page through an account's orders, newest first, reading archived months when the page reaches them"""
+        query = select(PaperOrder).where(PaperOrder.account_id == account_id)
+        if status:
+            query = query.where(PaperOrder.status == status)
+        if symbol:
+            query = query.where(PaperOrder.symbol == symbol)
+        if strategy_id is not None:
+            query = query.where(PaperOrder.strategy_id == strategy_id)
+        if start:
+            query = query.where(PaperOrder.created_at >= start)
+        if end:
+            query = query.where(PaperOrder.created_at < end)
+
+        query = keyset(query, [PaperOrder.created_at, PaperOrder.id], cursor)
+        orders = session.exec(query.limit(limit + 1)).all()
+        orders = merge_cold(
+            session, PaperOrder, orders, limit, account_id, cursor, start, end,
+            status=status, symbol=symbol, strategy_id=strategy_id
+        )
+        return page(orders, limit, key=lambda o: (o.created_at, o.id))
+
+    @staticmethod
+    def list_trades(
+        account_id: int,
+        session: Session,
+        symbol: Optional[str] = None,
+        strategy_id: Optional[int] = None,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """Page through an account's trades, newest first, reading archived months when the page reaches them"""
+        query = select(PaperTrade).where(PaperTrade.account_id == account_id)
+        if symbol:
+            query = query.where(PaperTrade.symbol == symbol)
+        if strategy_id is not None:
+            query = query.where(PaperTrade.strategy_id == strategy_id)
+        if start:
+            query = query.where(PaperTrade.timestamp >= start)
+        if end:
+            query = query.where(PaperTrade.timestamp < end)
+
+        query = keyset(query, [PaperTrade.timestamp, PaperTrade.id], cursor)
+        trades = session.exec(query.limit(limit + 1)).all()
+        trades = merge_cold(
+            session, PaperTrade, trades, limit, account_id, cursor, start, end,
+            symbol=symbol, strategy_id=strategy_id
+        )
+        return page(trades, limit, key=lambda t: (t.timestamp, t.id))
+
+    @staticmethod
+    def get_equity_curve(
+        account_id: int,
+        session: Session,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        points: int = 500,
+        method: str = "lttb"
+    ) -> Dict[str, Any]:
+        """Equity history of an account, downsampled server-side to at most `points` samples"""
+        query = select(PaperEquityPoint.timestamp, PaperEquityPoint.equity).where(
+            PaperEquityPoint.account_id == account_id
+        )
+        if start:
+            query = query.where(PaperEquityPoint.timestamp >= start)
+        if end:
+            query = query.where(PaperEquityPoint.timestamp < end)
+
+        rows = session.exec(query.order_by(PaperEquityPoint.timestamp)).all()
+        series = [(calendar.timegm(ts.utctimetuple()) * 1000 + ts.microsecond // 1000, equity) for ts, equity in rows]
+        sampled = downsample(series, points, method)
+        return {
+            "method": method,
+            "raw_points": len(series),
+            #[[epoch_ms, equity], ...] keeps the payload to a few bytes per point
+            "points": [[int(t), round(v, 2)] for t, v in sampled]
+        }
+
+    @staticmethod
+    def deploy_strategy(
+        account_id: int, strategy_id: int, symbol: str, interval: str, session: Session, owner: str
+    ) -> PaperStrategyDeployment:
+        """
+        Run a saved strategy live on a symbol; redeploying reactivates the existing deployment.
+
+        `owner` is the deploying user's email. Other users' strategies are reported as not
+        found, so ids cannot be probed.
+        """
+        strategy = session.get(Strategy, strategy_id)
+        if not strategy or strategy.user_id != owner:
+            raise ValueError("Strategy not found")
+
+        symbol = symbol.upper()
+        deployment = session.exec(
+            select(PaperStrategyDeployment).where(
+                PaperStrategyDeployment.account_id == account_id,
+                PaperStrategyDeployment.strategy_id == strategy_id,
+                PaperStrategyDeployment.symbol == symbol
+            )
+        ).first() or PaperStrategyDeployment(account_id=account_id, strategy_id=strategy_id, symbol=symbol)
+        deployment.interval = interval
+        deployment.is_active = True
+        deployment.error = None
+        session.add(deployment)
+        session.commit()
+        session.refresh(deployment)
+        return deployment
+
+    @staticmethod
+    def list_deployments(account_id: int, session: Session) -> List[PaperStrategyDeployment]:
+        return session.exec(
+            select(PaperStrategyDeployment)
+            .where(PaperStrategyDeployment.account_id == account_id)
+            .order_by(PaperStrategyDeployment.created_at.desc())
+        ).all()
+
+    @staticmethod
+    def stop_deployment(deployment_id: int, account_id: int, session: Session) -> bool:
+        """Deactivate a deployment; the runner process drops it on its next sync"""
+        deployment = session.get(PaperStrategyDeployment, deployment_id)
+        if not deployment or deployment.account_id != account_id:
+            return False
+        deployment.is_active = False
+        session.add(deployment)
+        session.commit()
+        return True
+
     @staticmethod
     def cancel_order(order_id: int, session: Session = None) -> bool:
-        """Cancel a pending order"""
+        """Cancel a pending order; False when it is missing or no longer open"""
         if session is None:
             from app.db import get_session
-            session = next(get_session())
-        
-        order = session.get(PaperOrder, order_id)
-        if not order:
-            return False
-
-        if order.status not in [OrderStatus.PENDING, OrderStatus.PARTIALLY_FILLED]:
+            with get_session() as session:
+                return PaperTradingService.cancel_order(order_id, session)
+
+        #Claimed in one statement like settlement does, so exactly one of a cancel and a
+        #concurrent fill wins and the other sees no row
+        claimed = session.exec(
+            update(PaperOrder)
+            .where(PaperOrder.id == order_id, PaperOrder.status.in_([OrderStatus.PENDING, OrderStatus.PARTIALLY_FILLED]))
+            .values(status=OrderStatus.CANCELLED)
+            .returning(PaperOrder.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().first()
+        if claimed is None:
+            session.rollback()
             return False
 
-        order.status = OrderStatus.CANCELLED
-        session.add(order)
+        order = session.get(PaperOrder, order_id, populate_existing=True)
+        PaperTradingService._stage_order_event(order, session)
         session.commit()
+        #The executor drops it when a price triggers it and the row is no longer pending
         return True
\ No newline at end of file
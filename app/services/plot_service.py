@@ -7,17 +7,13 @@ import backtrader as bt
 import pandas as pd
 import yfinance as yf
 import plotly.graph_objects as go
+from app.services.backtest_service import load_strategy_class
 
 
 def generate_backtest_plot(strategy_code: str, ticker: str) -> dict:
-  local_vars = {}
   try:
     print(type(ticker), ticker)
-    exec(strategy_code, globals(), local_vars)
-    strategy_class = next(
-            (v for v in local_vars.values() if isinstance(v, type) and issubclass(v, bt.Strategy)), 
-            None
-        )
+    strategy_class = load_strategy_class(strategy_code)
     print(strategy_class)
     if not strategy_class:
           raise ValueError("No valid backtrader Strategy found in code.")
@@ -0,0 +1,181 @@
+import fcntl
+import logging
+import os
+import struct
+import threading
+import time
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
+
+logger = logging.getLogger("quote_tape")
+
+TAPE_DIR = os.getenv("QUOTE_TAPE_DIR", "data/quote_tape")
+TAPE_ENABLED = os.getenv("QUOTE_TAPE_ENABLED", "1") != "0"
+
+#One fixed-size record: epoch seconds, open, high, low, close, volume, bar interval in seconds (0 = quote)
+RECORD = struct.Struct("<d5dI4x")
+FIELDS = ("ts", "open", "high", "low", "close", "volume", "interval")
+#Sparse index: one (first record, min ts, max ts) entry per full block of records
+BLOCK = 1024
+INDEX = struct.Struct("<Qdd")
+
+INTERVAL_SECONDS = {"1m": 60, "2m": 120, "5m": 300, "15m": 900, "30m": 1800, "60m": 3600, "1h": 3600, "1d": 86400}
+
+_lock = threading.Lock()
+#Newest bar written per (symbol, interval) in this process, so refetched windows only append new bars
+_last_bar: Dict[Tuple[str, int], float] = {}
+
+
+#numpy is imported on first read or index write, not when a quote is recorded
+@lru_cache(maxsize=None)
+def _record_dtype() -> "np.dtype":
+    import numpy as np
+    return np.dtype({
+        "names": list(FIELDS),
+        "formats": ["<f8", "<f8", "<f8", "<f8", "<f8", "<f8", "<u4"],
+        "offsets": [0, 8, 16, 24, 32, 40, 48],
+        "itemsize": RECORD.size
+    })
+
+
+@lru_cache(maxsize=None)
+def _index_dtype() -> "np.dtype":
+    import numpy as np
+    return np.dtype([("first", "<u8"), ("min_ts", "<f8"), ("max_ts", "<f8")])
+
+
+def _paths(symbol: str, day: date) -> Tuple[str, str]:
+    base = os.path.join(TAPE_DIR, symbol.upper(), day.isoformat())
+    return f"{base}.tape", f"{base}.idx"
+
+
+def _epoch(at: datetime) -> float:
+    return (at - datetime(1970, 1, 1)).total_seconds()
+
+
+def _day_of(ts: float) -> date:
+    return (datetime(1970, 1, 1) + timedelta(seconds=ts)).date()
+
+
+def _extend_index(tape_path: str, index_path: str):
+    """Index every block completed since the last append"""
+    records = os.path.getsize(tape_path) // RECORD.size
+    indexed = os.path.getsize(index_path) // INDEX.size if os.path.exists(index_path) else 0
+    if records < (indexed + 1) * BLOCK:
+        return
+    import numpy as np
+    tape = np.memmap(tape_path, dtype=_record_dtype(), mode="r", shape=(records,))
+    with open(index_path, "ab") as f:
+        for block in range(indexed, records // BLOCK):
+            ts = tape["ts"][block * BLOCK:(block + 1) * BLOCK]
+            f.write(INDEX.pack(block * BLOCK, float(ts.min()), float(ts.max())))
+
+
+def append(symbol: str, rows) -> int:
+    """Append (ts, open, high, low, close, volume, interval) rows, split into per-day tapes"""
+    by_day: Dict[date, list] = {}
+    for row in rows:
+        by_day.setdefault(_day_of(row[0]), []).append(row)
+
+    with _lock:
+        for day, day_rows in by_day.items():
+            tape_path, index_path = _paths(symbol, day)
+            os.makedirs(os.path.dirname(tape_path), exist_ok=True)
+            with open(tape_path, "ab") as f:
+                #Writers in other processes take turns on the same tape and index
+                fcntl.flock(f, fcntl.LOCK_EX)
+                f.write(b"".join(RECORD.pack(*row) for row in day_rows))
+                f.flush()
+                _extend_index(tape_path, index_path)
+    return sum(len(r) for r in by_day.values())
+
+
+def record_quote(symbol: str, price: float, at: datetime = None):
+    if not TAPE_ENABLED:
+        return
+    try:
+        append(symbol, [(_epoch(at or datetime.utcnow()), price, price, price, price, 0.0, 0)])
+    except Exception as e:
+        logger.warning(f"Could not record quote for {symbol}: {e}")
+
+
+def record_bars(symbol: str, interval: str, bars: "pd.DataFrame"):
+    """
+    Record OHLCV bars (lowercase columns, naive UTC index), skipping ones already written.
+
+    The bar still forming is left out: its values change until its interval closes,
+    and once a timestamp is written later fetches never replace it.
+    """
+    if not TAPE_ENABLED or bars is None or bars.empty:
+        return
+    import numpy as np
+    try:
+        seconds = INTERVAL_SECONDS.get(interval, 0) or 1
+        key = (symbol.upper(), seconds)
+        ts = (bars.index.values.astype("datetime64[ns]").astype(np.int64) / 1e9)
+        fresh = (ts > _last_bar.get(key, float("-inf"))) & (ts + seconds <= time.time())
+        if not fresh.any():
+            return
+        frame = bars[fresh]
+        append(symbol, zip(
+            ts[fresh], frame["open"], frame["high"], frame["low"], frame["close"], frame["volume"].astype(float),
+            [seconds] * len(frame)
+        ))
+        _last_bar[key] = float(ts[fresh].max())
+    except Exception as e:
+        logger.warning(f"Could not record {interval} bars for {symbol}: {e}")
+
+
+def _read_day(symbol: str, day: date, start: float, end: float) -> "np.ndarray":
+    import numpy as np
+    record_dtype, index_dtype = _record_dtype(), _index_dtype()
+    tape_path, index_path = _paths(symbol, day)
+    if not os.path.exists(tape_path):
+        return np.empty(0, dtype=record_dtype)
+    records = os.path.getsize(tape_path) // RECORD.size
+    if records == 0:
+        return np.empty(0, dtype=record_dtype)
+    tape = np.memmap(tape_path, dtype=record_dtype, mode="r", shape=(records,))
+
+    #Only blocks whose time span overlaps the range, plus the unindexed tail
+    index = np.fromfile(index_path, dtype=index_dtype) if os.path.exists(index_path) else np.empty(0, dtype=index_dtype)
+    hits = index[(index["max_ts"] >= start) & (index["min_ts"] < end)]
+    parts = [tape[int(first):int(first) + BLOCK] for first in hits["first"]]
+    parts.append(tape[len(index) * BLOCK:])
+    chunk = np.concatenate(parts) if parts else np.empty(0, dtype=record_dtype)
+    return np.array(chunk[(chunk["ts"] >= start) & (chunk["ts"] < end)])
+
+
+def read(symbol: str, start: datetime, end: datetime, interval: Optional[str] = None) -> "np.ndarray":
+    """
+    Records for a symbol in [start, end), oldest first.
+
+    interval=None returns everything, "quote" only quotes, otherwise bars of that
+    interval with one record per timestamp, the last one written.
+    """
+    import numpy as np
+    lo, hi = _epoch(start), _epoch(end)
+    days = [start.date() + timedelta(days=i) for i in range((end.date() - start.date()).days + 1)]
+    records = np.concatenate([_read_day(symbol, day, lo, hi) for day in days])
+    if interval == "quote":
+        records = records[records["interval"] == 0]
+    elif interval is not None:
+        records = records[records["interval"] == INTERVAL_SECONDS[interval]]
+        #np.unique keeps the first occurrence; search the reversed array to keep the last
+        last = len(records) - 1 - np.unique(records["ts"][::-1], return_index=True)[1]
+        records = records[last]
+    return records[np.argsort(records["ts"], kind="stable")]
+
+
+def read_frame(symbol: str, start: datetime, end: datetime, interval: Optional[str] = None) -> "pd.DataFrame":
+    """Records as an OHLCV frame indexed by naive UTC timestamps"""
+    import pandas as pd
+    records = read(symbol, start, end, interval)
+    frame = pd.DataFrame({name: records[name] for name in FIELDS[1:]})
+    frame.index = pd.to_datetime(records["ts"], unit="s")
+    return frame
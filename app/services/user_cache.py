@@ -0,0 +1,110 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.models.users import User
+from app.utility.redis_client import redis_client
+
+logger = logging.getLogger("user_cache")
+
+#In-process entries are not invalidated across workers; this bounds how stale they get
+LOCAL_TTL_SECONDS = float(os.getenv("USER_CACHE_LOCAL_TTL_SECONDS", 30))
+LOCAL_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", 10000))
+REDIS_TTL_SECONDS = int(os.getenv("USER_CACHE_REDIS_TTL_SECONDS", 3600))
+
+PREFIX = "user"
+
+#Verified token -> (expires_at, email); token -> user is two hops so invalidating a user
+#does not have to find every token issued to them
+_claims: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+#email -> (expires_at, user fields)
+_users: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_lock = threading.Lock()
+
+
+def _local_get(cache: OrderedDict, key: str):
+    with _lock:
+        item = cache.get(key)
+        if item is None:
+            return None
+        if item[0] <= time.time():
+            del cache[key]
+            return None
+        cache.move_to_end(key)
+        return item[1]
+
+
+def _local_put(cache: OrderedDict, key: str, value, expires_at: float):
+    with _lock:
+        cache[key] = (expires_at, value)
+        cache.move_to_end(key)
+        while len(cache) > LOCAL_MAX_ENTRIES:
+            cache.popitem(last=False)
+
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def get_claims(token: str) -> Optional[str]:
+    """Subject of a token verified earlier by this process, while it is still unexpired"""
+    return _local_get(_claims, _token_key(token))
+
+
+def put_claims(token: str, payload: Dict[str, Any]):
+    """Remember a verified token's subject until its exp or the local TTL, whichever is first"""
+    expires_at = time.time() + LOCAL_TTL_SECONDS
+    if payload.get("exp") is not None:
+        expires_at = min(expires_at, float(payload["exp"]))
+    _local_put(_claims, _token_key(token), payload.get("sub"), expires_at)
+
+
+def get_user(email: str) -> Optional[User]:
+    """User from the in-process tier, then Redis; None on a miss in both"""
+    data = _local_get(_users, email)
+    if data is None:
+        try:
+            raw = redis_client.get(f"{PREFIX}:{email}")
+        except Exception as e:
+            logger.warning(f"User cache read failed: {e}")
+            return None
+        if raw is None:
+            return None
+        data = json.loads(raw)
+        _local_put(_users, email, data, time.time() + LOCAL_TTL_SECONDS)
+    #A fresh instance per call, so a caller changing it cannot affect other requests
+    return User.model_validate(data)
+
+
+def put_user(user: User):
+    data = user.model_dump(mode="json")
+    _local_put(_users, user.email, data, time.time() + LOCAL_TTL_SECONDS)
+    try:
+        redis_client.setex(f"{PREFIX}:{user.email}", REDIS_TTL_SECONDS, json.dumps(data))
+    except Exception as e:
+        logger.warning(f"User cache write failed: {e}")
+
+
+def invalidate(email: str):
+    """
+    Drop a user from Redis and this process; call after changing or deleting the row.
+
+    Other processes keep their copy for at most LOCAL_TTL_SECONDS.
+    """
+    with _lock:
+        _users.pop(email, None)
+    try:
+        redis_client.delete(f"{PREFIX}:{email}")
+    except Exception as e:
+        logger.warning(f"User cache invalidation failed for {email}: {e}")
+
+
+def clear_local():
+    with _lock:
+        _claims.clear()
+        _users.clear()
@@ -0,0 +1,10 @@
+from datetime import datetime
+from typing import Callable, Optional
+
+#When set, paper trading reads the time from here instead of the wall clock, e.g. the replay's virtual clock
+provider: Optional[Callable[[], datetime]] = None
+
+
+def utcnow() -> datetime:
+    """Naive UTC now, from the provider when one is set"""
+    return provider() if provider is not None else datetime.utcnow()
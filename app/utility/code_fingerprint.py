@@ -0,0 +1,47 @@
+import ast
+import hashlib
+from functools import lru_cache
+
+
+def _strip_docstrings(tree: ast.AST):
+    for node in ast.walk(tree):
+        if not isinstance(node, (ast.Module, ast.ClassDef, ast.FunctionDef, ast.AsyncFunctionDef)):
+            continue
+        body = node.body
+        if body and isinstance(body[0], ast.Expr) and isinstance(body[0].value, ast.Constant) and isinstance(body[0].value.value, str):
+            node.body = body[1:] or [ast.Pass()]
+
+
+def canonical_tree(code: str) -> ast.Module:
+    """
+    Parsed code with docstrings removed.
+
+    Raises SyntaxError for code that does not parse.
+    """
+    tree = ast.parse(code)
+    _strip_docstrings(tree)
+    return tree
+
+
+def canonicalize(code: str) -> str:
+    """
+    Source with comments, docstrings and formatting normalized away.
+
+    Raises SyntaxError for code that does not parse.
+    """
+    return ast.unparse(canonical_tree(code))
+
+
+def tree_fingerprint(tree: ast.Module) -> str:
+    """Fingerprint of an already canonical tree, for callers that need the tree as well"""
+    return hashlib.sha256(("ast\0" + ast.unparse(tree)).encode()).hexdigest()
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(code: str) -> str:
+    """sha256 of the canonical form; code that does not parse is hashed as text"""
+    try:
+        return tree_fingerprint(canonical_tree(code))
+    except SyntaxError:
+        lines = [line.rstrip() for line in code.replace("\r\n", "\n").split("\n")]
+        return hashlib.sha256(("raw\0" + "\n".join(lines).strip("\n")).encode()).hexdigest()
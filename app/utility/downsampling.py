@@ -0,0 +1,74 @@
+from typing import List, Sequence, Tuple
+
+Point = Tuple[float, float]
+
+
+def lttb(points: Sequence[Point], threshold: int) -> List[Point]:
+    """
+    Largest-Triangle-Three-Buckets downsampling of time-ordered (x, y) points.
+
+    Keeps the first and last point and, from each bucket in between, the point that
+    forms the largest triangle with the previously kept point and the average of the
+    next bucket, which preserves the visual shape of the curve.
+    """
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        #Average of the next bucket is the third corner of the triangle
+        next_start = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, n)
+        span = next_end - next_start
+        avg_x = sum(p[0] for p in points[next_start:next_end]) / span
+        avg_y = sum(p[1] for p in points[next_start:next_end]) / span
+
+        ax, ay = points[a]
+        best, best_area = None, -1.0
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            x, y = points[j]
+            area = abs((ax - avg_x) * (y - ay) - (ax - x) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(points[best])
+        a = best
+
+    sampled.append(points[-1])
+    return sampled
+
+
+def minmax(points: Sequence[Point], threshold: int) -> List[Point]:
+    """
+    Min/max bucketing: split the series into threshold/2 buckets and keep each
+    bucket's lowest and highest point in time order, so no peak or trough is lost.
+    """
+    n = len(points)
+    if threshold >= n or threshold < 2:
+        return list(points)
+
+    buckets = threshold // 2
+    size = n / buckets
+    sampled = []
+    for i in range(buckets):
+        bucket = points[int(i * size):int((i + 1) * size)]
+        if not bucket:
+            continue
+        lo = min(bucket, key=lambda p: p[1])
+        hi = max(bucket, key=lambda p: p[1])
+        if lo is hi:
+            sampled.append(lo)
+        else:
+            sampled.extend(sorted((lo, hi), key=lambda p: p[0]))
+    return sampled
+
+
+METHODS = {"lttb": lttb, "minmax": minmax}
+
+
+def downsample(points: Sequence[Point], threshold: int, method: str = "lttb") -> List[Point]:
+    if method not in METHODS:
+        raise ValueError(f"Unknown downsampling method {method}")
+    return METHODS[method](points, threshold)
@@ -0,0 +1,44 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence
+
+from sqlalchemy import tuple_
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Opaque cursor for the sort key of the last row on a page"""
+    payload = [{"dt": v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        return [datetime.fromisoformat(v["dt"]) if isinstance(v, dict) else v for v in payload]
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def keyset(query, columns: Sequence, cursor: Optional[str]):
+    """
+    Order a query by `columns` descending and seek past `cursor`.
+
+    The last column must be unique (normally the primary key) so every row has a
+    distinct position; the row-value comparison lets a matching composite index
+    start the scan right at the cursor instead of skipping over earlier pages.
+    """
+    if cursor:
+        values = decode_cursor(cursor)
+        if len(values) != len(columns):
+            raise ValueError("Invalid cursor")
+        query = query.where(tuple_(*columns) < tuple_(*values))
+    return query.order_by(*[c.desc() for c in columns])
+
+
+def page(rows: list, limit: int, key) -> dict:
+    """Split a limit+1 fetch into the page and the cursor for the next one"""
+    items = rows[:limit]
+    next_cursor = encode_cursor(key(items[-1])) if len(rows) > limit and items else None
+    return {"items": items, "next_cursor": next_cursor}
@@ -1,4 +1,8 @@
 import redis
+import redis.asyncio as aioredis
 import os
 
-redis_client = redis.Redis.from_url(os.getenv("REDIS_URL"), decode_responses=True)
\ No newline at end of file
+redis_client = redis.Redis.from_url(os.getenv("REDIS_URL"), decode_responses=True)
+
+#For async routes that hold connections open, such as pub/sub subscribers
+async_redis_client = aioredis.Redis.from_url(os.getenv("REDIS_URL"), decode_responses=True)
@@ -0,0 +1,67 @@
+import functools
+import logging
+import os
+import socket
+import uuid
+from typing import Optional
+
+from app.utility.redis_client import redis_client
+
+logger = logging.getLogger("redis_lock")
+
+#Extend a lock only while we still hold it
+_RENEW_SCRIPT = redis_client.register_script("""
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+""")
+
+#Delete a lock only while we still hold it
+_RELEASE_SCRIPT = redis_client.register_script("""
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+""")
+
+
+def new_owner_id() -> str:
+    """Identity of this process for lock values; unique across restarts on the same host"""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def acquire(key: str, owner: str, ttl_ms: int) -> bool:
+    return bool(redis_client.set(key, owner, nx=True, px=ttl_ms))
+
+
+def renew(key: str, owner: str, ttl_ms: int) -> bool:
+    return bool(_RENEW_SCRIPT(keys=[key], args=[owner, ttl_ms]))
+
+
+def release(key: str, owner: str) -> bool:
+    return bool(_RELEASE_SCRIPT(keys=[key], args=[owner]))
+
+
+def run_once(name: str, ttl_seconds: int, owner: Optional[str] = None):
+    """
+    Decorator for scheduled jobs that every worker schedules but only one should run.
+
+    The lock is left to expire instead of being released, so workers whose trigger
+    fires a little later in the same window still see it taken and skip. Without
+    Redis no worker can tell whether another one runs the job, so all of them skip.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = f"lock:job:{name}"
+            try:
+                if not acquire(key, owner or new_owner_id(), ttl_seconds * 1000):
+                    logger.info(f"Skipping {name}: already running elsewhere")
+                    return None
+            except Exception as e:
+                logger.error(f"Skipping {name}: could not take its lock: {e}")
+                return None
+            return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,34 @@
+import json
+import logging
+from typing import AsyncIterator, Optional
+
+from fastapi.responses import StreamingResponse
+
+logger = logging.getLogger("sse")
+
+
+def format_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def sse_response(chunks: AsyncIterator[str], meta: Optional[dict] = None) -> StreamingResponse:
+    """
+    Server-sent events for a text stream: an optional `meta` event, one `delta`
+    event per chunk, then `done` with the full text, or `error` if the stream fails.
+    """
+    async def events():
+        if meta is not None:
+            yield format_event("meta", meta)
+        parts = []
+        try:
+            async for chunk in chunks:
+                parts.append(chunk)
+                yield format_event("delta", {"text": chunk})
+        except Exception as e:
+            logger.warning(f"Stream failed after {len(parts)} chunks: {e}")
+            yield format_event("error", {"detail": str(e)})
+            return
+        yield format_event("done", {"text": "".join(parts).strip()})
+
+    #No proxy buffering, or the client sees nothing until the generation ends
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
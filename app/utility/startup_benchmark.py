@@ -0,0 +1,61 @@
+"""
+Startup benchmark: wall time and peak memory to import app.main and run its lifespan,
+each in a fresh interpreter so nothing is already imported.
+
+    python -m app.utility.startup_benchmark --runs 5 --roles api
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HEAVY_MODULES = ["backtrader", "yfinance", "plotly", "pandas", "numpy", "google.generativeai", "pyarrow", "apscheduler"]
+
+#Runs in the child; prints one JSON line
+_PROBE = """
+import asyncio, json, resource, sys, time
+t0 = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+async def run():
+    async with app.main.lifespan(app.main.app):
+        pass
+if {lifespan}:
+    asyncio.run(run())
+done = time.perf_counter()
+print(json.dumps({{
+    "import_seconds": imported - t0,
+    "startup_seconds": done - t0,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "loaded": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def measure(roles: str, lifespan: bool = True) -> dict:
+    env = dict(os.environ, APP_ROLES=roles)
+    out = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(lifespan=lifespan, heavy=HEAVY_MODULES)],
+        env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def benchmark(roles: str, runs: int, lifespan: bool = True) -> dict:
+    samples = [measure(roles, lifespan) for _ in range(runs)]
+    summary = {"roles": roles, "runs": runs, "loaded": samples[-1]["loaded"]}
+    for key in ("import_seconds", "startup_seconds", "max_rss_mb"):
+        values = [s[key] for s in samples]
+        summary[key] = {"median": round(statistics.median(values), 4), "max": round(max(values), 4)}
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time app.main import and lifespan startup")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--roles", default=os.getenv("APP_ROLES", "api"))
+    parser.add_argument("--no-lifespan", action="store_true", help="only time the import")
+    args = parser.parse_args()
+    print(json.dumps(benchmark(args.roles, args.runs, not args.no_lifespan), indent=2))
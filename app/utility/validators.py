@@ -1,67 +1,284 @@
-import ast 
+import ast
+import builtins
+import re
+import sys
+import types
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from app.utility.code_fingerprint import canonical_tree, tree_fingerprint
 
+#Still used for code that does not parse, where there is no tree to inspect
 BANNED_KEYWORDS=[
      "import os", "import subprocess", "open(", "exec(", "eval(", "__import__",
     "os.system", "shutil", "pickle", "socket", "requests"
 ]
-def contains_dangerous_code(code:str) -> bool:
-    return any(bad in code for bad in BANNED_KEYWORDS)
 
-def is_valid_python(code:str) -> bool:
+#Top-level modules strategy code may import
+ALLOWED_IMPORTS = {
+    "backtrader", "math", "numpy", "pandas", "datetime", "statistics", "collections",
+    "itertools", "functools", "dataclasses", "enum", "decimal", "random"
+}
+#Modules the C parts of allowed packages import on first use (datetime.strftime -> time);
+#C code looks __import__ up in the calling frame, which for strategy code is _safe_import
+INTERNAL_IMPORTS = {"time", "_strptime"}
+#Builtins that reach code execution, the filesystem or interpreter internals
+BANNED_NAMES = {
+    "exec", "eval", "compile", "open", "__import__", "globals", "locals", "vars",
+    "breakpoint", "input", "exit", "quit", "help", "memoryview", "__builtins__", "__loader__", "__spec__"
+}
+#Only called directly with a literal attribute name that passes the attribute checks
+ATTRIBUTE_FUNCTIONS = {"getattr", "setattr", "delattr", "hasattr"}
+#Private attributes lead out of the allowed modules (random._os) and dunders other than
+#these to interpreter internals (__class__.__subclasses__(), __globals__, ...)
+ALLOWED_DUNDERS = {"__init__", "__name__"}
+#Modules the allowed ones expose as public attributes (numpy.lib.npyio.os, pandas.io.common.os),
+#banned as names and attributes wherever they appear
+MODULE_NAMES = {
+    "os", "sys", "subprocess", "builtins", "importlib", "io", "modules", "shutil", "socket",
+    "pickle", "marshal", "ctypes", "posix", "nt", "pathlib", "runpy", "pty", "multiprocessing",
+    "threading", "tempfile", "inspect", "gc", "system", "popen", "environ",
+    #backtrader imports these class attributes with the real __import__ on instantiation
+    "packages", "frompackages", "testing", "distutils"
+}
+#File, network and native-code access through the allowed modules, APIs that evaluate
+#strings as code (whose strings could reach anything), plus frame internals
+BANNED_ATTRIBUTES = {
+    "to_csv", "to_pickle", "to_parquet", "to_excel", "to_json", "to_sql", "to_hdf", "to_feather", "to_html",
+    "to_string", "to_latex", "to_markdown", "to_xml", "to_stata", "to_clipboard", "to_orc", "to_gbq",
+    "ExcelWriter", "HDFStore",
+    "load", "save", "savez", "savez_compressed", "fromfile", "tofile", "loadtxt", "savetxt", "genfromtxt",
+    "fromregex", "dump", "dumps", "memmap", "open_memmap", "DataSource", "ctypeslib", "ctypes", "f2py",
+    "feed", "feeds", "CSVDataBase", "CSVFeedBase", "stores", "WriterFile", "addwriter", "plot", "savefig",
+    "eval", "query", "get_type_hints", "singledispatch", "singledispatchmethod", "format_map",
+    "f_globals", "f_locals", "f_back", "f_builtins", "gi_frame", "cr_frame", "tb_frame"
+}
+#Keyword arguments that name a file to read or write, whichever call they are passed to
+FILE_ARGUMENTS = {
+    "buf", "path", "path_or_buf", "path_or_buffer", "filepath_or_buffer", "excel_writer",
+    "file", "filename", "fname", "dataname"
+}
+#"{0.__class__}".format(x) walks attributes without an attribute node
+_FORMAT_TRAVERSAL = re.compile(r"\{[^{}]*(\.|\[)_")
+
+STOPLOSS_ATTRIBUTES = {"stop_loss", "trailing_stop", "Stop", "StopTrail", "StopLimit", "StopTrailLimit"}
+SIZING_NAMES = {"size", "stake", "setsizer", "addsizer", "sizer"}
+
+
+def _attribute_violation(attr: str) -> bool:
+    if attr.startswith("_"):
+        return attr not in ALLOWED_DUNDERS
+    return attr in BANNED_ATTRIBUTES or attr in MODULE_NAMES or attr.startswith("read_")
+
+
+def _allowed_module(name: str) -> bool:
+    """An allowlisted package, reached only through submodules an attribute could reach too"""
+    top, *rest = name.split(".")
+    return top in ALLOWED_IMPORTS and not any(_attribute_violation(part) for part in rest)
+
+
+class StrategyCodeAnalyzer(ast.NodeVisitor):
+    """One pass over a strategy's tree: safety violations, Strategy subclasses and risk features"""
+
+    def __init__(self):
+        self.violations = []
+        self.strategy_classes = []
+        self.has_stoploss = False
+        self.has_position_sizing = False
+        self._checked_calls = set()
+
+    def _violation(self, node, message):
+        self.violations.append(f"line {getattr(node, 'lineno', '?')}: {message}")
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            if not _allowed_module(alias.name):
+                self._violation(node, f"import of {alias.name} is not allowed")
+
+    def visit_ImportFrom(self, node):
+        if node.level or not _allowed_module(node.module or ""):
+            self._violation(node, f"import from {'.' * node.level}{node.module or ''} is not allowed")
+        for alias in node.names:
+            if _attribute_violation(alias.name):
+                self._violation(node, f"import of {alias.name} is not allowed")
+
+    def visit_Name(self, node):
+        if node.id in BANNED_NAMES or node.id in MODULE_NAMES:
+            self._violation(node, f"use of {node.id} is not allowed")
+        elif node.id in ATTRIBUTE_FUNCTIONS and id(node) not in self._checked_calls:
+            self._violation(node, f"{node.id} may only be called with a literal attribute name")
+
+    def visit_Attribute(self, node):
+        attr = node.attr
+        if _attribute_violation(attr):
+            self._violation(node, f"access to .{attr} is not allowed")
+        if attr in STOPLOSS_ATTRIBUTES:
+            self.has_stoploss = True
+        if attr in SIZING_NAMES:
+            self.has_position_sizing = True
+        self.generic_visit(node)
+
+    def visit_Call(self, node):
+        if isinstance(node.func, ast.Name) and node.func.id in ATTRIBUTE_FUNCTIONS:
+            name = node.args[1] if len(node.args) > 1 else None
+            if isinstance(name, ast.Constant) and isinstance(name.value, str) and not _attribute_violation(name.value):
+                self._checked_calls.add(id(node.func))
+        for keyword in node.keywords:
+            if keyword.arg in FILE_ARGUMENTS:
+                self._violation(node, f"argument {keyword.arg}= is not allowed")
+            elif keyword.arg in SIZING_NAMES:
+                self.has_position_sizing = True
+            elif keyword.arg in STOPLOSS_ATTRIBUTES:
+                self.has_stoploss = True
+        self.generic_visit(node)
+
+    def visit_Constant(self, node):
+        text = node.value.decode("latin-1") if isinstance(node.value, bytes) else node.value
+        #Dunder names in strings only serve code that turns strings into lookups or code
+        if isinstance(text, str) and "__" in text:
+            self._violation(node, "strings may not contain __")
+        if isinstance(node.value, str):
+            if _FORMAT_TRAVERSAL.search(node.value):
+                self._violation(node, "format fields may not reach private attributes")
+            #Strategy params are declared as ("stop_loss", 0.02) tuples
+            if node.value in STOPLOSS_ATTRIBUTES:
+                self.has_stoploss = True
+            elif node.value in SIZING_NAMES:
+                self.has_position_sizing = True
+
+    def visit_ClassDef(self, node):
+        for base in node.bases:
+            if (
+                (isinstance(base, ast.Name) and base.id == 'Strategy') or
+                (isinstance(base, ast.Attribute) and base.attr == 'Strategy')
+            ):
+                self.strategy_classes.append(node.name)
+                break
+        self.generic_visit(node)
+
+
+#Analyses by code fingerprint, least recently used first
+VALIDATION_CACHE_SIZE = 2048
+_analyses: "OrderedDict[str, dict]" = OrderedDict()
+_analyses_lock = threading.Lock()
+
+@lru_cache(maxsize=512)
+def analyze_strategy_code(code: str) -> dict:
+    """
+    Safety, structure and risk analysis of strategy code in a single parse.
+
+    Results are shared by code with the same fingerprint, so comments, docstrings
+    and formatting never change the outcome; resubmitting the exact same text
+    skips the parse too. The returned dict is shared and must not be modified.
+    """
     try:
-        ast.parse(code)
-        return True
+        tree = canonical_tree(code)
     except SyntaxError:
-        return False
+        return {"syntax_error": True, "violations": [], "strategy_classes": [], "has_stoploss": False, "has_position_sizing": False}
+    key = tree_fingerprint(tree)
+    with _analyses_lock:
+        if key in _analyses:
+            _analyses.move_to_end(key)
+            return _analyses[key]
+
+    analyzer = StrategyCodeAnalyzer()
+    analyzer.visit(tree)
+    analysis = {
+        "syntax_error": False,
+        "violations": analyzer.violations,
+        "strategy_classes": analyzer.strategy_classes,
+        "has_stoploss": analyzer.has_stoploss,
+        "has_position_sizing": analyzer.has_position_sizing,
+    }
+    with _analyses_lock:
+        _analyses[key] = analysis
+        if len(_analyses) > VALIDATION_CACHE_SIZE:
+            _analyses.popitem(last=False)
+    return analysis
+
+def contains_dangerous_code(code:str) -> bool:
+    analysis = analyze_strategy_code(code)
+    if analysis["syntax_error"]:
+        return any(bad in code for bad in BANNED_KEYWORDS)
+    return bool(analysis["violations"])
+
+def is_valid_python(code:str) -> bool:
+    return not analyze_strategy_code(code)["syntax_error"]
 
 def has_backtrader_strategy(code:str) -> bool:
-    try:
-        tree = ast.parse(code)
-        for node in ast.walk(tree):
-            if isinstance(node, ast.ClassDef):
-                for base in node.bases:
-                # Check for ast.Name and ast.Attribute
-                    if (
-                        (isinstance(base, ast.Name) and base.id == 'Strategy') or
-                        (isinstance(base, ast.Attribute) and base.attr == 'Strategy')
-                    ):
-                        return True
-        return False
-    except SyntaxError:
-        return False
-    
-def validate_strategy_code(code: str) -> dict:
-    if contains_dangerous_code(code):
-        return {"valid": False, "reason": "Dangerous code detected."}
+    return bool(analyze_strategy_code(code)["strategy_classes"])
 
-    if not is_valid_python(code):
+def validate_strategy_code(code: str) -> dict:
+    analysis = analyze_strategy_code(code)
+    if analysis["syntax_error"]:
+        if any(bad in code for bad in BANNED_KEYWORDS):
+            return {"valid": False, "reason": "Dangerous code detected."}
         return {"valid": False, "reason": "Syntax error in code."}
 
-    if not has_backtrader_strategy(code):
+    if analysis["violations"]:
+        return {"valid": False, "reason": "Dangerous code detected.", "violations": list(analysis["violations"])}
+
+    if not analysis["strategy_classes"]:
         return {"valid": False, "reason": "No valid backtrader Strategy class found."}
 
     return {"valid": True}
 
 def validate_strategy_risk(code: str) -> dict:
     """Validate Strategy for proper risk management implementation."""
-    try:
-        tree = ast.parsre(code)
-        has_stoploss = False
-        has_position_sizing = False
-
-        for node in ast.walk(tree):
-            if isinstance(node, ast.Attribute):
-                if node.attr == "stop_loss":
-                    has_stoploss = True
-                if node.attr in ['size', 'stake']:
-                    has_position_sizing = True
-            
-        return {
-            "valid": has_stoploss and has_position_sizing,
-            "warnings": {
-                "missing_stoploss": not has_stoploss,
-                "missing_position_sizing": not has_position_sizing
-            }
+    analysis = analyze_strategy_code(code)
+    if analysis["syntax_error"]:
+        return {"valid": False, "reason": "Error analyzing code."}
+    has_stoploss = analysis["has_stoploss"]
+    has_position_sizing = analysis["has_position_sizing"]
+    return {
+        "valid": has_stoploss and has_position_sizing,
+        "warnings": {
+            "missing_stoploss": not has_stoploss,
+            "missing_position_sizing": not has_position_sizing
         }
-    except Exception: 
-        return {"valid": False, "reason": "Error analyzing code."}
\ No newline at end of file
+    }
+
+
+def _internal_module(name: str) -> bool:
+    """A submodule of an allowed package, private ones included, or one of INTERNAL_IMPORTS"""
+    top, *rest = name.split(".")
+    if name in INTERNAL_IMPORTS:
+        return True
+    return top in ALLOWED_IMPORTS and not any(part in MODULE_NAMES or part in BANNED_ATTRIBUTES for part in rest)
+
+
+def _safe_import(name, globals=None, locals=None, fromlist=(), level=0):
+    #Import statements in strategy code passed the same checks; lazy imports the allowed
+    #packages make from C (numpy._core._methods on ndarray.mean) pass no fromlist
+    allowed = _allowed_module(name) and not any(_attribute_violation(item) for item in fromlist or ())
+    if level or not (allowed or (not fromlist and _internal_module(name))):
+        raise ImportError(f"import of {name} is not allowed")
+    return builtins.__import__(name, globals, locals, fromlist, level)
+
+#Builtins strategy code runs with; everything else, open and __import__ included, is absent
+SAFE_BUILTINS = {
+    name: getattr(builtins, name) for name in (
+        "abs", "all", "any", "bool", "dict", "divmod", "enumerate", "filter", "float", "format",
+        "frozenset", "getattr", "hasattr", "setattr", "int", "isinstance", "issubclass", "iter",
+        "len", "list", "map", "max", "min", "next", "object", "pow", "print", "property", "range",
+        "repr", "reversed", "round", "set", "slice", "sorted", "staticmethod", "classmethod", "str",
+        "sum", "super", "tuple", "zip", "None", "True", "False",
+        "Exception", "ArithmeticError", "AttributeError", "IndexError", "KeyError", "NotImplementedError",
+        "RuntimeError", "StopIteration", "TypeError", "ValueError", "ZeroDivisionError",
+        "__build_class__",
+    )
+}
+SAFE_BUILTINS["__import__"] = _safe_import
+
+#Module name classes defined by strategy code report; backtrader looks it up in sys.modules
+SANDBOX_MODULE = "strategy_sandbox"
+
+def strategy_namespace(**preloaded) -> dict:
+    """
+    Globals to exec validated strategy code in: the safe builtins plus `preloaded`.
+
+    Never exec strategy code in a module's own globals, which hand it every module
+    that module imported.
+    """
+    sys.modules.setdefault(SANDBOX_MODULE, types.ModuleType(SANDBOX_MODULE))
+    return {"__builtins__": dict(SAFE_BUILTINS), "__name__": SANDBOX_MODULE, **preloaded}
@@ -0,0 +1,34 @@
+import os
+import sys
+
+#app.db and the Redis client read these at import; the tests below never open either
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/15")
+os.environ.setdefault("QUOTE_TAPE_ENABLED", "0")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture
+def db_engine(tmp_path, monkeypatch):
+    """A fresh SQLite database with every table, for tests that go through the services"""
+    from sqlmodel import SQLModel, create_engine
+    import app.models.users, app.models.strategy, app.models.strategy_metrics  # noqa: F401
+    import app.models.leaderboard, app.models.paper_trading  # noqa: F401
+    from app.services import paper_events
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    SQLModel.metadata.create_all(engine)
+    #Nothing listens in tests; staged events are dropped at commit
+    monkeypatch.setattr(paper_events, "publishing_enabled", False)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def fake_redis():
+    """In-memory Redis with Lua scripting; tests patch it over the modules they exercise"""
+    import fakeredis
+    return fakeredis.FakeRedis(server=fakeredis.FakeServer(), decode_responses=True)
@@ -0,0 +1,108 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.models.strategy_blueprint import StrategyBlueprint, EntryCondition, ExitCondition, IndicatorParams, RiskManagement
+from app.services.backtest_service import load_strategy_class, run_backtest_on_frame
+from app.services.blueprint_compiler import BlueprintCompileError, compile_blueprint
+from app.utility.validators import validate_strategy_code
+
+ENTRY_INDICATORS = ["sma", "ema", "rsi", "zscore", "macd", "bollinger"]
+OPERATORS = [">", "<", ">=", "<=", "crosses_above", "crosses_below"]
+STOPS = [None, 2.0, "2%", "atr", "1.5 x ATR"]
+#(position sizing, exit conditions)
+PLANS = [
+    ("fixed", []),
+    ("percent", [ExitCondition(indicator="rsi", operator=">", value=70, params=IndicatorParams())]),
+    ("risk_adjusted", [ExitCondition(indicator="macd", operator="crosses_below", value=None, params=IndicatorParams())]),
+    ("fixed", [ExitCondition(indicator="atr", operator=">", value=5, params=IndicatorParams(lookback=10))]),
+    ("risk_adjusted", [ExitCondition(indicator="atr", operator="crosses_above", value=None, params=IndicatorParams())]),
+]
+
+
+def blueprint(indicator, operator, value=None, stop=None, sizing="fixed", exits=(), asset="RELIANCE.NS") -> StrategyBlueprint:
+    return StrategyBlueprint(
+        asset=asset,
+        entry=[EntryCondition(indicator=indicator, operator=operator, value=value, params=IndicatorParams())],
+        exit=list(exits),
+        risk=RiskManagement(stop_loss=stop, take_profit=5.0, trailing_stop=3.0),
+        position_sizing=sizing,
+    )
+
+
+#Every indicator, operator, with and without a value, every stop form and sizing mode: 1,800 blueprints
+SWEEP = [
+    blueprint(indicator, operator, value, stop, sizing, exits)
+    for indicator, operator, value, stop, (sizing, exits)
+    in itertools.product(ENTRY_INDICATORS, OPERATORS, [None, 1.5], STOPS, PLANS)
+]
+
+
+def bars(n: int = 300) -> pd.DataFrame:
+    rng = np.random.default_rng(7)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    return pd.DataFrame(
+        {"open": close, "high": close + 1, "low": close - 1, "close": close, "volume": 1000.0},
+        index=pd.date_range("2023-01-02", periods=n, freq="B"),
+    )
+
+
+def test_sweep_compiles_to_valid_strategies():
+    assert len(SWEEP) == 1800
+    for bp in SWEEP:
+        code = compile_blueprint(bp)
+        assert validate_strategy_code(code) == {"valid": True}, code
+        assert load_strategy_class(code) is not None, code
+
+
+@pytest.mark.parametrize("bp", SWEEP[::60])
+def test_sweep_sample_backtests(bp):
+    result = run_backtest_on_frame(compile_blueprint(bp), bars())
+    assert "error" not in result
+
+
+def test_asset_is_not_emitted():
+    code = compile_blueprint(blueprint("rsi", "<", 30, asset='X"""\nimport os\n"""'))
+    assert "import os" not in code
+    assert validate_strategy_code(code) == {"valid": True}
+
+
+@pytest.mark.parametrize("value", [1e20, -1e-5, 1e-7])
+def test_exponent_levels_are_literals(value):
+    code = compile_blueprint(blueprint("sma", ">", value))
+    assert f"self.entry_0[0] > {value!r}" in code
+    assert load_strategy_class(code) is not None
+
+
+@pytest.mark.parametrize("value", [float("inf"), float("nan")])
+def test_non_finite_levels_are_rejected(value):
+    with pytest.raises(BlueprintCompileError):
+        compile_blueprint(blueprint("rsi", ">", value))
+
+
+@pytest.mark.parametrize("operator", [">", "<=", "crosses_above"])
+def test_atr_exit_without_a_value(operator):
+    exit_ = ExitCondition(indicator="atr", operator=operator, value=None, params=IndicatorParams(lookback=10))
+    code = compile_blueprint(blueprint("rsi", "<", 30, exits=[exit_]))
+    assert "bt.indicators.SMA(self.exit_0, period=10)" in code
+    assert "error" not in run_backtest_on_frame(code, bars())
+
+
+def test_stream_route_serves_compiled_code(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.routes import builder
+
+    def no_llm(prompt):
+        raise AssertionError("the LLM should not be asked")
+    monkeypatch.setattr(builder, "stream_strategy_code", no_llm)
+    app = FastAPI()
+    app.include_router(builder.router)
+    bp = blueprint("rsi", "<", 30)
+
+    response = TestClient(app).post("/builder/translate/stream", json=bp.model_dump())
+    assert response.status_code == 200
+    assert '"source": "compiler"' in response.text
+    assert "event: done" in response.text and "bt.Strategy" in response.text
@@ -0,0 +1,81 @@
+import time
+
+import pytest
+
+from app.services import executor_partitions
+from app.services.executor_partitions import PartitionLeaser
+from app.utility import redis_lock
+
+
+@pytest.fixture
+def leases(fake_redis, monkeypatch):
+    monkeypatch.setattr(redis_lock, "redis_client", fake_redis)
+    monkeypatch.setattr(executor_partitions, "redis_client", fake_redis)
+    #Scripts run on the client they were registered with
+    for name in ("_RENEW_SCRIPT", "_RELEASE_SCRIPT"):
+        monkeypatch.setattr(redis_lock, name, fake_redis.register_script(getattr(redis_lock, name).script))
+    return fake_redis
+
+
+def test_a_new_process_takes_half_once_the_first_sheds(leases):
+    first = PartitionLeaser(partitions=16, owner="first")
+    assert first.refresh() == set(range(16))
+
+    second = PartitionLeaser(partitions=16, owner="second")
+    #Every lease is still held, so the newcomer waits for the other to shed
+    assert second.refresh() == set()
+    assert len(first.refresh()) == 8
+    assert len(second.refresh()) == 8
+    assert first.held.isdisjoint(second.held) and first.held | second.held == set(range(16))
+    assert first.refresh() == first.held and second.refresh() == second.held
+
+
+def test_survivor_picks_up_the_leases_of_a_dead_process(leases):
+    survivor = PartitionLeaser(partitions=8, ttl_ms=200, owner="survivor")
+    dying = PartitionLeaser(partitions=8, ttl_ms=200, owner="dying")
+    survivor.refresh()
+    dying.refresh()
+    survivor.refresh()
+    assert len(survivor.held) == 4 and len(dying.refresh()) == 4
+
+    #dying stops renewing; its membership and leases lapse
+    time.sleep(0.3)
+    survivor.refresh()
+    assert survivor.refresh() == set(range(8))
+
+
+def test_release_all_hands_partitions_over_at_once(leases):
+    leaving = PartitionLeaser(partitions=4, owner="leaving")
+    staying = PartitionLeaser(partitions=4, owner="staying")
+    leaving.refresh()
+    staying.refresh()
+    leaving.release_all()
+    assert staying.refresh() == set(range(4))
+
+
+def test_redis_outage_drops_every_partition(leases):
+    leaser = PartitionLeaser(partitions=4, owner="alone")
+    assert leaser.refresh() == set(range(4))
+    leases.connection_pool.connection_kwargs["server"].connected = False
+    assert leaser.refresh() == set()
+
+
+def test_run_once_lets_one_worker_run_each_firing(leases):
+    calls = []
+
+    def job():
+        calls.append(1)
+        return "ran"
+
+    #Separate decorations, as each worker process schedules its own copy
+    workers = [redis_lock.run_once("nightly", ttl_seconds=60, owner=f"w{i}")(job) for i in range(3)]
+    assert [worker() for worker in workers] == ["ran", None, None]
+    assert len(calls) == 1
+    #The lock is left to expire rather than released, so a late trigger still skips
+    assert workers[0]() is None
+
+
+def test_run_once_skips_without_redis(leases):
+    leases.connection_pool.connection_kwargs["server"].connected = False
+    job = redis_lock.run_once("nightly", ttl_seconds=60)(lambda: "ran")
+    assert job() is None
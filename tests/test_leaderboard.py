@@ -0,0 +1,119 @@
+from datetime import datetime
+
+import pytest
+from sqlmodel import Session
+
+from app.models.leaderboard import LeaderboardEntry
+from app.services import leaderboard_cache, leaderboard_service
+
+#(user, score); equal scores make the id the tie-break
+SCORES = [("a", 10.0), ("b", 30.0), ("c", 20.0), ("a", 30.0), ("d", 20.0), ("b", 5.0), ("e", 20.0), ("c", 30.0)]
+
+
+@pytest.fixture
+def entries(db_engine, fake_redis, monkeypatch):
+    monkeypatch.setattr(leaderboard_service, "get_session", lambda: Session(db_engine))
+    monkeypatch.setattr(leaderboard_cache, "redis_client", fake_redis)
+    with Session(db_engine) as session:
+        rows = [LeaderboardEntry(username=user, score=score, run_at=datetime.utcnow()) for user, score in SCORES]
+        session.add_all(rows)
+        session.commit()
+        for row in rows:
+            session.refresh(row)
+            leaderboard_cache.record_entry(row)
+    return rows
+
+
+@pytest.fixture
+def redis_down(fake_redis):
+    fake_redis.connection_pool.connection_kwargs["server"].connected = False
+
+
+def ids(rows):
+    return [(row["id"], row["rank"]) for row in rows]
+
+
+@pytest.mark.parametrize("period", ["daily", "weekly", "alltime"])
+@pytest.mark.parametrize("user", ["a", "b", "c", "d", "e"])
+def test_sql_rank_matches_redis(entries, period, user):
+    cached = leaderboard_cache.user_rank(user, period=period)
+    sql = leaderboard_service.query_user_rank(user, period=period)
+    assert (sql["id"], sql["rank"]) == (cached["id"], cached["rank"])
+
+
+@pytest.mark.parametrize("rank,radius", [(1, 0), (1, 2), (4, 2), (8, 5), (20, 1)])
+def test_sql_around_matches_redis(entries, rank, radius):
+    assert ids(leaderboard_service.query_around(rank, radius)) == ids(leaderboard_cache.around(rank, radius))
+
+
+def test_rank_and_around_fall_back_to_sql_when_redis_is_down(entries, redis_down):
+    with pytest.raises(Exception):
+        leaderboard_cache.user_rank("a")
+    assert leaderboard_service.query_user_rank_cached("a")["rank"] == leaderboard_service.query_user_rank("a")["rank"]
+    assert ids(leaderboard_service.query_around_cached(3, 1)) == ids(leaderboard_service.query_around(3, 1))
+    assert leaderboard_service.query_user_rank_cached("nobody") is None
+
+
+def test_rank_and_around_fall_back_to_sql_without_a_bucket(entries, fake_redis):
+    fake_redis.flushall()
+    assert leaderboard_service.query_user_rank_cached("c") == leaderboard_service.query_user_rank("c")
+    assert ids(leaderboard_service.query_around_cached(2, 1)) == [(entries[7].id, 1), (entries[3].id, 2), (entries[1].id, 3)]
+
+
+def test_unknown_scoring_version_names_the_known_ones(monkeypatch):
+    metrics = {"Total Return": 0.1, "Sharpe Ratio": 1.0, "Max Drawdown": 0.05}
+    assert leaderboard_service.compute_score(metrics) == leaderboard_service.compute_score(metrics, version=1)
+    with pytest.raises(ValueError, match="known versions: 1"):
+        leaderboard_service.compute_score(metrics, version=7)
+    monkeypatch.setattr(leaderboard_service, "SCORING_VERSION", 0)
+    with pytest.raises(ValueError, match="Unknown scoring version 0"):
+        leaderboard_service.compute_score(metrics)
+
+
+def test_weekly_snapshot_covers_the_iso_week_of_the_redis_bucket(db_engine, monkeypatch):
+    import json
+    from app.services import leaderboard_snapshot_service
+    monkeypatch.setattr(leaderboard_snapshot_service, "get_session", lambda: Session(db_engine))
+    #Wednesday 2024-01-10 is in ISO week 2024-W02, which starts on Monday the 8th
+    as_of = datetime(2024, 1, 10)
+    days = {"sun": datetime(2024, 1, 7, 23), "mon": datetime(2024, 1, 8, 1), "wed": datetime(2024, 1, 10, 12), "thu": datetime(2024, 1, 11, 9)}
+    with Session(db_engine) as session:
+        session.add_all([LeaderboardEntry(username=name, score=1.0, run_at=at) for name, at in days.items()])
+        session.commit()
+
+    payload, _, _ = leaderboard_snapshot_service.build_snapshot("weekly", as_of.date())
+    week = leaderboard_cache._bucket("weekly", as_of)[0]
+    assert week == "2024-W02"
+    #Everything in the week's Redis bucket up to the end of as_of
+    expected = {name for name, at in days.items() if leaderboard_cache._bucket("weekly", at)[0] == week and at.date() <= as_of.date()}
+    assert {row["username"] for row in json.loads(payload)["top"]} == expected == {"mon", "wed"}
+
+
+@pytest.mark.parametrize("limit", [1, 3, 4, 7, 50])
+def test_keyset_pages_follow_redis_tie_order(db_engine, fake_redis, monkeypatch, limit):
+    monkeypatch.setattr(leaderboard_service, "get_session", lambda: Session(db_engine))
+    monkeypatch.setattr(leaderboard_cache, "redis_client", fake_redis)
+    #Ids run past 9 and 99 so tie order cannot lean on string comparison of unpadded ids
+    with Session(db_engine) as session:
+        rows = [LeaderboardEntry(username=f"u{i}", score=float(i % 3), run_at=datetime.utcnow()) for i in range(120)]
+        session.add_all(rows)
+        session.commit()
+        for row in rows:
+            session.refresh(row)
+            leaderboard_cache.record_entry(row)
+
+    walked, cursor = [], None
+    while True:
+        result = leaderboard_service.query_leaderboard_page(limit=limit, cursor=cursor)
+        walked += [row["id"] for row in result["items"]]
+        cursor = result["next_cursor"]
+        if cursor is None:
+            break
+    cached = [row["id"] for row in leaderboard_cache.top(limit=len(rows))]
+    assert walked == cached
+    assert walked == [r.id for r in sorted(rows, key=lambda r: (r.score, r.id), reverse=True)]
+
+
+def test_bad_cursor_is_a_value_error(entries):
+    with pytest.raises(ValueError):
+        leaderboard_service.query_leaderboard_page(cursor="not-a-cursor")
@@ -0,0 +1,71 @@
+import pandas as pd
+from sqlmodel import Session
+
+from app.models.paper_trading import PaperStrategyDeployment, PaperTradingAccount
+from app.models.strategy import Strategy
+from app.services import live_strategy_runner
+from app.services.live_strategy_runner import LiveStrategyManager
+from app.services.market_data_service import MarketDataService
+
+STRATEGY = """
+import backtrader as bt
+
+class Hold(bt.Strategy):
+    def next(self):
+        pass
+"""
+
+
+def bars(n=5):
+    index = pd.date_range("2024-01-02 14:30", periods=n, freq="1min")
+    return pd.DataFrame({"open": 1.0, "high": 1.0, "low": 1.0, "close": 1.0, "volume": 100.0}, index=index)
+
+
+def deploy(engine, symbols):
+    with Session(engine) as session:
+        account = PaperTradingAccount(user_id=1)
+        strategy = Strategy(name="hold", prompt="", code=STRATEGY)
+        session.add(account)
+        session.add(strategy)
+        session.flush()
+        for symbol in symbols:
+            session.add(PaperStrategyDeployment(account_id=account.id, strategy_id=strategy.id, symbol=symbol))
+        session.commit()
+
+
+def test_warmup_is_fetched_outside_the_lock_once_per_feed(db_engine, monkeypatch):
+    monkeypatch.setattr(live_strategy_runner, "get_session", lambda: Session(db_engine))
+    deploy(db_engine, ["AAA", "BBB"])
+    manager = LiveStrategyManager()
+    fetched = []
+
+    def get_recent_bars(symbol, interval, period):
+        #Another tick or progress write could take the lock while history downloads
+        assert manager._lock.acquire(blocking=False)
+        manager._lock.release()
+        fetched.append(symbol)
+        return bars()
+
+    monkeypatch.setattr(MarketDataService, "get_recent_bars", staticmethod(get_recent_bars))
+    try:
+        manager.sync()
+        manager.sync()
+        assert sorted(fetched) == ["AAA", "BBB"]
+        assert len(manager.runners) == 2 and not manager._starting
+        assert all(runner.last_bar_at == bars().index[-2] for runner in manager.runners.values())
+    finally:
+        manager.stop_all()
+
+
+def test_runner_cap_counts_runners_still_warming_up(db_engine, monkeypatch):
+    monkeypatch.setattr(live_strategy_runner, "get_session", lambda: Session(db_engine))
+    monkeypatch.setattr(live_strategy_runner, "MAX_RUNNERS", 2)
+    monkeypatch.setattr(MarketDataService, "get_recent_bars", staticmethod(lambda *args: None))
+    deploy(db_engine, ["AAA", "BBB", "CCC"])
+    manager = LiveStrategyManager()
+    manager._starting.add(999)
+    try:
+        manager.sync()
+        assert len(manager.runners) == 1
+    finally:
+        manager.stop_all()
@@ -0,0 +1,67 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from app.services import explain_service, llm_cache, llm_client
+
+
+class Blocking:
+    """A sync client that fails the test if touched"""
+    def __getattr__(self, name):
+        raise AssertionError(f"sync Redis client used for {name} on the event loop")
+
+
+@pytest.fixture
+def async_cache(monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(llm_cache, "async_redis_client", fakeredis.aioredis.FakeRedis(server=server, decode_responses=True))
+    monkeypatch.setattr(llm_cache, "redis_client", Blocking())
+    monkeypatch.setattr(llm_cache, "CACHE_ENABLED", True)
+    monkeypatch.setattr(llm_client, "_client", llm_client.LLMClient(llm_client.StubProvider()))
+    return fakeredis.FakeRedis(server=server, decode_responses=True)
+
+
+def test_complete_cached_uses_the_async_client(async_cache):
+    first = asyncio.run(llm_client.complete_cached("explain", 1, "same prompt", "Explain this strategy"))
+    second = asyncio.run(llm_client.complete_cached("explain", 1, "same prompt", "Explain this strategy"))
+    assert first == second
+    assert async_cache.hgetall(llm_cache.STATS_KEY) == {"explain:misses": "1", "explain:hits": "1"}
+    assert async_cache.zcard(llm_cache.LRU_KEY) == 1
+
+
+def test_stream_cached_replays_a_cached_stream_as_one_chunk(async_cache):
+    async def collect():
+        return [chunk async for chunk in llm_client.stream_cached("explain", 1, "streamed", "Explain this strategy")]
+    streamed = asyncio.run(collect())
+    assert len(streamed) > 1
+    assert asyncio.run(collect()) == ["".join(streamed).strip()]
+
+
+def test_async_put_respects_the_size_cap(async_cache, monkeypatch):
+    monkeypatch.setattr(llm_cache, "CACHE_MAX_ENTRIES", 2)
+    for i in range(4):
+        asyncio.run(llm_cache.put_async(f"llmcache:explain:{i}", str(i)))
+    assert async_cache.zcard(llm_cache.LRU_KEY) == 2
+    assert async_cache.get("llmcache:explain:0") is None and async_cache.get("llmcache:explain:3") == "3"
+
+
+def test_explanations_are_keyed_on_the_source_they_explain(async_cache, monkeypatch):
+    prompts = []
+
+    class Recording(llm_client.StubProvider):
+        async def stream(self, prompt):
+            prompts.append(prompt)
+            async for chunk in super().stream(prompt):
+                yield chunk
+
+    monkeypatch.setattr(llm_client, "_client", llm_client.LLMClient(Recording()))
+    commented = "def next(self):\n    #buy the dip\n    price = self.data.close[0]\n    return price\n"
+    reformatted = "def next(self):\n    price  =  self.data.close[0]\n    return price\n"
+    renamed = "def next(self):\n    close = self.data.close[0]\n    return close\n"
+    for code in (commented, reformatted, renamed):
+        asyncio.run(explain_service.explain_strategy_async(code))
+    #Comments and formatting are not sent, so they share an answer; renamed locals are sent
+    assert len(prompts) == 2
+    assert prompts[0].endswith(explain_service.explained_source(reformatted))
+    assert "#buy the dip" not in prompts[0] and "close = self.data.close[0]" in prompts[1]
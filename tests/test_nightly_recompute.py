@@ -0,0 +1,92 @@
+from datetime import datetime
+
+import pytest
+from sqlmodel import Session, select
+
+from app.models.leaderboard import LeaderboardEntry
+from app.models.strategy import Strategy
+from app.models.strategy_metrics import StrategyMetricsModel
+from app.models.users import User
+from app.services import leaderboard_cache, nightly_recompute_service
+from app.services.leaderboard_service import SCORING_VERSION, compute_score
+
+CODE = """
+import backtrader as bt
+
+class Hold(bt.Strategy):
+    def next(self):
+        pass
+"""
+
+PERFORMANCE = dict.fromkeys([
+    "total_return", "annual_return", "volatility", "sharpe_ratio", "sortino_ratio", "max_drawdown", "win_rate",
+    "avg_win", "avg_loss", "calmar_ratio", "profit_factor", "recovery_factor", "trades_per_month"
+], 0.0)
+METRICS = {"Total Return": 0.12, "Sharpe Ratio": 1.1, "Max Drawdown": 0.05}
+
+
+@pytest.fixture
+def nightly(db_engine, fake_redis, monkeypatch):
+    monkeypatch.setattr(nightly_recompute_service, "get_session", lambda: Session(db_engine))
+    monkeypatch.setattr(nightly_recompute_service, "redis_client", fake_redis)
+    monkeypatch.setattr(leaderboard_cache, "redis_client", fake_redis)
+    with Session(db_engine) as session:
+        session.add(User(email="owner@example.com"))
+        strategies = [Strategy(name=f"s{i}", prompt="", code=CODE, user_id="owner@example.com") for i in range(3)]
+        session.add_all(strategies)
+        session.commit()
+        for strategy in strategies:
+            session.refresh(strategy)
+        user_id = session.exec(select(User.id)).one()
+    return {s.id: s for s in strategies}, {"owner@example.com": user_id}
+
+
+def results(strategy_ids, tickers=("AAA", "BBB")):
+    return [
+        {"strategy_id": sid, "ticker": ticker, "performance": PERFORMANCE, "metrics": METRICS}
+        for sid in strategy_ids for ticker in tickers
+    ]
+
+
+def test_flush_writes_metrics_entries_and_redis(db_engine, fake_redis, nightly):
+    strategies, user_ids = nightly
+    run_at = datetime.utcnow()
+    flushed = list(strategies)[:2]
+    nightly_recompute_service._flush(results(flushed), strategies, user_ids, run_at)
+
+    with Session(db_engine) as session:
+        assert len(session.exec(select(StrategyMetricsModel)).all()) == 4
+        entries = session.exec(select(LeaderboardEntry).order_by(LeaderboardEntry.id)).all()
+    assert [(e.strategy_id, e.notes) for e in entries] == [(sid, t) for sid in flushed for t in ("AAA", "BBB")]
+    assert {(e.user_id, e.dataset, e.score, e.score_version) for e in entries} == {
+        (user_ids["owner@example.com"], nightly_recompute_service.NIGHTLY_DATASET, compute_score(METRICS), SCORING_VERSION)
+    }
+    cached = leaderboard_cache.top(dataset=nightly_recompute_service.NIGHTLY_DATASET, limit=10)
+    assert sorted(row["id"] for row in cached) == [e.id for e in entries]
+
+    #Flushed strategies count as done if the run restarts; the rest are still listed
+    jobs = nightly_recompute_service.list_strategy_jobs(run_at.replace(hour=0, minute=0, second=0, microsecond=0))
+    assert [s.id for s, _ in jobs] == list(strategies)[2:]
+
+
+def test_flush_commits_sql_when_redis_is_down(db_engine, fake_redis, nightly):
+    strategies, user_ids = nightly
+    fake_redis.connection_pool.connection_kwargs["server"].connected = False
+    nightly_recompute_service._flush(results(strategies), strategies, user_ids, datetime.utcnow())
+    with Session(db_engine) as session:
+        assert len(session.exec(select(LeaderboardEntry)).all()) == 6
+
+
+def test_failed_commit_writes_nothing_to_redis(db_engine, fake_redis, nightly, monkeypatch):
+    strategies, user_ids = nightly
+
+    class FailingCommit(Session):
+        def commit(self):
+            raise RuntimeError("database went away")
+
+    monkeypatch.setattr(nightly_recompute_service, "get_session", lambda: FailingCommit(db_engine))
+    with pytest.raises(RuntimeError):
+        nightly_recompute_service._flush(results(strategies), strategies, user_ids, datetime.utcnow())
+    assert fake_redis.keys("leaderboard:*") == []
+    with Session(db_engine) as session:
+        assert session.exec(select(LeaderboardEntry)).all() == []
@@ -0,0 +1,81 @@
+import random
+
+import pytest
+
+from app.models.paper_trading import PaperOrder, OrderSide, OrderStatus, OrderType
+from app.services.order_matching_engine import OrderMatchingEngine, fill_price_for
+
+_ids = iter(range(1, 1_000_000))
+
+
+def order(order_type, side, price=None, stop_price=None, symbol="AAA"):
+    return PaperOrder(
+        id=next(_ids), account_id=1, symbol=symbol, side=side, order_type=order_type, quantity=1,
+        price=price, stop_price=stop_price, status=OrderStatus.PENDING
+    )
+
+
+@pytest.mark.parametrize("order_type,side,levels,short,at", [
+    (OrderType.LIMIT, OrderSide.BUY, {"price": 100.0}, 100.01, 100.0),
+    (OrderType.LIMIT, OrderSide.SELL, {"price": 100.0}, 99.99, 100.0),
+    (OrderType.STOP, OrderSide.BUY, {"stop_price": 100.0}, 99.99, 100.0),
+    (OrderType.STOP, OrderSide.SELL, {"stop_price": 100.0}, 100.01, 100.0),
+    (OrderType.STOP_LIMIT, OrderSide.BUY, {"stop_price": 100.0, "price": 101.0}, 99.99, 100.0),
+    (OrderType.STOP_LIMIT, OrderSide.SELL, {"stop_price": 100.0, "price": 99.0}, 100.01, 100.0),
+])
+def test_trigger_prices_are_inclusive(order_type, side, levels, short, at):
+    engine = OrderMatchingEngine()
+    resting = order(order_type, side, **levels)
+    engine.add(resting)
+    assert engine.on_price("AAA", short) == []
+    assert resting.id in engine
+    assert engine.on_price("AAA", at) == [(resting.id, fill_price_for(resting, at))]
+    assert resting.id not in engine and len(engine) == 0
+
+
+@pytest.mark.parametrize("side,stop,limit,gapped,filled", [
+    (OrderSide.BUY, 100.0, 101.0, 103.0, 100.5),
+    (OrderSide.SELL, 100.0, 99.0, 97.0, 99.5),
+])
+def test_stop_limit_past_its_limit_keeps_resting(side, stop, limit, gapped, filled):
+    engine = OrderMatchingEngine()
+    resting = order(OrderType.STOP_LIMIT, side, price=limit, stop_price=stop)
+    neighbour = order(OrderType.STOP_LIMIT, side, price=limit, stop_price=stop)
+    engine.add(resting)
+    engine.add(neighbour)
+    #The stop is crossed but the price gapped through the limit
+    assert engine.on_price("AAA", gapped) == []
+    assert len(engine) == 2
+    #Still indexed under its stop, so it can be cancelled and the other one still fills
+    assert engine.remove(resting.id)
+    assert engine.on_price("AAA", filled) == [(neighbour.id, limit)]
+    assert len(engine) == 0
+
+
+def test_matches_a_scan_of_every_order():
+    rng = random.Random(7)
+    engine = OrderMatchingEngine()
+    pending = {}
+    for _ in range(400):
+        order_type = rng.choice(list(OrderType))
+        side = rng.choice(list(OrderSide))
+        #Whole-number levels on a narrow range so prices land exactly on triggers
+        stop = round(rng.uniform(95, 105), 0)
+        limit = stop + (1.0 if side == OrderSide.BUY else -1.0) * rng.choice([0.0, 1.0, 2.0])
+        resting = order(
+            order_type, side,
+            price=limit if order_type in (OrderType.LIMIT, OrderType.STOP_LIMIT) else None,
+            stop_price=stop if order_type in (OrderType.STOP, OrderType.STOP_LIMIT) else None,
+        )
+        if order_type == OrderType.LIMIT:
+            resting.price = stop
+        assert engine.add(resting)
+        pending[resting.id] = resting
+
+    for _ in range(60):
+        price = round(rng.uniform(94, 106), 0)
+        expected = {i: fill_price_for(o, price) for i, o in pending.items() if fill_price_for(o, price) is not None}
+        assert dict(engine.on_price("AAA", price)) == expected
+        for i in expected:
+            del pending[i]
+        assert len(engine) == len(pending)
@@ -0,0 +1,67 @@
+import os
+from datetime import date, datetime
+
+import pytest
+from sqlmodel import Session, select
+
+from app.models.paper_trading import PaperArchivePartition, PaperOrder, PaperTrade, OrderSide, OrderStatus
+from app.services import paper_archive_service
+from app.services.paper_trading_service import PaperTradingService
+
+
+@pytest.fixture
+def archive(db_engine, tmp_path, monkeypatch):
+    monkeypatch.setattr(paper_archive_service, "ARCHIVE_URI", str(tmp_path / "archive"))
+    monkeypatch.setattr(paper_archive_service, "get_session", lambda: Session(db_engine))
+    with Session(db_engine) as session:
+        order = PaperOrder(account_id=1, symbol="AAA", side=OrderSide.BUY, quantity=1, status=OrderStatus.FILLED)
+        session.add(order)
+        session.flush()
+        #Four a month from January to April, with two trades sharing the last January second
+        for month in range(1, 5):
+            for day in range(4):
+                at = datetime(2024, month, 10 + day * 5)
+                session.add(PaperTrade(account_id=1, order_id=order.id, symbol="AAA", side=OrderSide.BUY, quantity=1, price=1.0, timestamp=at))
+        session.add(PaperTrade(account_id=1, order_id=order.id, symbol="AAA", side=OrderSide.BUY, quantity=1, price=1.0, timestamp=datetime(2024, 1, 25)))
+        session.commit()
+        expected = [
+            t.id for t in session.exec(select(PaperTrade).order_by(PaperTrade.timestamp.desc(), PaperTrade.id.desc())).all()
+        ]
+    for month in (date(2024, 1, 1), date(2024, 2, 1)):
+        paper_archive_service.archive_month(PaperTrade.__tablename__, month)
+    return expected
+
+
+def walk(engine, limit: int):
+    ids, cursor = [], None
+    with Session(engine) as session:
+        while True:
+            result = PaperTradingService.list_trades(1, session, limit=limit, cursor=cursor)
+            ids.extend(t.id for t in result["items"])
+            cursor = result["next_cursor"]
+            if cursor is None:
+                return ids
+
+
+def test_archived_months_leave_the_hot_table(db_engine, archive):
+    with Session(db_engine) as session:
+        assert len(session.exec(select(PaperTrade)).all()) == 8
+        assert [p.row_count for p in session.exec(select(PaperArchivePartition).order_by(PaperArchivePartition.month)).all()] == [5, 4]
+
+
+@pytest.mark.parametrize("limit", [1, 3, 4, 5, 8, 20])
+def test_pages_cross_the_archive_boundary_in_order(db_engine, archive, limit):
+    assert walk(db_engine, limit) == archive
+
+
+def test_missing_partition_falls_back_to_hot_rows(db_engine, archive):
+    with Session(db_engine) as session:
+        for partition in session.exec(select(PaperArchivePartition)).all():
+            os.remove(partition.path)
+    assert walk(db_engine, 3) == archive[:8]
+
+
+def test_archiving_requires_a_location(db_engine, monkeypatch):
+    monkeypatch.setattr(paper_archive_service, "ARCHIVE_URI", None)
+    with pytest.raises(RuntimeError):
+        paper_archive_service.archive_old_partitions(now=datetime(2024, 6, 1))
@@ -0,0 +1,63 @@
+import asyncio
+import json
+
+import fakeredis
+import pytest
+
+from app.services import paper_events
+
+
+@pytest.fixture
+def publisher(monkeypatch):
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(paper_events, "async_redis_client", fakeredis.aioredis.FakeRedis(server=server, decode_responses=True))
+    return fakeredis.FakeRedis(server=server, decode_responses=True)
+
+
+def event(account_id, order_id):
+    return json.dumps({"type": "order", "account_id": account_id, "data": {"order_id": order_id}})
+
+
+def test_subscription_is_live_when_subscribe_returns(publisher):
+    async def scenario():
+        hub = paper_events.PaperEventHub()
+        subscriber = await hub.subscribe(1)
+        #Published straight after subscribing, as a commit racing the snapshot read would be
+        assert publisher.publish(paper_events.channel(1), event(1, 7)) == 1
+        events = await asyncio.wait_for(subscriber.drain(), 2)
+        await hub.unsubscribe(1, subscriber)
+        hub._task.cancel()
+        return events
+    assert [e["data"]["order_id"] for e in asyncio.run(scenario())] == [7]
+
+
+def test_only_served_accounts_are_subscribed(publisher):
+    async def scenario():
+        hub = paper_events.PaperEventHub()
+        first = await hub.subscribe(1)
+        second = await hub.subscribe(1)
+        other = await hub.subscribe(2)
+        assert publisher.publish(paper_events.channel(3), event(3, 1)) == 0
+        await hub.unsubscribe(1, first)
+        #The account still has a connection, so its channel stays subscribed
+        assert publisher.publish(paper_events.channel(1), event(1, 2)) == 1
+        await hub.unsubscribe(1, second)
+        await hub.unsubscribe(2, other)
+        await asyncio.sleep(0.1)
+        channels = publisher.pubsub_channels()
+        hub._task.cancel()
+        return channels
+    assert asyncio.run(scenario()) == []
+
+
+def test_resubscribing_waits_for_the_new_confirmation(publisher):
+    async def scenario():
+        hub = paper_events.PaperEventHub()
+        subscriber = await hub.subscribe(1)
+        await hub.unsubscribe(1, subscriber)
+        subscriber = await hub.subscribe(1)
+        assert publisher.publish(paper_events.channel(1), event(1, 3)) == 1
+        events = await asyncio.wait_for(subscriber.drain(), 2)
+        hub._task.cancel()
+        return events
+    assert [e["data"]["order_id"] for e in asyncio.run(scenario())] == [3]
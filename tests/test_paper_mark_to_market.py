@@ -0,0 +1,83 @@
+from datetime import timedelta
+
+import pytest
+from sqlmodel import Session, select
+
+from app.models.paper_trading import PaperEquityPoint, PaperPortfolioSnapshot, PaperPosition, PaperTradingAccount
+from app.services import paper_trading_executor
+from app.services.executor_partitions import PartitionLeaser
+from app.services.market_data_service import MarketDataService
+from app.utility import clock
+
+
+@pytest.fixture
+def executor(db_engine, monkeypatch):
+    monkeypatch.setattr(paper_trading_executor, "get_session", lambda: Session(db_engine))
+    executor = paper_trading_executor.PaperTradingExecutor(leaser=PartitionLeaser(partitions=1))
+    executor.partitions = {0}
+    return executor
+
+
+@pytest.fixture
+def account_id(db_engine):
+    with Session(db_engine) as session:
+        account = PaperTradingAccount(user_id=1, available_cash=99000.0, current_balance=100000.0)
+        session.add(account)
+        session.flush()
+        session.add(PaperPosition(account_id=account.id, symbol="AAA", quantity=10, avg_entry_price=100.0, current_price=100.0))
+        session.commit()
+        return account.id
+
+
+def quote(monkeypatch, provider):
+    monkeypatch.setattr(MarketDataService, "price_provider", provider)
+
+
+def recorded(engine):
+    with Session(engine) as session:
+        return (
+            len(session.exec(select(PaperPortfolioSnapshot)).all()),
+            len(session.exec(select(PaperEquityPoint)).all()),
+            session.exec(select(PaperTradingAccount)).one().current_balance,
+        )
+
+
+def test_records_only_when_equity_moves(db_engine, executor, account_id, monkeypatch):
+    quote(monkeypatch, lambda symbol: 100.0)
+    executor.mark_to_market()
+    assert recorded(db_engine) == (0, 0, 100000.0)
+
+    quote(monkeypatch, lambda symbol: 110.0)
+    executor.mark_to_market()
+    assert recorded(db_engine) == (1, 1, 100100.0)
+
+
+def test_reads_what_settlement_committed(db_engine, executor, account_id, monkeypatch):
+    #A settlement sells the position while the quotes are being fetched
+    def sell_then_quote(symbol):
+        with Session(db_engine) as session:
+            session.delete(session.exec(select(PaperPosition)).one())
+            account = session.get(PaperTradingAccount, account_id)
+            account.available_cash += 1100.0
+            session.add(account)
+            session.commit()
+        return 110.0
+    quote(monkeypatch, sell_then_quote)
+
+    executor.mark_to_market()
+    with Session(db_engine) as session:
+        account = session.get(PaperTradingAccount, account_id)
+        assert account.available_cash == 100100.0
+        assert account.current_balance == 100100.0
+        assert session.exec(select(PaperEquityPoint)).one().equity == 100100.0
+
+
+def test_prune_keeps_each_accounts_newest_snapshot(db_engine, executor, account_id):
+    now = clock.utcnow()
+    with Session(db_engine) as session:
+        for hours in (72, 48, 30):
+            session.add(PaperPortfolioSnapshot(account_id=account_id, timestamp=now - timedelta(hours=hours), cash=0.0, equity=float(hours)))
+        session.commit()
+    executor.prune_snapshots()
+    with Session(db_engine) as session:
+        assert [s.equity for s in session.exec(select(PaperPortfolioSnapshot)).all()] == [30.0]
@@ -0,0 +1,57 @@
+from sqlmodel import Session, select
+
+from app.models.paper_trading import PaperOrder, PaperPosition, PaperTrade, PaperTradingAccount, OrderSide, OrderStatus, OrderType
+from app.services.paper_trading_service import PaperTradingService
+
+
+def pending_order(engine) -> int:
+    with Session(engine) as session:
+        account = PaperTradingAccount(user_id=1)
+        session.add(account)
+        session.flush()
+        order = PaperOrder(account_id=account.id, symbol="AAA", side=OrderSide.BUY, order_type=OrderType.LIMIT, quantity=10, price=50.0)
+        session.add(order)
+        session.commit()
+        return order.id
+
+
+def settle(engine, order_id: int):
+    with Session(engine) as session:
+        order = session.get(PaperOrder, order_id)
+        return PaperTradingService.settle_fills([(order, 50.0)], session, prices={"AAA": 50.0})
+
+
+def test_cancel_after_fill_loses(db_engine):
+    order_id = pending_order(db_engine)
+    with Session(db_engine) as canceller:
+        #Loaded while still pending, then filled from another session
+        stale = canceller.get(PaperOrder, order_id)
+        assert stale.status == OrderStatus.PENDING
+        trades, failed = settle(db_engine, order_id)
+        assert len(trades) == 1 and not failed
+        assert PaperTradingService.cancel_order(order_id, canceller) is False
+
+    with Session(db_engine) as session:
+        assert session.get(PaperOrder, order_id).status == OrderStatus.FILLED
+        assert session.exec(select(PaperPosition)).one().quantity == 10
+        assert session.exec(select(PaperTradingAccount)).one().available_cash == 100000.0 - 500.0
+
+
+def test_fill_after_cancel_is_dropped(db_engine):
+    order_id = pending_order(db_engine)
+    with Session(db_engine) as session:
+        assert PaperTradingService.cancel_order(order_id, session) is True
+        assert PaperTradingService.cancel_order(order_id, session) is False
+
+    trades, failed = settle(db_engine, order_id)
+    assert trades == [] and failed == []
+    with Session(db_engine) as session:
+        assert session.get(PaperOrder, order_id).status == OrderStatus.CANCELLED
+        assert session.exec(select(PaperTrade)).all() == []
+        assert session.exec(select(PaperPosition)).all() == []
+        assert session.exec(select(PaperTradingAccount)).one().available_cash == 100000.0
+
+
+def test_cancel_of_unknown_order(db_engine):
+    with Session(db_engine) as session:
+        assert PaperTradingService.cancel_order(12345, session) is False
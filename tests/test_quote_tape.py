@@ -0,0 +1,31 @@
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+from app.services import quote_tape
+
+
+def test_market_data_imports_without_numpy():
+    code = (
+        "import sys\n"
+        "import app.services.market_data_service\n"
+        "assert 'app.services.quote_tape' not in sys.modules\n"
+        "import app.services.quote_tape\n"
+        "assert 'numpy' not in sys.modules\n"
+    )
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", code], cwd=root, env={**os.environ, "DATABASE_URL": "sqlite://"}, check=True)
+
+
+def test_records_read_back_across_index_blocks(tmp_path, monkeypatch):
+    monkeypatch.setattr(quote_tape, "TAPE_DIR", str(tmp_path))
+    start = datetime(2024, 1, 2)
+    base = quote_tape._epoch(start)
+    rows = [(base + i, float(i), float(i), float(i), float(i), 0.0, 0) for i in range(quote_tape.BLOCK + 10)]
+    assert quote_tape.append("AAA", rows) == len(rows)
+
+    records = quote_tape.read("AAA", datetime(2024, 1, 2, 0, 10), datetime(2024, 1, 2, 0, 20), interval="quote")
+    assert list(records["close"]) == [float(i) for i in range(600, len(rows))]
+    frame = quote_tape.read_frame("AAA", start, datetime(2024, 1, 3))
+    assert list(frame.columns) == list(quote_tape.FIELDS[1:]) and len(frame) == len(rows)
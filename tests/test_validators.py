@@ -0,0 +1,128 @@
+import pytest
+
+from app.utility.validators import strategy_namespace, validate_strategy_code
+
+STRATEGY = """
+import backtrader as bt
+
+class Cross(bt.Strategy):
+    params = (("fast", 10), ("slow", 30))
+
+    def __init__(self):
+        self.cross = bt.indicators.CrossOver(bt.indicators.SMA(period=self.p.fast), bt.indicators.SMA(period=self.p.slow))
+
+    def next(self):
+        if not self.position and self.cross[0] > 0:
+            self.buy(size=10)
+        elif self.position and self.cross[0] < 0:
+            self.close()
+"""
+
+
+def with_body(body: str) -> str:
+    return STRATEGY + "".join(f"\n{line}" for line in body.splitlines())
+
+
+def test_plain_strategy_is_valid():
+    assert validate_strategy_code(STRATEGY) == {"valid": True}
+
+
+@pytest.mark.parametrize("payload", [
+    "import random\nrandom._os.system('id')",
+    "import pandas\npandas.io.common.os.system('id')",
+    "import numpy\nnumpy.lib.npyio.os.system('id')",
+    "import typing\ntyping.sys.modules['os']",
+    "yf.utils.os.system('id')",
+    "threading.Thread",
+    "from numpy.lib.npyio import os",
+    "from pandas.io import common",
+    "import os",
+    "import importlib",
+    "getattr(bt, 'os')",
+    "getattr(bt, '_x')",
+    "getattr(bt, name)",
+    "bt.__class__.__subclasses__()",
+    "x = (1).__class__",
+    "open('/etc/passwd')",
+    "'{0.__class__}'.format(bt)",
+    "import pandas as pd\npd.read_csv('/etc/passwd')",
+    "import typing\ntyping.get_type_hints(bt)",
+    "def f(x: '().__class__'): pass",
+    "x = b'__class__'",
+    "import pandas as pd\npd.DataFrame().query('a > 1')",
+    "import pandas as pd\npd.eval('1 + 1')",
+    "from functools import singledispatch",
+    "import pandas as pd\npd.DataFrame().to_string(buf='/tmp/x')",
+    "import pandas as pd\npd.DataFrame().to_latex('/tmp/x')",
+    "import numpy as np\nnp.lib.format.open_memmap('/tmp/x', mode='w+')",
+    "import numpy as np\nnp.zeros(1).dump('/tmp/x')",
+    "import numpy as np\nnp.fromregex('/etc/passwd', 'x', [])",
+    "import numpy as np\nnp.testing.extbuild",
+    "bt.feeds.GenericCSVData(dataname='/etc/passwd')",
+    "from backtrader.feeds import GenericCSVData",
+    "bt.CSVDataBase",
+    "f(path='/tmp/x')",
+])
+def test_escapes_are_rejected(payload):
+    result = validate_strategy_code(with_body(payload))
+    assert result["valid"] is False
+    assert result["violations"]
+
+
+def test_namespace_blocks_imports_outside_the_allowlist():
+    namespace = strategy_namespace()
+    exec("import math\nroot = math.sqrt(4)", namespace)
+    assert namespace["root"] == 2
+    with pytest.raises(ImportError):
+        exec("import os", strategy_namespace())
+    with pytest.raises(NameError):
+        exec("open('/etc/passwd')", strategy_namespace())
+
+
+def test_namespace_allows_lazy_imports_of_allowed_packages():
+    namespace = strategy_namespace()
+    exec(
+        "import numpy as np\n"
+        "from datetime import datetime\n"
+        "mean = np.array([1.0, 2.0, 3.0]).mean()\n"
+        "day = datetime(2024, 1, 2).strftime('%Y-%m-%d')\n"
+        "parsed = datetime.strptime(day, '%Y-%m-%d')",
+        namespace,
+    )
+    assert namespace["mean"] == 2.0
+    assert namespace["day"] == "2024-01-02"
+    with pytest.raises(ImportError):
+        exec("from numpy import _core", strategy_namespace())
+
+
+def test_numpy_and_datetime_strategy_backtests():
+    import numpy as np
+    import pandas as pd
+    from app.services.backtest_service import run_backtest_on_frame
+
+    code = STRATEGY.replace(
+        "    def next(self):\n",
+        "    def next(self):\n"
+        "        closes = np.array(self.data.close.get(size=5))\n"
+        "        if len(closes) == 5 and self.data.datetime.datetime(0).strftime('%a') == 'Mon':\n"
+        "            self.spread = closes.std() / closes.mean()\n",
+    ).replace("import backtrader as bt", "import backtrader as bt\nimport numpy as np")
+    close = 100 + np.cumsum(np.random.default_rng(3).normal(0, 1, 200))
+    frame = pd.DataFrame(
+        {"open": close, "high": close + 1, "low": close - 1, "close": close, "volume": 1000.0},
+        index=pd.date_range("2023-01-02", periods=200, freq="B"),
+    )
+    assert validate_strategy_code(code) == {"valid": True}
+    result = run_backtest_on_frame(code, frame)
+    assert "error" not in result
+
+
+def test_namespace_does_not_leak_host_modules():
+    namespace = strategy_namespace()
+    for name in ("yf", "threading", "os", "sys", "__import__"):
+        assert name not in namespace
+
+
+def test_backtrader_package_imports_are_rejected():
+    payload = "class Evil(bt.Strategy):\n    packages = ('os',)"
+    assert validate_strategy_code(STRATEGY + "\n" + payload)["valid"] is False